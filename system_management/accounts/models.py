@@ -155,7 +155,8 @@ class Course(models.Model):
     @property
     def total_lessons(self):
         """Return total active lessons for this course"""
-        return self.lessons.filter(is_active=True).count()
+        from admin_dashboard.models import CourseContentStats
+        return CourseContentStats.for_course(self).active_lessons
 
     @property
     def total_students(self):
@@ -0,0 +1,254 @@
+# admin_dashboard/chunked_uploads.py
+"""
+Resumable chunked video uploads (init / append / complete).
+
+Each append streams the request body to a chunk file in small blocks, so
+memory per request is bounded by BLOCK_SIZE whatever the chunk size. The
+chunk is verified, then appended to the upload's part file under a short row
+lock. Network time is spent outside the lock, so a slow client never blocks
+other uploads. Completing an upload checks the whole-file SHA-256 and moves
+the file into place with a rename before the lesson points at it.
+Uploads left open are expired by process_video_tasks (expire_uploads).
+"""
+import base64
+import binascii
+import glob
+import hashlib
+import os
+import re
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+
+from .models import VideoUpload, VideoTask
+
+
+BLOCK_SIZE = 64 * 1024
+VALID_EXTENSIONS = ['.mp4', '.webm', '.ogg']
+
+
+class UploadError(Exception):
+    """A rejected upload request; carries the response detail and status"""
+
+    def __init__(self, detail, status_code, offset=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.offset = offset
+
+
+def part_path(upload):
+    return os.path.join(settings.VIDEO_UPLOAD_TEMP_DIR, f'{upload.id}.part')
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def start_upload(course, lesson, user, filename, total_size, checksum=''):
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in VALID_EXTENSIONS:
+        raise UploadError(f'Invalid video format. Supported formats: {", ".join(VALID_EXTENSIONS)}',
+                          status.HTTP_400_BAD_REQUEST)
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be the file size in bytes.', status.HTTP_400_BAD_REQUEST)
+    if total_size <= 0:
+        raise UploadError('size must be the file size in bytes.', status.HTTP_400_BAD_REQUEST)
+    if total_size > settings.VIDEO_MAX_SIZE:
+        raise UploadError(f'File too large. Maximum size is {settings.VIDEO_MAX_SIZE // (1024 * 1024)}MB',
+                          status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    checksum = (checksum or '').strip().lower()
+    if checksum and not re.fullmatch(r'[0-9a-f]{64}', checksum):
+        raise UploadError('checksum must be a hex SHA-256 digest.', status.HTTP_400_BAD_REQUEST)
+
+    upload = VideoUpload.objects.create(
+        course=course, lesson=lesson, uploaded_by=user,
+        filename=os.path.basename(filename)[:255], total_size=total_size, checksum=checksum
+    )
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def _chunk_digest(header):
+    """Parse a tus-style "Upload-Checksum: sha256 <base64>" header"""
+    if not header:
+        return None
+    algorithm, _, encoded = header.strip().partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise UploadError('Only sha256 chunk checksums are supported.', status.HTTP_400_BAD_REQUEST)
+    try:
+        return base64.b64decode(encoded.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        raise UploadError('Malformed Upload-Checksum header.', status.HTTP_400_BAD_REQUEST)
+
+
+def append_chunk(upload, offset, stream, length, checksum_header=None):
+    """
+    Append `length` bytes read from `stream` at `offset`. The offset must
+    equal the bytes received so far; a mismatch answers 409 with the
+    current offset so the client can resume from there.
+    """
+    if upload.status != 'uploading':
+        raise UploadError(f'Upload is {upload.status}.', status.HTTP_409_CONFLICT)
+    if offset != upload.received_size:
+        raise UploadError('Offset does not match the bytes received.', status.HTTP_409_CONFLICT,
+                          offset=upload.received_size)
+    if length <= 0:
+        raise UploadError('Chunk is empty.', status.HTTP_400_BAD_REQUEST)
+    if length > settings.VIDEO_UPLOAD_MAX_CHUNK_SIZE:
+        raise UploadError('Chunk too large.', status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    if offset + length > upload.total_size:
+        raise UploadError('Chunk goes past the declared file size.', status.HTTP_400_BAD_REQUEST)
+    expected_digest = _chunk_digest(checksum_header)
+
+    chunk_path = f'{part_path(upload)}.{uuid.uuid4().hex}'
+    try:
+        digest = hashlib.sha256()
+        received = 0
+        with open(chunk_path, 'wb') as chunk:
+            while received < length:
+                block = stream.read(min(BLOCK_SIZE, length - received))
+                if not block:
+                    break
+                digest.update(block)
+                chunk.write(block)
+                received += len(block)
+
+        if received != length:
+            raise UploadError('Chunk shorter than Content-Length.', status.HTTP_400_BAD_REQUEST,
+                              offset=upload.received_size)
+        if expected_digest is not None and digest.digest() != expected_digest:
+            # 460 is the tus "checksum mismatch" status
+            raise UploadError('Chunk checksum mismatch.', 460, offset=upload.received_size)
+
+        with transaction.atomic():
+            locked = VideoUpload.objects.select_for_update().get(pk=upload.pk)
+            if locked.status != 'uploading' or locked.received_size != offset:
+                raise UploadError('Offset does not match the bytes received.', status.HTTP_409_CONFLICT,
+                                  offset=locked.received_size)
+            with open(chunk_path, 'rb') as chunk, open(part_path(upload), 'r+b') as part:
+                # Drop any tail left by an append that failed before its row update
+                part.truncate(offset)
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, BLOCK_SIZE)
+            locked.received_size = offset + length
+            locked.save(update_fields=['received_size', 'updated_at'])
+    finally:
+        _remove(chunk_path)
+
+    upload.received_size = offset + length
+    return upload
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(upload):
+    """
+    Verify the assembled file, move it into the lesson's video folder and
+    point the lesson at it. Returns the stored video path (relative to
+    MEDIA_ROOT) and the queued processing task.
+    """
+    if upload.status != 'uploading':
+        raise UploadError(f'Upload is {upload.status}.', status.HTTP_409_CONFLICT)
+    if upload.received_size != upload.total_size:
+        raise UploadError('Upload is incomplete.', status.HTTP_409_CONFLICT, offset=upload.received_size)
+
+    # Claim the upload so a repeated complete request cannot move the file twice
+    claimed = VideoUpload.objects.filter(
+        pk=upload.pk, status='uploading', received_size=upload.total_size
+    ).update(status='complete')
+    if not claimed:
+        raise UploadError('Upload is already being completed.', status.HTTP_409_CONFLICT)
+
+    try:
+        video_url, task, old_video_path = _move_into_place(upload)
+    except BaseException:
+        VideoUpload.objects.filter(pk=upload.pk).update(status='uploading')
+        raise
+
+    if old_video_path and os.path.exists(old_video_path):
+        try:
+            os.remove(old_video_path)
+        except OSError:
+            pass
+    return video_url, task
+
+
+def _move_into_place(upload):
+    source = part_path(upload)
+    if upload.checksum and _file_sha256(source) != upload.checksum:
+        raise UploadError('File checksum mismatch.', 460, offset=upload.received_size)
+
+    upload_dir = os.path.join('videos', f'course_{upload.course_id}')
+    if upload.lesson_id:
+        upload_dir = os.path.join(upload_dir, f'lesson_{upload.lesson_id}')
+    os.makedirs(os.path.join(settings.MEDIA_ROOT, upload_dir), exist_ok=True)
+
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+    clean_filename = re.sub(r'[^\w\-_\.]', '_', upload.filename)
+    video_url = os.path.join(upload_dir, f"{timestamp}_{str(upload.id)[:8]}_{clean_filename}").replace('\\', '/')
+    destination = os.path.join(settings.MEDIA_ROOT, video_url)
+
+    # Same filesystem: an atomic rename; otherwise a copy then rename
+    shutil.move(source, destination)
+
+    old_video_path = None
+    try:
+        with transaction.atomic():
+            if upload.lesson_id:
+                lesson = upload.lesson
+                if lesson.video_url and lesson.video_url.startswith('videos/'):
+                    old_video_path = os.path.join(settings.MEDIA_ROOT, lesson.video_url)
+                lesson.video_url = video_url
+                lesson.full_clean()
+                lesson.save()
+            upload.status = 'complete'
+            upload.video_url = video_url
+            upload.save(update_fields=['status', 'video_url', 'updated_at'])
+            task = VideoTask.enqueue(video_url, lesson=upload.lesson)
+    except ValidationError as e:
+        shutil.move(destination, source)
+        raise UploadError(e.message_dict, status.HTTP_400_BAD_REQUEST)
+    except BaseException:
+        shutil.move(destination, source)
+        raise
+    return video_url, task, old_video_path
+
+
+def abort_upload(upload):
+    upload.status = 'aborted'
+    upload.save(update_fields=['status', 'updated_at'])
+    _remove(part_path(upload))
+
+
+def expire_uploads(older_than):
+    """
+    Abort uploads still open that have received nothing since `older_than`
+    and delete their part files. Returns the number of uploads expired.
+    """
+    stale = VideoUpload.objects.filter(status='uploading', updated_at__lt=older_than)
+    expired = 0
+    for upload in stale.only('id'):
+        # Claimed row by row, so an append that arrives meanwhile keeps its upload
+        if stale.filter(pk=upload.pk).update(status='aborted', updated_at=timezone.now()):
+            # The part file, and chunk files left by an append that was killed mid-request
+            for path in [part_path(upload)] + glob.glob(f'{glob.escape(part_path(upload))}.*'):
+                _remove(path)
+            expired += 1
+    return expired
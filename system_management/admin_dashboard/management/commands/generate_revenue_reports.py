@@ -0,0 +1,45 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from admin_dashboard.revenue_reports import REPORT_TYPES, SCHEDULED_TYPES, generate_reports
+
+
+class Command(BaseCommand):
+    help = ('Roll completed transactions up into revenue reports for newly closed periods '
+            'and periods marked stale; run from cron or with --every as a scheduler')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', action='append', choices=REPORT_TYPES, dest='types',
+                            help=f'Report type to generate, repeatable (default: {", ".join(SCHEDULED_TYPES)})')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every closed period')
+        parser.add_argument('--today', help='Treat this date (YYYY-MM-DD) as today, e.g. to backfill')
+        parser.add_argument('--every', type=float, default=0,
+                            help='Keep running and generate again every this many seconds')
+
+    def handle(self, *args, **options):
+        types = options['types'] or SCHEDULED_TYPES
+        today = None
+        if options['today']:
+            try:
+                today = date.fromisoformat(options['today'])
+            except ValueError:
+                raise CommandError('--today must be a date in YYYY-MM-DD format')
+
+        while True:
+            started = time.perf_counter()
+            for report_type in types:
+                written = generate_reports(report_type, today=today or timezone.localdate(),
+                                           rebuild=options['rebuild'])
+                self.stdout.write(f"  {report_type}: {written} reports written")
+            self.stdout.write(self.style.SUCCESS(
+                f"Revenue reports up to date ({time.perf_counter() - started:.1f}s)"
+            ))
+
+            if not options['every']:
+                break
+            # A rebuild is only needed once; later runs are incremental
+            options['rebuild'] = False
+            time.sleep(options['every'])
@@ -0,0 +1,86 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from admin_dashboard.chunked_uploads import expire_uploads
+from admin_dashboard.models import Lesson, VideoTask, build_video_descriptor
+from admin_dashboard.video_processing import process_video, hls_root_for, remove_old_hls
+
+
+class Command(BaseCommand):
+    help = ('Run queued video tasks: probe uploads, remux MP4s for fast start, encode renditions '
+            'and package HLS. When the queue is empty, expire abandoned chunked uploads')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--max-tasks', type=int, default=0, help='Exit after this many tasks (0 = no limit)')
+        parser.add_argument('--stale-minutes', type=int, default=10,
+                            help='Requeue running tasks whose worker has not reported for this long')
+        parser.add_argument('--upload-expiry-hours', type=float, default=settings.VIDEO_UPLOAD_EXPIRY_HOURS,
+                            help='Abort chunked uploads that have received nothing for this long')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while not options['max_tasks'] or processed < options['max_tasks']:
+            VideoTask.requeue_stale(timezone.now() - timedelta(minutes=options['stale_minutes']))
+            task = VideoTask.claim_next()
+            if task is None:
+                expired = expire_uploads(timezone.now() - timedelta(hours=options['upload_expiry_hours']))
+                if expired:
+                    self.stdout.write(f"  Expired {expired} abandoned uploads")
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.run_task(task)
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} video tasks"))
+
+    def run_task(self, task):
+        started = time.perf_counter()
+        # Only lessons still showing this file: the task's lesson may have had its
+        # video replaced since it was queued, and lessons created after the upload
+        # reference the file by its path
+        lessons = Lesson.objects.filter(video_url=task.video_path)
+        packaged_for = (lessons.filter(id=task.lesson_id).only('id', 'course_id').first()
+                        or lessons.only('id', 'course_id').first())
+        hls_root = hls_root_for(packaged_for.course_id, packaged_for.id) if packaged_for else None
+
+        try:
+            # Encodes can run for hours; the heartbeat keeps other workers from requeuing them
+            with task.keep_alive():
+                fields = process_video(task.video_path, hls_root)
+        except Exception as e:
+            task.fail(e)
+            self.stderr.write(f"  Task {task.id} ({task.video_path}) failed: {e}")
+            return
+
+        if fields is None:
+            task.finish({'skipped': 'file no longer exists'})
+            self.stdout.write(f"  Task {task.id}: {task.video_path} is gone, skipped")
+            return
+
+        updated = lessons.update(**fields)
+        self.refresh_descriptors(lessons)
+        if fields['hls_playlist']:
+            remove_old_hls(fields['hls_playlist'])
+        task.finish(dict(fields, lessons_updated=updated))
+        self.stdout.write(
+            f"  Task {task.id}: {task.video_path} {fields['video_codec'] or '?'} "
+            f"{fields['video_duration']}s, {len(fields['video_renditions'])} renditions, "
+            f"{'HLS' if fields['hls_playlist'] else 'no HLS'} "
+            f"({time.perf_counter() - started:.1f}s)"
+        )
+
+    def refresh_descriptors(self, lessons):
+        """update() skips Lesson.save, so rebuild the stored descriptors here"""
+        refreshed = list(lessons)
+        for lesson in refreshed:
+            lesson.video_descriptor = build_video_descriptor(lesson)
+        Lesson.objects.bulk_update(refreshed, ['video_descriptor'])
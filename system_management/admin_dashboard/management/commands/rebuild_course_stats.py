@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from accounts.models import Course
+from admin_dashboard.models import CourseContentStats
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored lesson, video and exercise counters for every course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Only rebuild the counters for this course ID')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options.get('course'):
+            courses = courses.filter(id=options['course'])
+
+        fixed_count = 0
+        for course_id in courses.values_list('id', flat=True):
+            before = CourseContentStats.objects.filter(course_id=course_id).values(
+                'active_lessons', 'video_lessons', 'exercise_lessons', 'total_duration'
+            ).first()
+            after = CourseContentStats.compute(course_id)
+
+            if before != after:
+                CourseContentStats.refresh(course_id)
+                fixed_count += 1
+                self.stdout.write(f"  Course {course_id}: {before} -> {after}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt counters for {courses.count()} courses ({fixed_count} had drifted)")
+        )
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_course_stats(apps, schema_editor):
+    Course = apps.get_model('accounts', 'Course')
+    Lesson = apps.get_model('admin_dashboard', 'Lesson')
+    CourseContentStats = apps.get_model('admin_dashboard', 'CourseContentStats')
+
+    has_video = (
+        models.Q(video_url__isnull=False) &
+        ~models.Q(video_url='') &
+        ~models.Q(video_url='null')
+    )
+    has_exercise = (
+        models.Q(exercise__isnull=False) &
+        ~models.Q(exercise={}) &
+        ~models.Q(exercise=[]) &
+        ~models.Q(exercise='')
+    )
+
+    for course_id in Course.objects.values_list('id', flat=True):
+        counts = Lesson.objects.filter(course_id=course_id, is_active=True).aggregate(
+            active_lessons=models.Count('id'),
+            video_lessons=models.Count('id', filter=has_video),
+            exercise_lessons=models.Count('id', filter=has_exercise),
+            total_duration=models.Sum('duration'),
+        )
+        counts['total_duration'] = counts['total_duration'] or 0
+        CourseContentStats.objects.update_or_create(course_id=course_id, defaults=counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_course_level_course_category'),
+        ('admin_dashboard', '0018_fix_null_scores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseContentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_lessons', models.PositiveIntegerField(default=0)),
+                ('video_lessons', models.PositiveIntegerField(default=0, help_text='Active lessons with a video')),
+                ('exercise_lessons', models.PositiveIntegerField(default=0, help_text='Active lessons with an exercise')),
+                ('total_duration', models.PositiveIntegerField(default=0, help_text='Sum of active lesson durations in minutes')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='content_stats', to='accounts.course')),
+            ],
+            options={
+                'verbose_name': 'Course Content Stats',
+                'verbose_name_plural': 'Course Content Stats',
+            },
+        ),
+        migrations.RunPython(backfill_course_stats, migrations.RunPython.noop),
+    ]
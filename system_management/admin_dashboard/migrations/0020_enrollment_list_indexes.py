@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_course_level_course_category'),
+        ('admin_dashboard', '0019_coursecontentstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['-enrolled_at', '-id'], name='enrollment_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['status', '-enrolled_at', '-id'], name='enrollment_status_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:26
+
+import re
+
+from django.db import migrations, models
+
+
+def generate_lesson_slug(text):
+    # Frozen copy of admin_dashboard.models.generate_lesson_slug as of this migration
+    if not text:
+        return ''
+    slug = re.sub(r'[^\w\s-]', '', text.lower())
+    slug = re.sub(r'\s+', '-', slug)
+    slug = re.sub(r'--+', '-', slug)
+    return slug.strip('- ')
+
+
+def backfill_lesson_slugs(apps, schema_editor):
+    Lesson = apps.get_model('admin_dashboard', 'Lesson')
+
+    # Active lessons claim the plain slug first, in lesson order, like the old title scan
+    taken = set()
+    lessons = Lesson.objects.order_by('course_id', '-is_active', 'order', 'id').only('id', 'course_id', 'title')
+    for lesson in lessons.iterator():
+        base = generate_lesson_slug(lesson.title)[:240] or 'lesson'
+        slug, suffix = base, 1
+        while (lesson.course_id, slug) in taken:
+            suffix += 1
+            slug = f"{base}-{suffix}"
+        taken.add((lesson.course_id, slug))
+        Lesson.objects.filter(pk=lesson.pk).update(slug=slug)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_course_level_course_category'),
+        ('admin_dashboard', '0020_enrollment_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='slug',
+            field=models.CharField(blank=True, help_text='URL slug, unique within the course', max_length=255),
+        ),
+        migrations.RunPython(backfill_lesson_slugs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('course', 'slug'), name='unique_lesson_slug_per_course'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0021_lesson_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='video_renditions',
+            field=models.JSONField(blank=True, default=list, help_text='Lower-bitrate copies: [{height, bitrate, url}], filled by the video worker'),
+        ),
+        migrations.CreateModel(
+            name='VideoTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_path', models.CharField(help_text='Path relative to MEDIA_ROOT, as in Lesson.video_url', max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='video_tasks', to='admin_dashboard.lesson')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='video_task_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0023_video_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='hls_playlist',
+            field=models.CharField(blank=True, help_text='HLS master playlist relative to MEDIA_ROOT, filled by the video worker', max_length=500),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+# Frozen copy of admin_dashboard.models.build_video_descriptor and its helpers
+# as of this migration, so later changes to them do not alter the backfill.
+
+DEFAULT_VIDEO_REQUIREMENTS = {
+    'min_watch_percentage': 90,  # 90% of video must be watched
+    'min_engagement_score': 7,   # Engagement score out of 10
+    'min_time_percentage': 50,   # Minimum 50% of video duration in actual time
+    'allow_skipping': False,     # Whether students can skip around
+    'require_continuous': False  # Whether video must be watched continuously
+}
+
+MEDIA_HOST = 'http://localhost:8000'
+YOUTUBE_EMBED = 'https://www.youtube.com/embed/{}?enablejsapi=1&origin=http://localhost:5173&rel=0'
+VIMEO_EMBED = 'https://player.vimeo.com/video/{}?title=0&byline=0&portrait=0'
+
+
+def _youtube_embed_url(url):
+    if 'youtube.com/embed/' in url.lower():
+        return url
+    video_id = None
+    if 'youtube.com/watch?v=' in url:
+        video_id = url.split('youtube.com/watch?v=')[1].split('&')[0]
+    elif 'youtu.be/' in url:
+        video_id = url.split('youtu.be/')[1].split('?')[0]
+    return YOUTUBE_EMBED.format(video_id) if video_id else url
+
+
+def _vimeo_embed_url(url):
+    if 'player.vimeo.com/video/' in url.lower():
+        return url
+    video_id = None
+    if 'vimeo.com/' in url:
+        video_id = url.split('vimeo.com/')[1].split('/')[0].split('?')[0]
+    return VIMEO_EMBED.format(video_id) if video_id else url
+
+
+def build_video_descriptor(lesson):
+    url = (lesson.video_url or '').strip()
+    if not url or url in ('null', 'undefined'):
+        return {}
+
+    url_lower = url.lower()
+    video_format = lesson.video_format or 'mp4'
+    descriptor = {'url': url}
+
+    if 'youtube.com' in url_lower or 'youtu.be' in url_lower:
+        descriptor.update(source='youtube', format='youtube', player_type='iframe', mime_type=None,
+                          embed_url=_youtube_embed_url(url), requires_proxy=False)
+    elif 'vimeo.com' in url_lower:
+        descriptor.update(source='vimeo', format='vimeo', player_type='iframe', mime_type=None,
+                          embed_url=_vimeo_embed_url(url), requires_proxy=False)
+    elif url_lower.startswith(('http://', 'https://')) and 'localhost' not in url_lower:
+        descriptor.update(source='external', format=video_format, player_type='html5',
+                          mime_type=f'video/{video_format}', streaming_url=url, requires_proxy=False)
+    else:
+        if url.startswith('/media/') or url.startswith(('http://', 'https://')):
+            path = url
+        elif url.startswith('videos/'):
+            path = f'/media/{url}'
+        else:
+            path = f'/media/videos/{url}'
+        streaming_url = path if path.startswith('http') else f'{MEDIA_HOST}{path}'
+        descriptor.update(source='local', format=video_format, player_type='html5',
+                          mime_type=f'video/{video_format}', streaming_url=streaming_url, requires_proxy=True)
+
+    if lesson.hls_playlist:
+        # Adaptive stream; streaming_url stays as the progressive fallback
+        descriptor['hls_url'] = f'{MEDIA_HOST}/media/{lesson.hls_playlist}'
+
+    requirements = dict(DEFAULT_VIDEO_REQUIREMENTS)
+    requirements.update(lesson.video_requirements or {})
+    descriptor['requirements'] = requirements
+    return descriptor
+
+
+def backfill_video_descriptors(apps, schema_editor):
+    Lesson = apps.get_model('admin_dashboard', 'Lesson')
+    lessons = Lesson.objects.exclude(video_url__isnull=True).exclude(video_url='').only(
+        'id', 'video_url', 'video_format', 'video_requirements', 'hls_playlist'
+    )
+    for lesson in lessons.iterator():
+        Lesson.objects.filter(pk=lesson.pk).update(video_descriptor=build_video_descriptor(lesson))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0024_lesson_hls_playlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='video_descriptor',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Player configuration derived from the video fields on save (build_video_descriptor)'),
+        ),
+        migrations.RunPython(backfill_video_descriptors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_course_level_course_category'),
+        ('admin_dashboard', '0025_lesson_video_descriptor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='revenuereport',
+            name='is_stale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', 'created_at'], name='transaction_status_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='revenuereport',
+            constraint=models.UniqueConstraint(fields=('report_type', 'period_start'), name='unique_revenue_report_period'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_dashboard', '0026_revenue_report_periods'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videotask',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
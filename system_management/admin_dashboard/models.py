@@ -1,19 +1,165 @@
 # admin models
 from accounts.models import Course, CustomUser, UserProfile
 from django.db import models
-from django.db import transaction
+from django.db import connections, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from decimal import Decimal
+from datetime import timedelta
+from contextlib import contextmanager
+import copy
 import json
+import re
+import threading
+import uuid
 from django.db import models
 from django.core.exceptions import ValidationError
 
-class Lesson(models.Model):
+
+def generate_lesson_slug(text):
+    """Slug matching the frontend's generateSlug function"""
+    if not text:
+        return ''
+    slug = re.sub(r'[^\w\s-]', '', text.lower())
+    slug = re.sub(r'\s+', '-', slug)
+    slug = re.sub(r'--+', '-', slug)
+    return slug.strip('- ')
+
+
+class DirtyFieldsMixin:
+    """
+    Remembers the column values an instance was loaded with, so changed
+    fields can be found without reading the row again. Only instances that
+    come from the database (or have been saved) are tracked.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, attnames=None):
+        loaded = {} if attnames is None else getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (attnames is None or field.attname in attnames):
+                value = self.__dict__[field.attname]
+                # JSON values can be changed in place, so keep a copy
+                loaded[field.attname] = copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+        self._loaded_values = loaded
+
+    def field_changed(self, attname):
+        """True/False for a tracked field, None when its loaded value is unknown"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or attname not in loaded:
+            return None
+        return self.__dict__.get(attname, loaded[attname]) != loaded[attname]
+
+    def get_dirty_fields(self):
+        """Names of the non-pk columns changed since loading, or None for an untracked instance"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__
+            and (field.attname not in loaded or self.__dict__[field.attname] != loaded[field.attname])
+        ]
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None:
+            self._snapshot()
+        else:
+            self._snapshot({self._meta.get_field(name).attname for name in fields})
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot()
+
+
+DEFAULT_VIDEO_REQUIREMENTS = {
+    'min_watch_percentage': 90,  # 90% of video must be watched
+    'min_engagement_score': 7,   # Engagement score out of 10
+    'min_time_percentage': 50,   # Minimum 50% of video duration in actual time
+    'allow_skipping': False,     # Whether students can skip around
+    'require_continuous': False  # Whether video must be watched continuously
+}
+
+MEDIA_HOST = 'http://localhost:8000'
+YOUTUBE_EMBED = 'https://www.youtube.com/embed/{}?enablejsapi=1&origin=http://localhost:5173&rel=0'
+VIMEO_EMBED = 'https://player.vimeo.com/video/{}?title=0&byline=0&portrait=0'
+
+
+def _youtube_embed_url(url):
+    if 'youtube.com/embed/' in url.lower():
+        return url
+    video_id = None
+    if 'youtube.com/watch?v=' in url:
+        video_id = url.split('youtube.com/watch?v=')[1].split('&')[0]
+    elif 'youtu.be/' in url:
+        video_id = url.split('youtu.be/')[1].split('?')[0]
+    return YOUTUBE_EMBED.format(video_id) if video_id else url
+
+
+def _vimeo_embed_url(url):
+    if 'player.vimeo.com/video/' in url.lower():
+        return url
+    video_id = None
+    if 'vimeo.com/' in url:
+        video_id = url.split('vimeo.com/')[1].split('/')[0].split('?')[0]
+    return VIMEO_EMBED.format(video_id) if video_id else url
+
+
+def build_video_descriptor(lesson):
+    """
+    Everything the player needs that can be worked out from the lesson's video
+    fields: normalized source, embed/streaming URLs and completion requirements.
+    Stored in Lesson.video_descriptor on save so serializers only read fields.
+    """
+    url = (lesson.video_url or '').strip()
+    if not url or url in ('null', 'undefined'):
+        return {}
+
+    url_lower = url.lower()
+    video_format = lesson.video_format or 'mp4'
+    descriptor = {'url': url}
+
+    if 'youtube.com' in url_lower or 'youtu.be' in url_lower:
+        descriptor.update(source='youtube', format='youtube', player_type='iframe', mime_type=None,
+                          embed_url=_youtube_embed_url(url), requires_proxy=False)
+    elif 'vimeo.com' in url_lower:
+        descriptor.update(source='vimeo', format='vimeo', player_type='iframe', mime_type=None,
+                          embed_url=_vimeo_embed_url(url), requires_proxy=False)
+    elif url_lower.startswith(('http://', 'https://')) and 'localhost' not in url_lower:
+        descriptor.update(source='external', format=video_format, player_type='html5',
+                          mime_type=f'video/{video_format}', streaming_url=url, requires_proxy=False)
+    else:
+        if url.startswith('/media/') or url.startswith(('http://', 'https://')):
+            path = url
+        elif url.startswith('videos/'):
+            path = f'/media/{url}'
+        else:
+            path = f'/media/videos/{url}'
+        streaming_url = path if path.startswith('http') else f'{MEDIA_HOST}{path}'
+        descriptor.update(source='local', format=video_format, player_type='html5',
+                          mime_type=f'video/{video_format}', streaming_url=streaming_url, requires_proxy=True)
+
+    if lesson.hls_playlist:
+        # Adaptive stream; streaming_url stays as the progressive fallback
+        descriptor['hls_url'] = f'{MEDIA_HOST}/media/{lesson.hls_playlist}'
+
+    requirements = dict(DEFAULT_VIDEO_REQUIREMENTS)
+    requirements.update(lesson.video_requirements or {})
+    descriptor['requirements'] = requirements
+    return descriptor
+
+
+class Lesson(DirtyFieldsMixin, models.Model):
 
     VIDEO_SOURCE_CHOICES = [
         ('local', 'Local File'),
@@ -45,6 +191,7 @@ class Lesson(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     exercise = models.JSONField(blank=True, null=True)
     duration = models.PositiveIntegerField(default=30, help_text="Duration in minutes")
+    slug = models.CharField(max_length=255, blank=True, help_text="URL slug, unique within the course")
 
     # ENHANCED: Video format detection
     video_source = models.CharField(
@@ -83,6 +230,22 @@ class Lesson(models.Model):
     video_duration = models.IntegerField(default=0, help_text="Duration in seconds")
     video_file_size = models.BigIntegerField(default=0, help_text="File size in bytes")
     supports_streaming = models.BooleanField(default=True)
+    video_renditions = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Lower-bitrate copies: [{height, bitrate, url}], filled by the video worker"
+    )
+    hls_playlist = models.CharField(
+        max_length=500,
+        blank=True,
+        help_text="HLS master playlist relative to MEDIA_ROOT, filled by the video worker"
+    )
+    video_descriptor = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Player configuration derived from the video fields on save (build_video_descriptor)"
+    )
 
     # Video access control
     requires_authentication = models.BooleanField(default=True)
@@ -92,44 +255,86 @@ class Lesson(models.Model):
     class Meta:
         ordering = ['order']
         unique_together = ('course', 'order')
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'slug'], name='unique_lesson_slug_per_course'),
+        ]
 
     def __str__(self):
         return f"{self.course.title} - {self.title} (Order: {self.order})"
-    def clean_video_url(self):
-        """Standardize video URLs on save"""
-        if not self.video_url:
+
+    def assign_slug(self):
+        """
+        Keep the slug in step with the title. Titles shared by several lessons
+        in a course get -2, -3... suffixes; an unchanged title costs no query.
+        A -N suffix is only kept while the title stays the same: after a rename
+        it may just be part of the old title ("Intro 2022" -> "Intro").
+        """
+        base = generate_lesson_slug(self.title)[:240] or 'lesson'
+        if self.slug == base:
+            return
+        if (self.slug and self.field_changed('title') is False
+                and re.fullmatch(rf'{re.escape(base)}-\d+', self.slug)):
             return
 
-        url = self.video_url.strip()
+        taken = set(
+            Lesson.objects.filter(course_id=self.course_id, slug__startswith=base)
+            .exclude(pk=self.pk).values_list('slug', flat=True)
+        )
+        slug, suffix = base, 1
+        while slug in taken:
+            suffix += 1
+            slug = f"{base}-{suffix}"
+        self.slug = slug
 
-        # If it's a local file without /media/ prefix, add it
-        if not url.startswith(('http://', 'https://', '/media/')):
-            if not url.startswith('videos/'):
-                url = f'videos/{url}'
-            url = f'/media/{url}'
+    @classmethod
+    def apply_order(cls, course_id, lesson_ids):
+        """
+        Number the given lessons 1..n in list order with a constant number of
+        statements. lesson_ids must cover every lesson of the course.
+        """
+        if not lesson_ids:
+            return 0
+        lessons = cls.objects.filter(course_id=course_id, id__in=lesson_ids)
+        highest = cls.objects.filter(course_id=course_id).aggregate(models.Max('order'))['order__max'] or 0
+        with transaction.atomic():
+            # (course, order) is checked row by row, so lift the rows clear of 1..n first
+            lessons.update(order=models.F('order') + highest)
+            return lessons.update(order=models.Case(
+                *[models.When(id=lesson_id, then=models.Value(position))
+                  for position, lesson_id in enumerate(lesson_ids, start=1)],
+                output_field=models.PositiveIntegerField(),
+            ))
+
+    @classmethod
+    def renumber(cls, course_id):
+        """Close the gaps left by deletions, keeping the current order"""
+        rows = list(cls.objects.filter(course_id=course_id).order_by('order').values_list('id', 'order'))
+        if all(order == position for position, (_, order) in enumerate(rows, start=1)):
+            return 0
+        return cls.apply_order(course_id, [lesson_id for lesson_id, _ in rows])
+
+    @property
+    def has_video(self):
+        return bool(self.video_descriptor or build_video_descriptor(self))
+
+    def get_video_descriptor(self):
+        """The stored descriptor; built on the fly for unsaved lessons"""
+        return self.video_descriptor or build_video_descriptor(self)
 
-        self.video_url = url
     def get_video_config(self):
-        """Get comprehensive video configuration for frontend"""
-        config = {
-            'url': self.video_url,
-            'source': self.video_source,
-            'format': self.video_format,
-            'duration': self.video_duration,
-            'file_size': self.video_file_size,
+        """Get comprehensive video configuration for frontend; None without a video"""
+        descriptor = self.get_video_descriptor()
+        if not descriptor:
+            return None
+
+        config = {key: value for key, value in descriptor.items() if key != 'requirements'}
+        config.update({
+            'duration': self.video_duration or 0,
+            'file_size': self.video_file_size or 0,
             'supports_streaming': self.supports_streaming,
             'requires_authentication': self.requires_authentication,
             'allow_download': self.allow_download,
-        }
-
-        # Add source-specific configuration
-        if self.video_source == 'youtube':
-            config['embed_url'] = self.get_youtube_embed_url()
-        elif self.video_source == 'vimeo':
-            config['embed_url'] = self.get_vimeo_embed_url()
-        elif self.video_source == 'local':
-            config['streaming_url'] = self.get_streaming_url()
-
+        })
         return config
 
     # -----------------------------
@@ -137,18 +342,13 @@ class Lesson(models.Model):
     # -----------------------------
     def get_video_requirements(self):
         """Get video requirements with defaults"""
-        defaults = {
-            'min_watch_percentage': 90,  # 90% of video must be watched
-            'min_engagement_score': 7,   # Engagement score out of 10
-            'min_time_percentage': 50,   # Minimum 50% of video duration in actual time
-            'allow_skipping': False,     # Whether students can skip around
-            'require_continuous': False  # Whether video must be watched continuously
-        }
+        descriptor = self.get_video_descriptor()
+        if descriptor:
+            return dict(descriptor['requirements'])
 
-        if self.video_requirements:
-            defaults.update(self.video_requirements)
-
-        return defaults
+        requirements = dict(DEFAULT_VIDEO_REQUIREMENTS)
+        requirements.update(self.video_requirements or {})
+        return requirements
 
     # -----------------------------
     # Video Format Detection
@@ -196,73 +396,35 @@ class Lesson(models.Model):
         ).exclude(pk=self.pk).exists():
             raise ValidationError("A lesson with this order already exists for this course")
 
-        # Auto-detect video format
-        if self.video_url and self.video_format == 'unknown':
-            self.video_format = self.detect_video_format()
-
-    # -----------------------------
-    # Save
-    # -----------------------------
-    def save(self, *args, **kwargs):
-        self.clean_video_url()  # Add this line
-        if self.video_url and self.video_format == 'unknown':
-            self.video_format = self.detect_video_format()
-        super().save(*args, **kwargs)
-
     # -----------------------------
     # Video Config & Embeds
     # -----------------------------
     def get_video_player_config(self):
         """Get configuration for video player based on format"""
+        descriptor = self.get_video_descriptor()
         config = {
             'type': self.video_format,
             'url': self.video_url,
             'requirements': self.get_video_requirements()
         }
-
-        # Format-specific configurations
-        if self.video_format == 'youtube':
-            config['embed_url'] = self.get_youtube_embed_url()
-        elif self.video_format == 'vimeo':
-            config['embed_url'] = self.get_vimeo_embed_url()
-
+        if descriptor.get('embed_url'):
+            config['embed_url'] = descriptor['embed_url']
         return config
 
     def get_youtube_embed_url(self):
         """Generate YouTube embed URL"""
         if not self.video_url or 'youtube' not in self.video_url:
             return self.video_url
+        return _youtube_embed_url(self.video_url)
 
-        # If it's already an embed URL, return it
-        if 'youtube.com/embed' in self.video_url:
-            return self.video_url
-
-        video_id = None
-        if 'youtube.com/watch?v=' in self.video_url:
-            video_id = self.video_url.split('youtube.com/watch?v=')[1].split('&')[0]
-        elif 'youtu.be/' in self.video_url:
-            video_id = self.video_url.split('youtu.be/')[1].split('?')[0]
-
-        if video_id:
-            return f'https://www.youtube.com/embed/{video_id}?enablejsapi=1&origin=http://localhost:5173'
-        return self.video_url
     def get_vimeo_embed_url(self):
         """Generate Vimeo embed URL"""
         if not self.video_url or 'vimeo' not in self.video_url:
             return self.video_url
-
-        video_id = None
-        if 'vimeo.com/' in self.video_url:
-            video_id = self.video_url.split('vimeo.com/')[1].split('/')[0]
-        elif 'player.vimeo.com/video/' in self.video_url:
-            video_id = self.video_url.split('player.vimeo.com/video/')[1].split('?')[0]
-
-        if video_id:
-            return f'https://player.vimeo.com/video/{video_id}'
-        return self.video_url
+        return _vimeo_embed_url(self.video_url)
 
     def get_streaming_url(self):
-        """Get streaming URL for local files"""
+        """Get the progressive streaming URL for local files; see get_hls_url for the adaptive one"""
         if not self.video_url or not self.video_url.startswith('/media/'):
             return self.video_url
 
@@ -270,6 +432,12 @@ class Lesson(models.Model):
         filename = self.video_url.replace('/media/videos/', '')
         return f'http://localhost:8000/media/videos/{filename}'
 
+    def get_hls_url(self):
+        """Absolute URL of the HLS master playlist, or None if the video is not packaged"""
+        if not self.hls_playlist:
+            return None
+        return f'http://localhost:8000/media/{self.hls_playlist}'
+
     def detect_video_source(self):
         """Auto-detect video source from URL"""
         if not self.video_url:
@@ -289,20 +457,29 @@ class Lesson(models.Model):
             return 'external'
 
     def _has_video_url_changed(self):
-        """Check if video URL has changed"""
-        if not self.pk:
-            return True
-        try:
-            original = Lesson.objects.get(pk=self.pk)
-            return original.video_url != self.video_url
-        except Lesson.DoesNotExist:
+        """Check if video URL has changed since the lesson was loaded"""
+        if self._state.adding or not self.pk:
             return True
+        changed = self.field_changed('video_url')
+        if changed is not None:
+            return changed
+        # Built by hand or loaded with video_url deferred: ask the database
+        return not Lesson.objects.filter(pk=self.pk, video_url=self.video_url).exists()
 
+    # -----------------------------
+    # Save
+    # -----------------------------
     def save(self, *args, **kwargs):
+        video_changed = bool(self.video_url or self.hls_playlist) and self._has_video_url_changed()
+        if video_changed and self.pk:
+            # Renditions and HLS output describe the previous file; the video worker rebuilds them
+            self.video_renditions = []
+            self.hls_playlist = ''
+
         # Always detect video_source from video_url if video_url is set
         if self.video_url:
             # Check if video_url has changed
-            if self._has_video_url_changed():
+            if video_changed:
                 self.video_source = self.detect_video_source()
                 # Reset video_format to be re-determined
                 self.video_format = None
@@ -322,8 +499,120 @@ class Lesson(models.Model):
                 else:
                     self.video_format = 'direct'
 
+        self.assign_slug()
+        self.video_descriptor = build_video_descriptor(self)
+
+        # A loaded lesson writes only the columns that changed
+        if not args and not self._state.adding and kwargs.get('update_fields') is None \
+                and not kwargs.get('force_insert'):
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                kwargs['update_fields'] = dirty + ['updated_at']
         super().save(*args, **kwargs)
 
+
+# Lesson filters shared by the content counters and the catalog queries
+LESSON_HAS_VIDEO = (
+    models.Q(video_url__isnull=False) &
+    ~models.Q(video_url='') &
+    ~models.Q(video_url='null')
+)
+
+
+# Mirrors `if lesson.exercise:` for the values the admin endpoints store
+LESSON_HAS_EXERCISE = (
+    models.Q(exercise__isnull=False) &
+    ~models.Q(exercise={}) &
+    ~models.Q(exercise=[]) &
+    ~models.Q(exercise='')
+)
+
+
+class CourseContentStats(models.Model):
+    """Denormalized per-course lesson counters, kept in sync on lesson writes"""
+    course = models.OneToOneField("accounts.Course", on_delete=models.CASCADE, related_name='content_stats')
+    active_lessons = models.PositiveIntegerField(default=0)
+    video_lessons = models.PositiveIntegerField(default=0, help_text="Active lessons with a video")
+    exercise_lessons = models.PositiveIntegerField(default=0, help_text="Active lessons with an exercise")
+    total_duration = models.PositiveIntegerField(default=0, help_text="Sum of active lesson durations in minutes")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Course Content Stats"
+        verbose_name_plural = "Course Content Stats"
+
+    def __str__(self):
+        return f"Stats for course {self.course_id}"
+
+    @staticmethod
+    def compute(course_id):
+        """Count the active lessons of a course in a single aggregate query"""
+        counts = Lesson.objects.filter(course_id=course_id, is_active=True).aggregate(
+            active_lessons=models.Count('id'),
+            video_lessons=models.Count('id', filter=LESSON_HAS_VIDEO),
+            exercise_lessons=models.Count('id', filter=LESSON_HAS_EXERCISE),
+            total_duration=models.Sum('duration'),
+        )
+        counts['total_duration'] = counts['total_duration'] or 0
+        return counts
+
+    @classmethod
+    def refresh(cls, course_id, create=True):
+        """
+        Recompute the counters for a course and push the new lesson total
+        to its progress rows. With create=False only an existing row is
+        updated, which is what delete cascades need.
+        """
+        from student_dashboard.models import CourseProgress
+
+        counts = cls.compute(course_id)
+        # Keep the per-student progress rows on the same lesson total
+        CourseProgress.objects.filter(course_id=course_id).update(total_lessons=counts['active_lessons'])
+
+        if not create:
+            cls.objects.filter(course_id=course_id).update(updated_at=timezone.now(), **counts)
+            return None
+        stats, _ = cls.objects.update_or_create(course_id=course_id, defaults=counts)
+        return stats
+
+    @classmethod
+    def for_course(cls, course):
+        """
+        Return the counters of a course. Missing counters are computed but
+        not saved, so read paths never write; the next lesson change stores them.
+        """
+        try:
+            return course.content_stats
+        except cls.DoesNotExist:
+            stats = cls(course=course, **cls.compute(course.pk))
+            course.content_stats = stats
+            return stats
+
+
+@receiver(post_save, sender=Course)
+def create_course_content_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        CourseContentStats.objects.get_or_create(course=instance)
+
+
+# Lesson columns the content counters are computed from
+CONTENT_STATS_FIELDS = {'course', 'course_id', 'is_active', 'video_url', 'exercise', 'duration'}
+
+
+@receiver(post_save, sender=Lesson)
+def refresh_course_stats_on_lesson_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if not created and update_fields is not None and CONTENT_STATS_FIELDS.isdisjoint(update_fields):
+        return
+    CourseContentStats.refresh(instance.course_id)
+
+
+@receiver(post_delete, sender=Lesson)
+def refresh_course_stats_on_lesson_delete(sender, instance, **kwargs):
+    CourseContentStats.refresh(instance.course_id, create=False)
+
+
 class Enrollment(models.Model):
     PENDING = 'pending'
     APPROVED = 'approved'
@@ -347,6 +636,11 @@ class Enrollment(models.Model):
     class Meta:
         unique_together = ('student', 'course')
         ordering = ['-enrolled_at']
+        indexes = [
+            # Keyset pagination and status filtering in the admin enrollment list
+            models.Index(fields=['-enrolled_at', '-id'], name='enrollment_recent_idx'),
+            models.Index(fields=['status', '-enrolled_at', '-id'], name='enrollment_status_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student.email} - {self.course.title}"
@@ -369,33 +663,24 @@ class Enrollment(models.Model):
 
     @property
     def progress(self):
-        """Calculate progress based on completed lessons"""
-        total_lessons = Lesson.objects.filter(course=self.course).count()
-        if total_lessons == 0:
-            return 0
-
-        # Use string reference to avoid circular import
-        from student_dashboard.models import StudentExercise
-        completed_lessons = StudentExercise.objects.filter(
-            student=self.student,
-            lesson__course=self.course,
-            completed=True
-        ).count()
-
-        return round((completed_lessons / total_lessons) * 100, 1)
+        """Progress based on completed lessons, read from the stored progress row"""
+        return self.course_progress.percentage
 
     @property
     def exercises_completed(self):
-        from student_dashboard.models import StudentExercise
-        return StudentExercise.objects.filter(
-            student=self.student,
-            lesson__course=self.course,
-            completed=True
-        ).count()
+        return self.course_progress.completed_lessons
 
     @property
     def exercises_total(self):
-        return Lesson.objects.filter(course=self.course).count()
+        return self.course_progress.total_lessons
+
+    @property
+    def course_progress(self):
+        # Use string reference to avoid circular import
+        from student_dashboard.models import CourseProgress
+        if not hasattr(self, '_course_progress'):
+            self._course_progress = CourseProgress.for_student(self.student_id, self.course_id)
+        return self._course_progress
 
     @property
     def student_name(self):
@@ -413,6 +698,7 @@ class Enrollment(models.Model):
     def course_code(self):
         return self.course.code
 
+
 class AutoApprovalSettings(models.Model):
     enabled = models.BooleanField(default=False)
     updated_at = models.DateTimeField(auto_now=True)
@@ -425,6 +711,7 @@ class AutoApprovalSettings(models.Model):
     def __str__(self):
         return f"Auto-Approval {'Enabled' if self.enabled else 'Disabled'}"
 
+
 # Revenue Analytics Models
 class Transaction(models.Model):
     TRANSACTION_STATUS_CHOICES = [
@@ -467,6 +754,10 @@ class Transaction(models.Model):
     class Meta:
         db_table = 'revenue_transaction'
         ordering = ['-created_at']
+        indexes = [
+            # Period roll-ups and the live revenue window
+            models.Index(fields=['status', 'created_at'], name='transaction_status_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_id} - {self.course.title}"
@@ -489,6 +780,25 @@ class Transaction(models.Model):
         super().save(*args, **kwargs)
 
 
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_admin_statistics(sender, raw=False, **kwargs):
+    if raw:
+        return
+    # Only creating or deleting a user changes the user count; logins save last_login
+    if sender is CustomUser and kwargs.get('created') is False:
+        return
+    from .statistics import invalidate_statistics
+    invalidate_statistics()
+
+
 class TeacherPayout(models.Model):
 
     PAYOUT_STATUS_CHOICES = [
@@ -552,15 +862,31 @@ class RevenueReport(models.Model):
     currency_breakdown = models.JSONField(default=dict)  # { 'USD': 1000, 'ZAR': 15000 }
     top_courses = models.JSONField(default=list)  # [ {'course_id': 1, 'revenue': 500} ]
 
+    # Set when a transaction in the period changes after the report was generated
+    is_stale = models.BooleanField(default=False)
     generated_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'revenue_report'
         ordering = ['-period_end']
+        constraints = [
+            models.UniqueConstraint(fields=['report_type', 'period_start'], name='unique_revenue_report_period'),
+        ]
 
     def __str__(self):
         return f"{self.report_type.capitalize()} Report - {self.period_end}"
 
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def mark_revenue_reports_stale(sender, instance, raw=False, **kwargs):
+    """A late or changed transaction only invalidates the reports covering its day"""
+    if raw or instance.created_at is None:
+        return
+    day = timezone.localdate(instance.created_at)
+    RevenueReport.objects.filter(period_start__lte=day, period_end__gte=day, is_stale=False).update(is_stale=True)
+
+
 class LessonProgress(models.Model):
     student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='lesson_progress')
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='progress')
@@ -719,3 +1045,152 @@ class VideoAnalytics(models.Model):
             analytics.save()
 
         return analytics
+
+
+class BackgroundTask(models.Model):
+    """
+    A job in a database-backed queue, run by a management command polling
+    claim_next(). Failed runs are retried with exponential backoff. Long
+    runs report through keep_alive(), so a task is only requeued once its
+    worker has stopped reporting, however long the run itself takes.
+    """
+    HEARTBEAT_SECONDS = 60
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    MAX_ATTEMPTS = 3
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        abstract = True
+        ordering = ['created_at']
+
+    @classmethod
+    def claim_next(cls):
+        """
+        Take the oldest due task. The conditional update makes the claim safe
+        when several workers poll the same table.
+        """
+        while True:
+            now = timezone.now()
+            task_id = cls.objects.filter(status='pending', run_after__lte=now).order_by(
+                'run_after', 'id'
+            ).values_list('id', flat=True).first()
+            if task_id is None:
+                return None
+            claimed = cls.objects.filter(id=task_id, status='pending').update(
+                status='running', started_at=now, heartbeat_at=now, attempts=models.F('attempts') + 1
+            )
+            if claimed:
+                return cls.objects.get(id=task_id)
+
+    @classmethod
+    def requeue_stale(cls, older_than):
+        """Put back tasks whose worker has not reported since `older_than`, i.e. died mid-run"""
+        silent = models.Q(heartbeat_at__lt=older_than) | models.Q(heartbeat_at__isnull=True, started_at__lt=older_than)
+        return cls.objects.filter(silent, status='running').update(status='pending')
+
+    @contextmanager
+    def keep_alive(self):
+        """Report the task as running every HEARTBEAT_SECONDS until the block exits"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.HEARTBEAT_SECONDS):
+                type(self).objects.filter(pk=self.pk, status='running').update(heartbeat_at=timezone.now())
+            connections.close_all()
+
+        thread = threading.Thread(target=beat, name=f'{type(self).__name__}-{self.pk}-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def finish(self, result):
+        self.status = 'done'
+        self.result = result
+        self.error = ''
+        self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'result', 'error', 'finished_at'])
+
+    def fail(self, error):
+        """Retry with exponential backoff until MAX_ATTEMPTS is reached"""
+        self.error = str(error)
+        if self.attempts < self.MAX_ATTEMPTS:
+            self.status = 'pending'
+            self.run_after = timezone.now() + timedelta(minutes=2 ** self.attempts)
+        else:
+            self.status = 'failed'
+            self.finished_at = timezone.now()
+        self.save(update_fields=['status', 'error', 'run_after', 'finished_at'])
+
+
+class VideoTask(BackgroundTask):
+    """
+    Background processing of an uploaded video file: probe, fast-start remux
+    and renditions. Queued by upload_lesson_video, run by process_video_tasks.
+    """
+    lesson = models.ForeignKey(Lesson, on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='video_tasks')
+    video_path = models.CharField(max_length=500, help_text="Path relative to MEDIA_ROOT, as in Lesson.video_url")
+
+    class Meta(BackgroundTask.Meta):
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='video_task_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.video_path} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, video_path, lesson=None):
+        return cls.objects.create(video_path=video_path, lesson=lesson)
+
+
+class VideoUpload(models.Model):
+    """
+    A resumable chunked video upload. Chunks are appended to a part file in
+    VIDEO_UPLOAD_TEMP_DIR; on completion the file is moved into the lesson's
+    video folder.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='video_uploads')
+    lesson = models.ForeignKey(Lesson, on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='video_uploads')
+    uploaded_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256 of the whole file, hex")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    video_url = models.CharField(max_length=500, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_size}/{self.total_size})"
@@ -0,0 +1,231 @@
+# admin_dashboard/revenue_reports.py
+"""
+Roll-ups of completed transactions into RevenueReport rows.
+
+Every closed period of a report type gets one row, computed by a single
+query grouped by period, currency, course and teacher. Runs are
+incremental: only periods without a row, and rows marked stale because a
+transaction in their period changed, are computed. The current period is
+never reported; readers combine closed reports with a live aggregate of
+the open window.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DateField, Min, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import RevenueReport, Transaction
+
+
+HOSTING_FEE_PER_TEACHER = 200  # R200 per teacher with sales
+
+REPORT_TYPES = ['daily', 'weekly', 'monthly', 'quarterly', 'yearly']
+SCHEDULED_TYPES = ['daily', 'weekly', 'monthly']
+
+TRUNC_KIND = {'daily': 'day', 'weekly': 'week', 'monthly': 'month', 'quarterly': 'quarter', 'yearly': 'year'}
+
+TOP_COURSES = 5
+CENT = Decimal('0.01')
+
+
+def period_start(report_type, day):
+    """First day of the period containing `day` (weeks start on Monday, like TruncWeek)"""
+    if report_type == 'daily':
+        return day
+    if report_type == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if report_type == 'monthly':
+        return day.replace(day=1)
+    if report_type == 'quarterly':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day.replace(month=1, day=1)
+
+
+def next_period(report_type, start):
+    if report_type == 'daily':
+        return start + timedelta(days=1)
+    if report_type == 'weekly':
+        return start + timedelta(days=7)
+    months = {'monthly': 1, 'quarterly': 3, 'yearly': 12}[report_type]
+    month = start.month - 1 + months
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def closed_periods(report_type, first_day, today):
+    """Starts of the periods from the one containing first_day up to, not including, today's"""
+    current = period_start(report_type, today)
+    start = period_start(report_type, first_day)
+    periods = []
+    while start < current:
+        periods.append(start)
+        start = next_period(report_type, start)
+    return periods
+
+
+def _spans(report_type, periods):
+    """Merge sorted period starts into (start, end) runs of consecutive periods"""
+    spans = []
+    for start in periods:
+        end = next_period(report_type, start)
+        if spans and spans[-1][1] == start:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def _rollup(report_type, periods):
+    """One grouped query over `periods`; returns unsaved reports keyed by period start"""
+    within = Q()
+    for start, end in _spans(report_type, periods):
+        within |= Q(created_at__gte=_aware(start), created_at__lt=_aware(end))
+    groups = (
+        Transaction.objects
+        .filter(within, status='completed')
+        .annotate(period=Trunc('created_at', TRUNC_KIND[report_type], output_field=DateField()))
+        .values('period', 'currency', 'course_id', 'course__title', 'teacher_id')
+        .annotate(revenue=Sum('amount'), transactions=Count('id'),
+                  commission=Sum('platform_fee'), payouts=Sum('teacher_payout'))
+        .order_by()
+    )
+
+    totals = {start: {'revenue': Decimal('0'), 'transactions': 0, 'commission': Decimal('0'),
+                      'payouts': Decimal('0'), 'currencies': {}, 'courses': {}, 'teachers': set()}
+              for start in periods}
+    for group in groups:
+        period = totals.get(group['period'])
+        if period is None:
+            continue
+        period['revenue'] += group['revenue']
+        period['transactions'] += group['transactions']
+        period['commission'] += group['commission']
+        period['payouts'] += group['payouts']
+        period['currencies'][group['currency']] = period['currencies'].get(group['currency'], 0) + group['revenue']
+        course = period['courses'].setdefault(group['course_id'], {
+            'course_id': group['course_id'], 'title': group['course__title'],
+            'revenue': Decimal('0'), 'transactions': 0,
+        })
+        course['revenue'] += group['revenue']
+        course['transactions'] += group['transactions']
+        if group['teacher_id'] is not None:
+            period['teachers'].add(group['teacher_id'])
+
+    reports = {}
+    for start, period in totals.items():
+        hosting_fees = Decimal(len(period['teachers']) * HOSTING_FEE_PER_TEACHER)
+        average = period['revenue'] / period['transactions'] if period['transactions'] else Decimal('0')
+        top_courses = sorted(period['courses'].values(), key=lambda course: course['revenue'], reverse=True)
+        reports[start] = RevenueReport(
+            report_type=report_type,
+            period_start=start,
+            period_end=next_period(report_type, start) - timedelta(days=1),
+            total_revenue=period['revenue'],
+            total_transactions=period['transactions'],
+            average_transaction_value=average.quantize(CENT),
+            platform_commission=period['commission'],
+            teacher_payouts=period['payouts'],
+            hosting_fees=hosting_fees,
+            net_profit=period['commission'] + hosting_fees,
+            currency_breakdown={currency: float(amount) for currency, amount in period['currencies'].items()},
+            top_courses=[dict(course, revenue=float(course['revenue'])) for course in top_courses[:TOP_COURSES]],
+            is_stale=False,
+        )
+    return reports
+
+
+def generate_reports(report_type, today=None, rebuild=False):
+    """
+    Write the reports of `report_type` that are missing or stale. With
+    rebuild=True every closed period is recomputed. Returns the number of
+    reports written.
+    """
+    today = today or timezone.localdate()
+    first = Transaction.objects.filter(status='completed').aggregate(first=Min('created_at'))['first']
+    if first is None:
+        return 0
+
+    periods = closed_periods(report_type, timezone.localdate(first), today)
+    existing = dict(
+        RevenueReport.objects.filter(report_type=report_type).values_list('period_start', 'is_stale')
+    )
+    todo = [start for start in periods if rebuild or existing.get(start, True)]
+    if not todo:
+        return 0
+
+    fields = ['period_end', 'total_revenue', 'total_transactions', 'average_transaction_value',
+              'platform_commission', 'teacher_payouts', 'hosting_fees', 'net_profit',
+              'currency_breakdown', 'top_courses', 'is_stale', 'generated_at']
+    now = timezone.now()
+    with transaction.atomic():
+        # Lock first, so a transaction changing meanwhile marks the fresh row stale again
+        stored = {
+            report.period_start: report
+            for report in RevenueReport.objects.select_for_update().filter(
+                report_type=report_type, period_start__in=todo
+            )
+        }
+        reports = _rollup(report_type, todo)
+        to_update, to_create = [], []
+        for start, report in reports.items():
+            if start in stored:
+                report.pk = stored[start].pk
+                report.generated_at = now
+                to_update.append(report)
+            else:
+                to_create.append(report)
+        RevenueReport.objects.bulk_update(to_update, fields)
+        RevenueReport.objects.bulk_create(to_create)
+    return len(reports)
+
+
+def revenue_totals_from_reports(today=None):
+    """
+    Totals of completed revenue from closed monthly reports plus a live
+    aggregate of whatever they do not cover: the current month, stale or
+    missing months, and anything before the first report.
+    """
+    today = today or timezone.localdate()
+    current = period_start('monthly', today)
+    reports = list(
+        RevenueReport.objects.filter(report_type='monthly', period_start__lt=current)
+        .order_by('period_start')
+        .values('period_start', 'is_stale', 'total_revenue', 'platform_commission', 'teacher_payouts')
+    )
+
+    # Use the run of fresh, consecutive months from the first report
+    covered = []
+    for report in reports:
+        follows = not covered or report['period_start'] == next_period('monthly', covered[-1]['period_start'])
+        if report['is_stale'] or not follows:
+            break
+        covered.append(report)
+
+    totals = {
+        'total_revenue': sum((report['total_revenue'] for report in covered), Decimal('0')),
+        'platform_commission': sum((report['platform_commission'] for report in covered), Decimal('0')),
+        'teacher_payouts': sum((report['teacher_payouts'] for report in covered), Decimal('0')),
+    }
+    live = Transaction.objects.filter(status='completed')
+    if covered:
+        covered_from = _aware(covered[0]['period_start'])
+        covered_to = _aware(next_period('monthly', covered[-1]['period_start']))
+        live = live.filter(Q(created_at__lt=covered_from) | Q(created_at__gte=covered_to))
+
+    month = _aware(current)
+    live_totals = live.aggregate(
+        total_revenue=Sum('amount'),
+        platform_commission=Sum('platform_fee'),
+        teacher_payouts=Sum('teacher_payout'),
+        monthly_revenue=Sum('amount', filter=Q(created_at__gte=month)),
+    )
+    for name in totals:
+        totals[name] += live_totals[name] or 0
+    totals['monthly_revenue'] = live_totals['monthly_revenue'] or 0
+    return totals
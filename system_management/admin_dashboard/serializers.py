@@ -266,14 +266,10 @@ class EnrollmentSerializer(serializers.ModelSerializer):
         return obj.student.email
 
     def get_exercises_completed(self, obj):
-        return StudentExercise.objects.filter(
-            student=obj.student,
-            lesson__course=obj.course,
-            completed=True
-        ).count()
+        return obj.exercises_completed
 
     def get_exercises_total(self, obj):
-        return Lesson.objects.filter(course=obj.course).count()
+        return obj.exercises_total
 
 
 class EnrollmentCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,103 @@
+# admin_dashboard/statistics.py
+"""
+Figures for the admin dashboard pages.
+
+Each group of figures is one conditional-aggregate query, cached until a
+user, course, enrollment or transaction changes: the signal handlers in
+models.py bump a shared version and every worker recomputes on its next
+read. Bulk queryset updates send no signals, so the views that run them
+invalidate explicitly and the timeout is only a backstop.
+
+The version lives in the default cache, which settings.CACHES points at a
+store every worker process shares, so a bump is seen by all of them on
+their next read. With a per-process cache backend the other workers would
+keep serving their copies for up to CACHE_TIMEOUT (five minutes).
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from accounts.models import Course, CustomUser, UserProfile
+from .models import Enrollment, Transaction
+from .revenue_reports import HOSTING_FEE_PER_TEACHER, revenue_totals_from_reports
+
+
+CACHE_VERSION_KEY = 'admin_statistics:version'
+CACHE_KEY = 'admin_statistics:{name}:{version}'
+CACHE_TIMEOUT = 60 * 5
+
+ENROLLMENT_STATUSES = [Enrollment.PENDING, Enrollment.APPROVED, Enrollment.COMPLETED, Enrollment.DECLINED]
+
+
+def _version():
+    version = cache.get(CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(CACHE_VERSION_KEY, str(time.time_ns()), None)
+        version = cache.get(CACHE_VERSION_KEY)
+    return version
+
+
+def _cached(name, compute):
+    key = CACHE_KEY.format(name=name, version=_version())
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, CACHE_TIMEOUT)
+    return value
+
+
+def invalidate_statistics():
+    """Drop every cached figure once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(CACHE_VERSION_KEY, str(time.time_ns()), None))
+
+
+def month_start(now=None):
+    return timezone.localtime(now).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def enrollment_counts(queryset=None):
+    """Total and per-status enrollment counts in one pass; cached for the unfiltered table"""
+    def compute(enrollments):
+        return enrollments.aggregate(
+            total=Count('id'),
+            **{status: Count('id', filter=Q(status=status)) for status in ENROLLMENT_STATUSES}
+        )
+
+    if queryset is not None:
+        return compute(queryset)
+    return _cached('enrollments', lambda: compute(Enrollment.objects.all()))
+
+
+def revenue_summary():
+    """Completed revenue, its split, this month's revenue and hosting fees"""
+    since = month_start()
+
+    def compute():
+        # Closed months come from the revenue reports; only the rest is aggregated live
+        totals = revenue_totals_from_reports(since.date())
+        totals['active_teachers'] = UserProfile.objects.filter(
+            Exists(Course.objects.filter(teacher=OuterRef('pk'))),
+            Exists(Transaction.objects.filter(teacher=OuterRef('pk'))),
+            user_type='teacher',
+        ).count()
+        totals['hosting_fees'] = totals['active_teachers'] * HOSTING_FEE_PER_TEACHER
+        return totals
+
+    # The month is part of the key so the monthly figure rolls over by itself
+    return _cached(f'revenue:{since:%Y-%m}', compute)
+
+
+def dashboard_summary():
+    def compute():
+        return {
+            'total_users': CustomUser.objects.count(),
+            'active_courses': Course.objects.filter(is_active=True).count(),
+        }
+
+    summary = dict(_cached('dashboard', compute))
+    summary['total_enrollments'] = enrollment_counts()['total']
+    summary['monthly_revenue'] = revenue_summary()['monthly_revenue']
+    return summary
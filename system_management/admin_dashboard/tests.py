@@ -1,3 +1,469 @@
+import base64
+import hashlib
+import os
+import struct
+import tempfile
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Course
+from admin_dashboard.models import Lesson, Enrollment, CourseContentStats
+from student_dashboard.models import StudentExercise
+
+
+class CourseContentStatsTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        self.video = Lesson.objects.create(course=self.course, title='Video', order=1, duration=10,
+                                           video_url='https://www.youtube.com/embed/abc')
+        self.exercise = Lesson.objects.create(course=self.course, title='Exercise', order=2, duration=20,
+                                              exercise={'paragraph': 'Explain.'})
+
+    def stats(self):
+        return CourseContentStats.objects.get(course=self.course)
+
+    def test_counters_follow_lesson_save_and_delete(self):
+        stats = self.stats()
+        self.assertEqual(
+            (stats.active_lessons, stats.video_lessons, stats.exercise_lessons, stats.total_duration),
+            (2, 1, 1, 30)
+        )
+
+        self.exercise.is_active = False
+        self.exercise.save()
+        self.assertEqual(self.stats().exercise_lessons, 0)
+
+        self.video.delete()
+        stats = self.stats()
+        self.assertEqual((stats.active_lessons, stats.video_lessons), (0, 0))
+
+    def test_bulk_lesson_actions_refresh_counters(self):
+        admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass1234')
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        url = reverse('bulk-lesson-actions', args=[self.course.id])
+
+        client.post(url, {'action': 'deactivate', 'lesson_ids': [self.video.id]}, format='json')
+        self.assertEqual(self.stats().active_lessons, 1)
+
+        client.post(url, {'action': 'delete', 'lesson_ids': [self.exercise.id]}, format='json')
+        self.assertEqual(self.stats().active_lessons, 0)
+
+    def test_reorder_and_bulk_delete_renumber_in_constant_statements(self):
+        admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass1234')
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        extra = [Lesson.objects.create(course=self.course, title=f'Extra {i}', order=i) for i in range(3, 7)]
+        ids = [self.exercise.id, extra[3].id, self.video.id] + [lesson.id for lesson in extra[:3]]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(reverse('lesson-reorder', args=[self.course.id]), {'order': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]), 2)
+        orders = lambda: list(Lesson.objects.filter(course=self.course).order_by('order').values_list('id', flat=True))
+        self.assertEqual(orders(), ids)
+
+        client.post(reverse('bulk-lesson-actions', args=[self.course.id]),
+                    {'action': 'delete', 'lesson_ids': [ids[1], ids[3]]}, format='json')
+        self.assertEqual(orders(), [ids[0], ids[2], ids[4], ids[5]])
+        self.assertEqual(list(Lesson.objects.filter(course=self.course).order_by('order').values_list('order', flat=True)),
+                         [1, 2, 3, 4])
+
+    def test_deleting_course_with_lessons(self):
+        self.course.delete()
+        self.assertFalse(CourseContentStats.objects.exists())
+
+
+class AdminStatisticsTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+        teacher = CustomUser.objects.create_user(email='teacher@example.com', password='pass1234', is_staff=True)
+        self.student = CustomUser.objects.create_user(email='student@example.com', password='pass1234')
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='', price=100,
+                                            teacher=teacher.user_profile)
+
+    def test_figures_are_cached_until_a_write(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import Transaction
+
+        student_profile = self.student.user_profile
+        Transaction.objects.create(course=self.course, student=student_profile, teacher=self.course.teacher,
+                                   amount=100, status='completed')
+        old = Transaction.objects.create(course=self.course, student=student_profile, teacher=self.course.teacher,
+                                         amount=50, status='completed')
+        Transaction.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        Transaction.objects.create(course=self.course, student=student_profile, amount=70, status='pending')
+
+        summary = self.client.get(reverse('revenue-summary')).json()
+        self.assertEqual((summary['total_revenue'], summary['teacher_payouts'], summary['monthly_revenue']),
+                         (150.0, 105.0, 100.0))
+        self.assertEqual((summary['active_teachers'], summary['hosting_fees']), (1, 200))
+
+        url = reverse('dashboard-statistics')
+        self.assertEqual(self.client.get(url).json(),
+                         {'total_users': 3, 'active_courses': 1, 'total_enrollments': 0, 'monthly_revenue': 100.0})
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Enrollment.objects.create(student=self.student, course=self.course, status=Enrollment.PENDING)
+        self.assertEqual(self.client.get(url).json()['total_enrollments'], 1)
+        self.assertEqual(self.client.get(reverse('enrollment-statistics')).json(),
+                         {'total': 1, 'pending': 1, 'approved': 0, 'completed': 0, 'declined': 0})
+
+
+class RevenueReportTests(TestCase):
+    def setUp(self):
+        teacher = CustomUser.objects.create_user(email='teacher@example.com', password='pass1234', is_staff=True)
+        student = CustomUser.objects.create_user(email='student@example.com', password='pass1234')
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='', price=100,
+                                            teacher=teacher.user_profile)
+        self.student = student.user_profile
+
+    def sale(self, day, amount, status='completed', currency='USD'):
+        from datetime import datetime
+        from django.utils import timezone
+        from .models import Transaction
+
+        sale = Transaction.objects.create(course=self.course, student=self.student, teacher=self.course.teacher,
+                                          amount=amount, status=status, currency=currency)
+        created_at = timezone.make_aware(datetime.fromisoformat(day))
+        Transaction.objects.filter(pk=sale.pk).update(created_at=created_at)
+        sale.created_at = created_at
+        return sale
+
+    def test_reports_are_incremental(self):
+        from datetime import date
+        from .models import RevenueReport
+        from .revenue_reports import generate_reports, revenue_totals_from_reports
+
+        self.sale('2026-08-03 10:00', 100)
+        self.sale('2026-08-20 10:00', 50, currency='ZAR')
+        late = self.sale('2026-09-10 10:00', 80, status='pending')
+        self.sale('2026-10-05 10:00', 30)
+
+        self.assertEqual(generate_reports('monthly', today=date(2026, 10, 18)), 2)
+        august = RevenueReport.objects.get(report_type='monthly', period_start=date(2026, 8, 1))
+        self.assertEqual((august.period_end, august.total_revenue, august.total_transactions),
+                         (date(2026, 8, 31), 150, 2))
+        self.assertEqual(august.currency_breakdown, {'USD': 100.0, 'ZAR': 50.0})
+        self.assertEqual((august.platform_commission, august.hosting_fees, august.net_profit), (45, 200, 245))
+        self.assertEqual(RevenueReport.objects.get(period_start=date(2026, 9, 1)).total_revenue, 0)
+        self.assertEqual(generate_reports('monthly', today=date(2026, 10, 18)), 0)
+
+        # A sale completing late only recomputes its own period
+        late.status = 'completed'
+        late.save()
+        self.assertEqual(list(RevenueReport.objects.filter(is_stale=True).values_list('period_start', flat=True)),
+                         [date(2026, 9, 1)])
+        totals = revenue_totals_from_reports(date(2026, 10, 18))
+        self.assertEqual((totals['total_revenue'], totals['monthly_revenue']), (260, 30))
+
+        self.assertEqual(generate_reports('monthly', today=date(2026, 10, 18)), 1)
+        self.assertEqual(RevenueReport.objects.get(period_start=date(2026, 9, 1)).total_revenue, 80)
+        with self.assertNumQueries(2):
+            totals = revenue_totals_from_reports(date(2026, 10, 18))
+        self.assertEqual(totals['total_revenue'], 260)
+
+
+class VideoDescriptorTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+
+    def test_descriptor_is_computed_on_save(self):
+        lesson = Lesson.objects.create(course=self.course, title='Video', order=1,
+                                       video_url='https://youtu.be/abc123?t=5')
+        self.assertEqual(lesson.video_descriptor['source'], 'youtube')
+        self.assertEqual(lesson.video_descriptor['embed_url'],
+                         'https://www.youtube.com/embed/abc123?enablejsapi=1&origin=http://localhost:5173&rel=0')
+
+        lesson.video_url = 'videos/course_1/clip.webm'
+        lesson.save()
+        stored = Lesson.objects.get(pk=lesson.pk)
+        with self.assertNumQueries(0):
+            config = stored.get_video_config()
+        self.assertEqual((config['source'], config['format'], config['mime_type'], config['streaming_url']),
+                         ('local', 'webm', 'video/webm', 'http://localhost:8000/media/videos/course_1/clip.webm'))
+        self.assertEqual(stored.get_video_requirements()['min_watch_percentage'], 90)
+
+        lesson.video_url = 'null'
+        lesson.save()
+        self.assertEqual(lesson.video_descriptor, {})
+        self.assertFalse(lesson.has_video)
+        self.assertIsNone(lesson.get_video_config())
+
+
+    def test_saving_a_loaded_lesson_writes_only_changed_columns(self):
+        Lesson.objects.create(course=self.course, title='Video', order=1, video_url='videos/clip.mp4',
+                              exercise={'paragraph': 'Explain.'})
+        lesson = Lesson.objects.get(course=self.course)
+        lesson.exercise['paragraph'] = 'Explain why.'
+        with CaptureQueriesContext(connection) as queries:
+            lesson.save()
+        statements = [query['sql'] for query in queries.captured_queries]
+        lesson_updates = [sql for sql in statements if sql.startswith('UPDATE "admin_dashboard_lesson"')]
+        self.assertEqual(len(lesson_updates), 1)
+        self.assertIn('"exercise"', lesson_updates[0])
+        self.assertNotIn('"video_url"', lesson_updates[0])
+        # No reload of the row to find out whether the video changed
+        self.assertFalse([sql for sql in statements
+                          if sql.startswith('SELECT') and 'WHERE "admin_dashboard_lesson"."id" =' in sql])
+        self.assertEqual(Lesson.objects.get(pk=lesson.pk).exercise, {'paragraph': 'Explain why.'})
+
+        lesson.video_url = 'https://vimeo.com/42'
+        lesson.save()
+        lesson.refresh_from_db()
+        self.assertEqual((lesson.video_source, lesson.video_format), ('vimeo', 'vimeo'))
+        self.assertEqual(lesson.get_dirty_fields(), [])
+
+
+class EnrollmentListViewTests(TestCase):
+    def setUp(self):
+        admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+        self.url = reverse('enrollment-list')
+
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        self.lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        Lesson.objects.create(course=self.course, title='Wrap up', order=2)
+        self.students = []
+        for i in range(5):
+            student = CustomUser.objects.create_user(email=f'student{i}@example.com', password='pass1234')
+            Enrollment.objects.create(student=student, course=self.course,
+                                      status='approved' if i % 2 else 'pending')
+            self.students.append(student)
+
+    def test_pages_follow_cursor_and_carry_progress(self):
+        StudentExercise.objects.create(student=self.students[0], lesson=self.lesson, completed=True)
+
+        with self.assertNumQueries(3):
+            first = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(len(first.data['results']), 3)
+        self.assertIsNotNone(first.data['next'])
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(len(second.data['results']), 2)
+        self.assertIsNone(second.data['next'])
+
+        rows = {row['student_email']: row for row in first.data['results'] + second.data['results']}
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows['student0@example.com']['exercises_completed'], 1)
+        self.assertEqual(rows['student0@example.com']['exercises_total'], 2)
+        self.assertEqual(rows['student0@example.com']['progress'], 50.0)
+        self.assertEqual(rows['student1@example.com']['progress'], 0)
+
+    def test_filters(self):
+        response = self.client.get(self.url, {'status': 'approved'})
+        self.assertEqual({row['status'] for row in response.data['results']}, {'approved'})
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get(self.url, {'student': self.students[3].id, 'course': self.course.id})
+        self.assertEqual([row['student'] for row in response.data['results']], [self.students[3].id])
+
+    def test_bad_cursor_and_course_are_client_errors(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'course': 'FIN0001'}).status_code, 400)
+
+
+def _box(box_type, *children):
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def _mp4_with_trailing_moov(media=b'frame-data' * 4):
+    """A minimal MP4 laid out as ftyp, mdat, moov (not streamable)"""
+    ftyp = _box(b'ftyp', b'isom', b'\0\0\0\1', b'isomavc1')
+    mdat = _box(b'mdat', media)
+    mvhd = _box(b'mvhd', b'\0' * 12, struct.pack('>II', 1000, 5500), b'\0' * 80)
+    hdlr = _box(b'hdlr', b'\0' * 8, b'vide', b'\0' * 13)
+    sample_entry = _box(b'avc1', b'\0' * 24, struct.pack('>HH', 1280, 720), b'\0' * 50)
+    stsd = _box(b'stsd', b'\0' * 4, struct.pack('>I', 1), sample_entry)
+    stco = _box(b'stco', b'\0' * 4, struct.pack('>II', 1, len(ftyp) + 8))
+    trak = _box(b'trak', _box(b'mdia', hdlr, _box(b'minf', _box(b'stbl', stsd, stco))))
+    return ftyp + mdat + _box(b'moov', mvhd, trak)
+
+
+class VideoTaskTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        settings = self.settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.path = f'{media_root}/videos/clip.mp4'
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(_mp4_with_trailing_moov())
+
+        course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        self.lesson = Lesson.objects.create(course=course, title='Video', order=1, video_url='videos/clip.mp4')
+
+    def test_faststart_keeps_chunk_offsets_valid(self):
+        from .video_processing import faststart, probe_mp4, _top_level_boxes, _find
+
+        self.assertFalse(probe_mp4(self.path)['fast_start'])
+        self.assertTrue(faststart(self.path))
+
+        info = probe_mp4(self.path)
+        self.assertEqual((info['fast_start'], info['codec'], info['height'], info['duration']),
+                         (True, 'avc1', 720, 5.5))
+        with open(self.path, 'rb') as f:
+            self.assertEqual([box[0] for box in _top_level_boxes(f)], [b'ftyp', b'moov', b'mdat'])
+            f.seek(0)
+            data = f.read()
+        stco, _ = _find(data, 0, len(data), [b'moov', b'trak', b'mdia', b'minf', b'stbl', b'stco'])[0]
+        chunk_offset = struct.unpack_from('>I', data, stco + 8)[0]
+        self.assertEqual(data[chunk_offset:chunk_offset + 10], b'frame-data')
+
+    def test_worker_fills_lesson_metadata(self):
+        from django.core.management import call_command
+        from .models import VideoTask
+
+        task = VideoTask.enqueue('videos/clip.mp4', lesson=self.lesson)
+        call_command('process_video_tasks', '--once', stdout=open(os.devnull, 'w'))
+
+        task.refresh_from_db()
+        self.lesson.refresh_from_db()
+        self.assertEqual(task.status, 'done')
+        self.assertEqual((self.lesson.video_codec, self.lesson.video_duration), ('avc1', 6))
+        self.assertTrue(self.lesson.supports_streaming)
+        self.assertEqual(self.lesson.video_file_size, len(_mp4_with_trailing_moov()))
+
+    def test_task_for_a_replaced_video_leaves_the_lesson_alone(self):
+        from django.core.management import call_command
+        from .models import VideoTask
+
+        task = VideoTask.enqueue('videos/clip.mp4', lesson=self.lesson)
+        self.lesson.video_url = 'videos/replacement.mp4'
+        self.lesson.save()
+        call_command('process_video_tasks', '--once', stdout=open(os.devnull, 'w'))
+
+        task.refresh_from_db()
+        self.lesson.refresh_from_db()
+        self.assertEqual(task.status, 'done')
+        self.assertEqual(task.result['lessons_updated'], 0)
+        self.assertEqual(self.lesson.video_url, 'videos/replacement.mp4')
+        self.assertEqual((self.lesson.video_codec, self.lesson.video_duration), ('', 0))
+        self.assertFalse(self.lesson.hls_playlist)
+
+    def test_only_silent_tasks_are_requeued(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import VideoTask
+
+        long_run = VideoTask.enqueue('videos/long.mp4')
+        dead = VideoTask.enqueue('videos/dead.mp4')
+        hours_ago = timezone.now() - timedelta(hours=5)
+        VideoTask.objects.update(status='running', started_at=hours_ago, heartbeat_at=hours_ago)
+        # A long encode whose worker is still reporting
+        VideoTask.objects.filter(pk=long_run.pk).update(heartbeat_at=timezone.now())
+
+        self.assertEqual(VideoTask.requeue_stale(timezone.now() - timedelta(minutes=10)), 1)
+        self.assertEqual(dict(VideoTask.objects.values_list('pk', 'status')),
+                         {long_run.pk: 'running', dead.pk: 'pending'})
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings = self.settings(MEDIA_ROOT=self.media_root, VIDEO_UPLOAD_TEMP_DIR=tempfile.mkdtemp())
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        admin = CustomUser.objects.create_superuser(email='admin@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        self.lesson = Lesson.objects.create(course=self.course, title='Video', order=1)
+        self.data = os.urandom(3000)
+
+    def append(self, upload_id, offset, chunk, **headers):
+        return self.client.generic('PATCH', reverse('video-upload-detail', args=[upload_id]), chunk,
+                                   content_type='application/offset+octet-stream',
+                                   headers={'Upload-Offset': str(offset), **headers})
+
+    def test_resumable_upload_is_verified_and_attached(self):
+        from .models import VideoTask
+
+        response = self.client.post(
+            reverse('create-video-upload', args=[self.course.id, self.lesson.id]),
+            {'filename': 'intro.mp4', 'size': 3000, 'checksum': hashlib.sha256(self.data).hexdigest()},
+            format='json'
+        )
+        upload_id = response.data['upload_id']
+
+        self.assertEqual(self.append(upload_id, 0, self.data[:1000]).status_code, 200)
+        # A retried chunk at a stale offset is refused with the offset to resume from
+        response = self.append(upload_id, 0, self.data[:1000])
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '1000'))
+        response = self.append(upload_id, 1000, self.data[1000:2000], Upload_Checksum='sha256 AAAA')
+        self.assertEqual(response.status_code, 460)
+
+        digest = base64.b64encode(hashlib.sha256(self.data[1000:]).digest()).decode()
+        response = self.append(upload_id, 1000, self.data[1000:], Upload_Checksum=f'sha256 {digest}')
+        self.assertEqual(response['Upload-Offset'], '3000')
+
+        response = self.client.post(reverse('complete-video-upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 201)
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.video_url, response.data['video_url'])
+        with open(os.path.join(self.media_root, self.lesson.video_url), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertTrue(VideoTask.objects.filter(video_path=self.lesson.video_url, status='pending').exists())
+
+        response = self.client.post(reverse('complete-video-upload', args=[upload_id]))
+        self.assertEqual(response.status_code, 409)
+
+    def test_abandoned_uploads_expire(self):
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .chunked_uploads import part_path
+        from .models import VideoUpload
+
+        url = reverse('create-video-upload', args=[self.course.id, self.lesson.id])
+        abandoned, active = [
+            VideoUpload.objects.get(pk=self.client.post(url, {'filename': 'intro.mp4', 'size': 3000},
+                                                        format='json').data['upload_id'])
+            for _ in range(2)
+        ]
+        self.append(abandoned.id, 0, self.data[:1000])
+        self.append(active.id, 0, self.data[:1000])
+        open(f'{part_path(abandoned)}.leftover', 'wb').close()
+        VideoUpload.objects.filter(pk=abandoned.pk).update(updated_at=timezone.now() - timedelta(days=2))
+
+        call_command('process_video_tasks', '--once', stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(dict(VideoUpload.objects.values_list('pk', 'status')),
+                         {abandoned.pk: 'aborted', active.pk: 'uploading'})
+        self.assertEqual(os.listdir(os.path.dirname(part_path(active))), [os.path.basename(part_path(active))])
+        self.assertEqual(self.append(abandoned.id, 1000, self.data[1000:2000]).status_code, 409)
+
+    def test_deleting_a_video_removes_what_was_made_from_it(self):
+        from .video_processing import hls_root_for
+
+        folder = os.path.join(self.media_root, 'videos', f'course_{self.course.id}', f'lesson_{self.lesson.id}')
+        os.makedirs(os.path.join(hls_root_for(self.course.id, self.lesson.id), '1_abcd'))
+        rendition = os.path.join(folder, 'intro_480p.mp4')
+        for path in (os.path.join(folder, 'intro.mp4'), rendition):
+            open(path, 'wb').close()
+        self.lesson.video_url = os.path.relpath(os.path.join(folder, 'intro.mp4'), self.media_root)
+        self.lesson.save()
+        Lesson.objects.filter(pk=self.lesson.pk).update(video_renditions=[
+            {'height': 480, 'bitrate': 1000, 'url': os.path.relpath(rendition, self.media_root)}
+        ])
 
-# Create your tests here.
+        response = self.client.delete(reverse('delete-lesson-video', args=[self.course.id, self.lesson.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(os.listdir(folder), [])
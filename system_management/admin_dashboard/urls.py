@@ -25,6 +25,11 @@ urlpatterns = [
    # Video upload endpoints
     path('courses/<int:course_id>/lessons/<int:lesson_id>/upload-video/', views.upload_lesson_video, name='upload-lesson-video'),
     path('courses/<int:course_id>/lessons/upload-video/', views.upload_lesson_video, name='upload-lesson-video-new'),
+    # Resumable chunked uploads
+    path('courses/<int:course_id>/lessons/<int:lesson_id>/video-uploads/', views.create_video_upload, name='create-video-upload'),
+    path('courses/<int:course_id>/lessons/video-uploads/', views.create_video_upload, name='create-video-upload-new'),
+    path('video-uploads/<uuid:upload_id>/', views.video_upload_detail, name='video-upload-detail'),
+    path('video-uploads/<uuid:upload_id>/complete/', views.complete_video_upload, name='complete-video-upload'),
     path('courses/<int:course_id>/lessons/<int:lesson_id>/delete-video/', views.delete_lesson_video, name='delete-lesson-video'),
 
     # Enrollment management endpoints
@@ -42,6 +47,7 @@ urlpatterns = [
     path('revenue/transactions/', views.TransactionViewSet.as_view({'get': 'list'}), name='revenue-transactions'),
     path('revenue/transactions/<int:pk>/process_refund/', views.TransactionViewSet.as_view({'post': 'process_refund'}), name='process-refund'),
     path('revenue/summary/', views.RevenueReportViewSet.as_view({'get': 'summary'}), name='revenue-summary'),
+    path('revenue/reports/', views.RevenueReportViewSet.as_view({'get': 'list'}), name='revenue-reports'),
     # path('revenue/reports/export/', views.export_revenue_report, name='export-revenue-report'),
 
     # testing
@@ -0,0 +1,336 @@
+# admin_dashboard/video_processing.py
+"""
+Work done on uploaded videos outside the request: probing, MP4 fast-start
+remuxing and lower-bitrate renditions. Run by the process_video_tasks command.
+
+Probing and fast-start work on MP4 files in pure Python; ffprobe is used when
+installed (and is needed for WebM/OGG metadata). Renditions and HLS packaging
+need ffmpeg and are skipped without it.
+"""
+import json
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+
+
+MP4_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+# Boxes whose payload is a list of child boxes
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts', b'dinf', b'mvex', b'udta'}
+
+# (height, video kbps) targets; only those below the source height are produced
+RENDITIONS = [(720, 2500), (480, 1000), (360, 600)]
+FFMPEG_TIMEOUT = 60 * 60
+
+HLS_SEGMENT_SECONDS = 6
+# Codecs that can be copied into MPEG-TS segments without re-encoding
+HLS_COPY_CODECS = {'avc1', 'avc3', 'h264'}
+
+
+class VideoProcessingError(Exception):
+    pass
+
+
+def _iter_boxes(data, start, end):
+    """Yield (type, box_start, payload_start, box_end) for the boxes in data[start:end]"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            raise VideoProcessingError(f'Corrupt MP4 box at offset {offset}')
+        yield box_type, offset, offset + header, min(offset + size, end)
+        offset += size
+
+
+def _top_level_boxes(f):
+    """Read the top-level box layout of an MP4 file: [(type, start, size)]"""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    boxes, offset = [], 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        size, box_type = struct.unpack_from('>I4s', header)
+        if size == 1:
+            size = struct.unpack_from('>Q', header, 8)[0]
+        elif size == 0:
+            size = file_size - offset
+        if size < 8:
+            raise VideoProcessingError(f'Corrupt MP4 box at offset {offset}')
+        boxes.append((box_type, offset, size))
+        offset += size
+    return boxes
+
+
+def _find(data, start, end, path):
+    """Payload ranges of the boxes matching a path such as [b'trak', b'mdia']"""
+    matches = []
+    for box_type, _, payload, box_end in _iter_boxes(data, start, end):
+        if box_type != path[0]:
+            continue
+        if len(path) == 1:
+            matches.append((payload, box_end))
+        else:
+            matches.extend(_find(data, payload, box_end, path[1:]))
+    return matches
+
+
+def probe_mp4(path):
+    """Duration, codec, dimensions and moov placement of an MP4, read from its boxes"""
+    with open(path, 'rb') as f:
+        boxes = _top_level_boxes(f)
+        moov = next((box for box in boxes if box[0] == b'moov'), None)
+        mdat = next((box for box in boxes if box[0] == b'mdat'), None)
+        if moov is None:
+            raise VideoProcessingError('MP4 has no moov box')
+        f.seek(moov[1])
+        data = f.read(moov[2])
+
+    info = {'fast_start': mdat is None or moov[1] < mdat[1], 'duration': 0, 'codec': '', 'height': 0}
+
+    for payload, _ in _find(data, 0, len(data), [b'moov', b'mvhd']):
+        version = data[payload]
+        if version == 1:
+            timescale, duration = struct.unpack_from('>IQ', data, payload + 20)
+        else:
+            timescale, duration = struct.unpack_from('>II', data, payload + 12)
+        if timescale:
+            info['duration'] = duration / timescale
+
+    for trak, trak_end in _find(data, 0, len(data), [b'moov', b'trak']):
+        handlers = _find(data, trak, trak_end, [b'mdia', b'hdlr'])
+        if not handlers or data[handlers[0][0] + 8:handlers[0][0] + 12] != b'vide':
+            continue
+        for stsd, _ in _find(data, trak, trak_end, [b'mdia', b'minf', b'stbl', b'stsd']):
+            entry = stsd + 8  # version/flags and entry count
+            info['codec'] = data[entry + 4:entry + 8].decode('latin-1').strip()
+            info['width'], info['height'] = struct.unpack_from('>HH', data, entry + 32)
+        break
+
+    return info
+
+
+def probe_ffprobe(path):
+    """Metadata from ffprobe; None when ffprobe is not installed"""
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe:
+        return None
+    output = subprocess.run(
+        [ffprobe, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+        capture_output=True, check=True, timeout=120
+    ).stdout
+    probed = json.loads(output or b'{}')
+    video = next((s for s in probed.get('streams', []) if s.get('codec_type') == 'video'), {})
+    return {
+        'duration': float(probed.get('format', {}).get('duration') or 0),
+        'codec': video.get('codec_name', ''),
+        'width': int(video.get('width') or 0),
+        'height': int(video.get('height') or 0),
+    }
+
+
+def faststart(path):
+    """
+    Move the moov box in front of mdat so playback can start before the whole
+    file has downloaded. Chunk offsets (stco/co64) are shifted by the size of
+    the moov box. Returns True if the file was rewritten.
+    """
+    with open(path, 'rb') as f:
+        boxes = _top_level_boxes(f)
+        moov = next((box for box in boxes if box[0] == b'moov'), None)
+        mdat_index = next((i for i, box in enumerate(boxes) if box[0] == b'mdat'), None)
+        if moov is None or mdat_index is None or moov[1] < boxes[mdat_index][1]:
+            return False
+        f.seek(moov[1])
+        data = bytearray(f.read(moov[2]))
+
+    shift = moov[2]
+    mdat_start = boxes[mdat_index][1]
+    for offsets_type, fmt in ((b'stco', '>I'), (b'co64', '>Q')):
+        path_to_table = [b'moov', b'trak', b'mdia', b'minf', b'stbl', offsets_type]
+        for payload, _ in _find(data, 0, len(data), path_to_table):
+            count = struct.unpack_from('>I', data, payload + 4)[0]
+            step = struct.calcsize(fmt)
+            for position in range(payload + 8, payload + 8 + count * step, step):
+                offset = struct.unpack_from(fmt, data, position)[0]
+                if offset >= mdat_start:
+                    offset += shift
+                if fmt == '>I' and offset > 0xFFFFFFFF:
+                    return False
+                struct.pack_into(fmt, data, position, offset)
+
+    layout = [box for box in boxes if box[0] != b'moov']
+    layout_index = layout.index(boxes[mdat_index])
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.faststart')
+    try:
+        with os.fdopen(fd, 'wb') as out, open(path, 'rb') as source:
+            for index, (_, start, size) in enumerate(layout):
+                if index == layout_index:
+                    out.write(data)
+                source.seek(start)
+                remaining = size
+                while remaining > 0:
+                    chunk = source.read(min(1024 * 1024, remaining))
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    remaining -= len(chunk)
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return True
+
+
+def make_renditions(path, source_height):
+    """Encode lower-bitrate copies next to the source; [] without ffmpeg"""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg or not source_height:
+        return []
+
+    stem, _ = os.path.splitext(path)
+    renditions = []
+    for height, kbps in RENDITIONS:
+        if height >= source_height:
+            continue
+        output = f'{stem}_{height}p.mp4'
+        subprocess.run(
+            [ffmpeg, '-y', '-v', 'error', '-i', path,
+             '-vf', f'scale=-2:{height}', '-c:v', 'libx264', '-b:v', f'{kbps}k',
+             '-maxrate', f'{kbps}k', '-bufsize', f'{kbps * 2}k',
+             '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart', output],
+            capture_output=True, check=True, timeout=FFMPEG_TIMEOUT
+        )
+        renditions.append({
+            'height': height,
+            'bitrate': kbps,
+            'url': os.path.relpath(output, settings.MEDIA_ROOT).replace(os.sep, '/'),
+        })
+    return renditions
+
+
+def package_hls(source_path, variants, hls_root):
+    """
+    Split the source and its renditions into HLS segments under a fresh
+    hls_root/<version>/ folder and write a master playlist listing them,
+    highest bandwidth first. Each packaging run gets its own folder, so
+    segments and playlists never change once written and can be cached
+    for good. Returns the master playlist path relative to MEDIA_ROOT,
+    or '' without ffmpeg.
+
+    variants: [(path, height, width, kbps)]
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg or not variants:
+        return ''
+
+    version = f'{int(os.path.getmtime(source_path))}_{os.urandom(4).hex()}'
+    output_dir = os.path.join(hls_root, version)
+    os.makedirs(output_dir)
+
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    try:
+        for path, height, width, kbps in sorted(variants, key=lambda variant: -variant[3]):
+            name = f'{height}p'
+            os.makedirs(os.path.join(output_dir, name))
+            subprocess.run(
+                [ffmpeg, '-y', '-v', 'error', '-i', path, '-c', 'copy', '-f', 'hls',
+                 '-hls_time', str(HLS_SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+                 '-hls_segment_filename', os.path.join(output_dir, name, 'segment_%05d.ts'),
+                 os.path.join(output_dir, name, 'index.m3u8')],
+                capture_output=True, check=True, timeout=FFMPEG_TIMEOUT
+            )
+            resolution = f',RESOLUTION={width}x{height}' if width else ''
+            lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={kbps * 1000}{resolution}')
+            lines.append(f'{name}/index.m3u8')
+
+        with open(os.path.join(output_dir, 'master.m3u8'), 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    except BaseException:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        raise
+
+    return os.path.relpath(os.path.join(output_dir, 'master.m3u8'), settings.MEDIA_ROOT).replace(os.sep, '/')
+
+
+def remove_old_hls(hls_playlist):
+    """Delete earlier packaging runs next to the current one"""
+    current = os.path.dirname(os.path.join(settings.MEDIA_ROOT, hls_playlist))
+    hls_root = os.path.dirname(current)
+    for name in os.listdir(hls_root):
+        path = os.path.join(hls_root, name)
+        if path != current and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def hls_root_for(course_id, lesson_id):
+    return os.path.join(settings.MEDIA_ROOT, 'videos', f'course_{course_id}', f'lesson_{lesson_id}', 'hls')
+
+
+def remove_derived_files(lesson):
+    """Delete the renditions and HLS output made from a lesson's video"""
+    for rendition in lesson.video_renditions or []:
+        try:
+            os.remove(safe_join(settings.MEDIA_ROOT, rendition['url']))
+        except (FileNotFoundError, KeyError, SuspiciousFileOperation):
+            pass
+    shutil.rmtree(hls_root_for(lesson.course_id, lesson.id), ignore_errors=True)
+
+
+def process_video(video_path, hls_root=None):
+    """
+    Probe, remux and transcode one uploaded file, and package it for HLS
+    into hls_root when given. Returns the Lesson field values to store, or
+    None when the file no longer exists.
+    """
+    full_path = safe_join(settings.MEDIA_ROOT, video_path)
+    if not os.path.isfile(full_path):
+        return None
+
+    is_mp4 = full_path.lower().endswith(MP4_EXTENSIONS)
+    info = probe_ffprobe(full_path)
+    if is_mp4:
+        mp4_info = probe_mp4(full_path)
+        info = info or mp4_info
+        info['fast_start'] = mp4_info['fast_start'] or faststart(full_path)
+    info = info or {'duration': 0, 'codec': '', 'height': 0}
+
+    file_size = os.path.getsize(full_path)
+    duration = info.get('duration') or 0
+    bitrate = round(file_size * 8 / duration / 1000) if duration else None  # kbps
+    renditions = make_renditions(full_path, info.get('height'))
+
+    hls_playlist = ''
+    if hls_root and is_mp4 and info.get('codec') in HLS_COPY_CODECS and bitrate:
+        height = info.get('height') or 0
+        variants = [(full_path, height, info.get('width') or 0, bitrate)] + [
+            (os.path.join(settings.MEDIA_ROOT, rendition['url']), rendition['height'],
+             round(info['width'] * rendition['height'] / height) if info.get('width') and height else 0,
+             rendition['bitrate'])
+            for rendition in renditions
+        ]
+        hls_playlist = package_hls(full_path, variants, hls_root)
+
+    return {
+        'video_codec': (info.get('codec') or '')[:20],
+        'video_bitrate': bitrate,
+        'video_duration': round(duration),
+        'video_file_size': file_size,
+        # WebM and OGG stream progressively; MP4 only once moov comes first
+        'supports_streaming': info.get('fast_start', True),
+        'video_renditions': renditions,
+        'hls_playlist': hls_playlist,
+    }
@@ -9,7 +9,7 @@ from django_filters import rest_framework as filters
 from .serializers import UserSerializer, UserProfileSerializer, CourseSerializer, TeacherSerializer, LessonSerializer,StudentSerializer
 from admin_dashboard.models import (
     Lesson, AutoApprovalSettings, Enrollment,
-    Transaction, TeacherPayout, RevenueReport
+    Transaction, TeacherPayout, RevenueReport, CourseContentStats, VideoTask, VideoUpload
 )
 from django.db import transaction, IntegrityError
 from rest_framework.decorators import action, api_view, permission_classes
@@ -40,8 +40,15 @@ from django.db.models import Count, Q
 from admin_dashboard.models import (Enrollment, AutoApprovalSettings,
  Transaction, TeacherPayout, RevenueReport
 )
-from student_dashboard.models import StudentExercise
+from student_dashboard.models import StudentExercise, CourseProgress
+from student_dashboard.search import set_lessons_active
+from . import chunked_uploads
+from .video_processing import remove_derived_files
+from .statistics import dashboard_summary, enrollment_counts, invalidate_statistics, revenue_summary
+from student_dashboard.suggestions import invalidate_suggestions
 from rest_framework.views import APIView
+from rest_framework.pagination import CursorPagination
+from rest_framework.exceptions import APIException
 from django.db.models import Sum, Count, Avg
 
 # testing
@@ -247,7 +254,6 @@ class LessonRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
     def perform_destroy(self, instance):
         course_id = self.kwargs['course_id']
-        deleted_order = instance.order
 
         try:
             with transaction.atomic():
@@ -255,14 +261,7 @@ class LessonRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
                 instance.delete()
 
                 # Reorder remaining lessons
-                lessons = Lesson.objects.filter(
-                    course_id=course_id,
-                    order__gt=deleted_order
-                ).order_by('order')
-
-                for lesson in lessons:
-                    lesson.order -= 1
-                    lesson.save()
+                Lesson.renumber(course_id)
 
         except Exception as e:
             raise serializers.ValidationError(
@@ -311,12 +310,18 @@ class BulkLessonActionsView(generics.GenericAPIView):
 
         if action == 'activate':
             lessons.update(is_active=True)
+            CourseContentStats.refresh(course_id)
+            set_lessons_active(lesson_ids, True)
+            invalidate_suggestions()
             return Response(
                 {'success': f'{len(lessons)} lessons activated'},
                 status=status.HTTP_200_OK
             )
         elif action == 'deactivate':
             lessons.update(is_active=False)
+            CourseContentStats.refresh(course_id)
+            set_lessons_active(lesson_ids, False)
+            invalidate_suggestions()
             return Response(
                 {'success': f'{len(lessons)} lessons deactivated'},
                 status=status.HTTP_200_OK
@@ -325,19 +330,14 @@ class BulkLessonActionsView(generics.GenericAPIView):
             # We need to handle order updates when deleting multiple lessons
             try:
                 with transaction.atomic():
-                    # Get all lessons to be deleted with their orders
-                    to_delete = list(lessons.values('id', 'order'))
-
                     # Delete the lessons
                     deleted_count = lessons.count()
                     lessons.delete()
 
                     # Reorder remaining lessons
-                    for lesson_info in to_delete:
-                        Lesson.objects.filter(
-                            course_id=course_id,
-                            order__gt=lesson_info['order']
-                        ).update(order=models.F('order') - 1)
+                    Lesson.renumber(course_id)
+
+                    CourseContentStats.refresh(course_id)
 
                 return Response(
                     {'success': f'{deleted_count} lessons deleted'},
@@ -370,15 +370,14 @@ class LessonReorderView(generics.GenericAPIView):
                     course_id=course_id
                 ).values_list('id', flat=True))
 
-                if set(lesson_order) != existing_lessons:
+                if len(lesson_order) != len(existing_lessons) or set(lesson_order) != existing_lessons:
                     return Response(
                         {'error': 'Lesson IDs do not match course lessons'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
 
                 # Update orders
-                for index, lesson_id in enumerate(lesson_order, start=1):
-                    Lesson.objects.filter(id=lesson_id).update(order=index)
+                Lesson.apply_order(course_id, lesson_order)
 
             return Response({'status': 'success'}, status=status.HTTP_200_OK)
 
@@ -552,6 +551,9 @@ def upload_lesson_video(request, course_id, lesson_id=None):
                     fs.delete(saved_name)
                     return Response({'error': e.message_dict}, status=400)
 
+            # Probing, fast-start remux and renditions run in process_video_tasks
+            task = VideoTask.enqueue(video_url, lesson=lesson)
+
             return Response({
                 'video_url': video_url,
                 'full_url': full_url,
@@ -559,6 +561,7 @@ def upload_lesson_video(request, course_id, lesson_id=None):
                 'size': video_file.size,
                 'type': 'file',
                 'message': 'Video uploaded successfully',
+                'processing': {'task_id': task.id, 'status': task.status},
                 'id': lesson.id if lesson else None  # Return lesson ID
             }, status=201)
 
@@ -569,6 +572,105 @@ def upload_lesson_video(request, course_id, lesson_id=None):
             status=500
         )
 
+def _upload_state(upload):
+    return {
+        'upload_id': str(upload.id),
+        'status': upload.status,
+        'filename': upload.filename,
+        'size': upload.total_size,
+        'offset': upload.received_size,
+        'chunk_size': settings.VIDEO_UPLOAD_CHUNK_SIZE,
+        'max_chunk_size': settings.VIDEO_UPLOAD_MAX_CHUNK_SIZE,
+    }
+
+
+def _upload_error_response(e):
+    response = Response({'error': e.detail}, status=e.status_code)
+    if e.offset is not None:
+        response['Upload-Offset'] = str(e.offset)
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def create_video_upload(request, course_id, lesson_id=None):
+    """
+    Start a resumable chunked upload: {filename, size, checksum (optional SHA-256 hex)}.
+    Send the bytes with PATCH and an Upload-Offset header, then POST .../complete/.
+    """
+    course = get_object_or_404(Course, id=course_id)
+    lesson = get_object_or_404(Lesson, id=lesson_id, course=course) if lesson_id else None
+
+    try:
+        upload = chunked_uploads.start_upload(
+            course, lesson, request.user,
+            request.data.get('filename'), request.data.get('size'), request.data.get('checksum')
+        )
+    except chunked_uploads.UploadError as e:
+        return _upload_error_response(e)
+
+    response = Response(_upload_state(upload), status=201)
+    response['Upload-Offset'] = '0'
+    return response
+
+
+@api_view(['GET', 'HEAD', 'PATCH', 'DELETE'])
+@permission_classes([IsAdminUser])
+def video_upload_detail(request, upload_id):
+    """
+    GET/HEAD: current offset, to resume after a dropped connection.
+    PATCH: append the raw request body at the Upload-Offset header.
+    DELETE: abort the upload and remove its data.
+    """
+    upload = get_object_or_404(VideoUpload, id=upload_id)
+
+    if request.method == 'DELETE':
+        chunked_uploads.abort_upload(upload)
+        return Response(status=204)
+
+    if request.method == 'PATCH':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return Response({'error': 'Upload-Offset header is required'}, status=400)
+        try:
+            # Read the body as a stream; request.data would buffer it
+            chunked_uploads.append_chunk(
+                upload, offset, request.stream, length, request.headers.get('Upload-Checksum')
+            )
+        except chunked_uploads.UploadError as e:
+            return _upload_error_response(e)
+
+    response = Response(_upload_state(upload))
+    response['Upload-Offset'] = str(upload.received_size)
+    response['Upload-Length'] = str(upload.total_size)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def complete_video_upload(request, upload_id):
+    """Verify the assembled file and attach it to the lesson; processing is queued"""
+    upload = get_object_or_404(VideoUpload.objects.select_related('lesson'), id=upload_id)
+
+    try:
+        video_url, task = chunked_uploads.complete_upload(upload)
+    except chunked_uploads.UploadError as e:
+        return _upload_error_response(e)
+
+    return Response({
+        'video_url': video_url,
+        'full_url': request.build_absolute_uri(settings.MEDIA_URL + video_url),
+        'filename': os.path.basename(video_url),
+        'size': upload.total_size,
+        'type': 'file',
+        'message': 'Video uploaded successfully',
+        'processing': {'task_id': task.id, 'status': task.status},
+        'id': upload.lesson_id
+    }, status=201)
+
 @api_view(['DELETE'])
 @permission_classes([IsAdminUser])
 def delete_lesson_video(request, course_id, lesson_id):
@@ -583,6 +685,8 @@ def delete_lesson_video(request, course_id, lesson_id):
             video_path = os.path.join(settings.MEDIA_ROOT, lesson.video_url)
             if os.path.exists(video_path):
                 os.remove(video_path)
+            # And what the video worker made from it
+            remove_derived_files(lesson)
 
             # Clear video_url from lesson
             lesson.video_url = ''
@@ -603,63 +707,6 @@ def delete_lesson_video(request, course_id, lesson_id):
 # ENROLLMENT MANAGEMENT
 # =====================
 
-class EnrollmentListView(APIView):
-    permission_classes = [permissions.IsAdminUser]
-
-    def get(self, request):
-        enrollments = Enrollment.objects.select_related('student', 'course').all()
-
-        enrollment_data = []
-        for enrollment in enrollments:
-            enrollment_data.append({
-                'id': enrollment.id,
-                'student_id': enrollment.student.id,
-                'student_name': enrollment.student_name,  # Use computed property
-                'student_email': enrollment.student_email,  # Use computed property
-                'course_id': enrollment.course.id,
-                'course_title': enrollment.course_title,  # Use computed property
-                'course_code': enrollment.course_code,  # Use computed property
-                'status': enrollment.status,
-                'enrolled_at': enrollment.enrolled_at,
-                'completed_at': enrollment.completed_at,
-                'progress': enrollment.progress,  # Use computed property
-                'exercises_completed': enrollment.exercises_completed,  # Use computed property
-                'exercises_total': enrollment.exercises_total  # Use computed property
-            })
-
-        return Response(enrollment_data)
-
-class EnrollmentStatisticsView(APIView):
-    def get(self, request):
-        # Get filter parameters
-        status_filter = request.GET.get('status', '')
-        course_filter = request.GET.get('course', '')
-        search_query = request.GET.get('search', '')
-
-        # Apply filters to queryset
-        queryset = Enrollment.objects.all()
-
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        if course_filter:
-            queryset = queryset.filter(course_id=course_filter)
-        if search_query:
-            queryset = queryset.filter(
-                Q(student__first_name__icontains=search_query) |
-                Q(student__last_name__icontains=search_query) |
-                Q(student__email__icontains=search_query) |
-                Q(course__title__icontains=search_query)
-            )
-
-        # Calculate filtered statistics
-        stats = queryset.aggregate(
-            total=Count('id'),
-            pending=Count('id', filter=Q(status='pending')),
-            approved=Count('id', filter=Q(status='approved')),
-            completed=Count('id', filter=Q(status='completed'))
-        )
-        return Response(stats)
-
 class AutoApprovalSettingsView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
@@ -778,6 +825,8 @@ class BulkEnrollmentActionsView(APIView):
         else:
             return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # queryset.update() sends no signals
+        invalidate_statistics()
         return Response({
             'message': f'Action "{action}" applied to {enrollments.count()} enrollments'
         })
@@ -819,41 +868,119 @@ class StudentListView(APIView):
             )
 
 #Enrollment
+class EnrollmentCursorPagination(CursorPagination):
+    """Keyset pagination over (enrolled_at, id) so deep pages cost the same as the first"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-enrolled_at', '-id')
+
+
+def enrollment_progress_map(enrollments):
+    """
+    Completed lesson counts for every (student, course) pair on a page.
+    Stored CourseProgress rows are read in one query; pairs that have no
+    row yet are counted with a single grouped StudentExercise aggregate.
+    """
+    pairs = {(e.student_id, e.course_id) for e in enrollments}
+    if not pairs:
+        return {}
+
+    student_ids = {student_id for student_id, _ in pairs}
+    course_ids = {course_id for _, course_id in pairs}
+
+    completed = {
+        (student_id, course_id): count
+        for student_id, course_id, count in CourseProgress.objects.filter(
+            student_id__in=student_ids, course_id__in=course_ids
+        ).values_list('student_id', 'course_id', 'completed_lessons')
+        if (student_id, course_id) in pairs
+    }
+
+    missing = pairs - completed.keys()
+    if missing:
+        grouped = StudentExercise.objects.filter(
+            student_id__in={student_id for student_id, _ in missing},
+            lesson__course_id__in={course_id for _, course_id in missing},
+            completed=True
+        ).values('student_id', 'lesson__course_id').annotate(count=Count('id'))
+        for row in grouped:
+            key = (row['student_id'], row['lesson__course_id'])
+            if key in missing:
+                completed[key] = row['count']
+
+    return completed
+
+
 class EnrollmentListView(APIView):
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = EnrollmentCursorPagination
+
+    def get_queryset(self, request):
+        enrollments = Enrollment.objects.select_related(
+            'student', 'course', 'course__content_stats'
+        ).only(
+            'id', 'status', 'enrolled_at', 'completed_at', 'notes',
+            'student__id', 'student__first_name', 'student__last_name', 'student__email',
+            'course__id', 'course__title', 'course__code',
+            'course__content_stats__active_lessons',
+        )
+
+        # Server-side filters: ?status=approved,pending&course=3&student=12
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            enrollments = enrollments.filter(status__in=status_filter.split(','))
+
+        course_id = request.query_params.get('course')
+        if course_id:
+            if not course_id.isdigit():
+                raise serializers.ValidationError({'course': 'Expected a course id.'})
+            enrollments = enrollments.filter(course_id=course_id)
+
+        student = request.query_params.get('student')
+        if student:
+            if student.isdigit():
+                enrollments = enrollments.filter(student_id=student)
+            else:
+                enrollments = enrollments.filter(student__email__iexact=student)
+
+        return enrollments
 
     def get(self, request):
-        """Get all enrollments with detailed information"""
+        """Get one page of enrollments with detailed information"""
         try:
-            enrollments = Enrollment.objects.select_related(
-                'student', 'course', 'student__user_profile'
-            ).prefetch_related(
-                'student__student_exercises__lesson'
-            ).all()
+            paginator = self.pagination_class()
+            enrollments = paginator.paginate_queryset(self.get_queryset(request), request, view=self)
+            completed_by_pair = enrollment_progress_map(enrollments)
 
-            # Add computed fields for serialization
             enrollment_data = []
             for enrollment in enrollments:
-                enrollment_dict = {
+                stats = getattr(enrollment.course, 'content_stats', None)
+                total = stats.active_lessons if stats else 0
+                completed = completed_by_pair.get((enrollment.student_id, enrollment.course_id), 0)
+
+                enrollment_data.append({
                     'id': enrollment.id,
-                    'student': enrollment.student.id,
+                    'student': enrollment.student_id,
                     'student_name': enrollment.student_name,
                     'student_email': enrollment.student_email,
-                    'course': enrollment.course.id,
+                    'course': enrollment.course_id,
                     'course_title': enrollment.course_title,
                     'course_code': enrollment.course_code,
                     'status': enrollment.status,
                     'enrolled_at': enrollment.enrolled_at,
                     'completed_at': enrollment.completed_at,
-                    'progress': enrollment.progress,
-                    'exercises_completed': enrollment.exercises_completed,
-                    'exercises_total': enrollment.exercises_total,
+                    'progress': round((completed / total) * 100, 1) if total else 0,
+                    'exercises_completed': completed,
+                    'exercises_total': total,
                     'notes': enrollment.notes
-                }
-                enrollment_data.append(enrollment_dict)
+                })
 
-            return Response(enrollment_data)
+            return paginator.get_paginated_response(enrollment_data)
 
+        except APIException:
+            # Bad filters and cursors are client errors, answered by DRF
+            raise
         except Exception as e:
             logger.error(f"Error fetching enrollments: {str(e)}", exc_info=True)
             return Response(
@@ -1083,6 +1210,7 @@ class EnrollmentActionView(APIView):
                     student=enrollment.student,
                     lesson__course=enrollment.course
                 ).update(completed=False, completed_at=None, score=0.0)
+                CourseProgress.rebuild(enrollment.student_id, enrollment.course_id)
 
                 enrollment.status = Enrollment.APPROVED
                 enrollment.completed_at = None
@@ -1181,6 +1309,7 @@ class BulkEnrollmentActionsView(APIView):
                             student=enrollment.student,
                             lesson__course=enrollment.course
                         ).update(completed=False, completed_at=None, score=0.0)
+                        CourseProgress.rebuild(enrollment.student_id, enrollment.course_id)
 
                     enrollments.update(status=Enrollment.APPROVED, completed_at=None)
                 else:
@@ -1189,6 +1318,7 @@ class BulkEnrollmentActionsView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
 
+                invalidate_statistics()
                 return Response({'message': f'Bulk action {action} completed successfully'})
 
         except Exception as e:
@@ -1221,21 +1351,28 @@ class EnrollmentStatisticsView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        """Get enrollment statistics"""
-        try:
-            total_enrollments = Enrollment.objects.count()
-            pending_enrollments = Enrollment.objects.filter(status=Enrollment.PENDING).count()
-            approved_enrollments = Enrollment.objects.filter(status=Enrollment.APPROVED).count()
-            completed_enrollments = Enrollment.objects.filter(status=Enrollment.COMPLETED).count()
-            declined_enrollments = Enrollment.objects.filter(status=Enrollment.DECLINED).count()
+        """Get enrollment statistics, optionally for a filtered set of enrollments"""
+        status_filter = request.GET.get('status', '')
+        course_filter = request.GET.get('course', '')
+        search_query = request.GET.get('search', '')
 
-            return Response({
-                'total': total_enrollments,
-                'pending': pending_enrollments,
-                'approved': approved_enrollments,
-                'completed': completed_enrollments,
-                'declined': declined_enrollments
-            })
+        try:
+            if not (status_filter or course_filter or search_query):
+                return Response(enrollment_counts())
+
+            queryset = Enrollment.objects.all()
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+            if course_filter:
+                queryset = queryset.filter(course_id=course_filter)
+            if search_query:
+                queryset = queryset.filter(
+                    Q(student__first_name__icontains=search_query) |
+                    Q(student__last_name__icontains=search_query) |
+                    Q(student__email__icontains=search_query) |
+                    Q(course__title__icontains=search_query)
+                )
+            return Response(enrollment_counts(queryset))
 
         except Exception as e:
             logger.error(f"Error fetching enrollment statistics: {str(e)}", exc_info=True)
@@ -1287,40 +1424,35 @@ class TeacherPayoutViewSet(viewsets.ModelViewSet):
         return Response({'status': 'payout processed'})
 
 class RevenueReportViewSet(viewsets.ReadOnlyModelViewSet):
+    """Precomputed period reports, written by the generate_revenue_reports command"""
     queryset = RevenueReport.objects.all()
     serializer_class = RevenueReportSerializer
     permission_classes = [IsAdminUser]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        report_type = self.request.query_params.get('report_type')
+        since = self.request.query_params.get('since')
+        until = self.request.query_params.get('until')
+        if report_type:
+            queryset = queryset.filter(report_type=report_type)
+        if since:
+            queryset = queryset.filter(period_end__gte=since)
+        if until:
+            queryset = queryset.filter(period_start__lte=until)
+        return queryset
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
         # Get summary statistics for dashboard
-        total_revenue = Transaction.objects.filter(
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-
-        platform_commission = Transaction.objects.filter(
-            status='completed'
-        ).aggregate(total=Sum('platform_fee'))['total'] or 0
-
-        teacher_payouts = Transaction.objects.filter(
-            status='completed', teacher__isnull=False
-        ).aggregate(total=Sum('teacher_payout'))['total'] or 0
-
-        # Count active teachers (those with courses and sales)
-        active_teachers = UserProfile.objects.filter(
-            user_type='teacher',
-            courses_taught__isnull=False,
-            sales__isnull=False
-        ).distinct().count()
-
-        hosting_fees = active_teachers * 200  # R200 per teacher
-
+        summary = revenue_summary()
         return Response({
-            'total_revenue': total_revenue,
-            'platform_commission': platform_commission,
-            'teacher_payouts': teacher_payouts,
-            'hosting_fees': hosting_fees,
-            'active_teachers': active_teachers
+            'total_revenue': summary['total_revenue'],
+            'platform_commission': summary['platform_commission'],
+            'teacher_payouts': summary['teacher_payouts'],
+            'hosting_fees': summary['hosting_fees'],
+            'active_teachers': summary['active_teachers'],
+            'monthly_revenue': summary['monthly_revenue'],
         })
 
 # PayPal integration views
@@ -1534,24 +1666,7 @@ class DashboardStatisticsView(APIView):
 
     def get(self, request):
         try:
-            # Get total registered users
-            total_users = CustomUser.objects.count()
-
-            # Get active courses count
-            active_courses = Course.objects.filter(is_active=True).count()
-
-            # Get total enrollments count
-            total_enrollments = Enrollment.objects.count()
-
-            # Monthly revenue - set to 0 as requested
-            monthly_revenue = 0
-
-            return Response({
-                'total_users': total_users,
-                'active_courses': active_courses,
-                'total_enrollments': total_enrollments,
-                'monthly_revenue': monthly_revenue
-            })
+            return Response(dashboard_summary())
 
         except Exception as e:
             logger.error(f"Error fetching dashboard statistics: {str(e)}")
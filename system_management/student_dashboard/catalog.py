@@ -0,0 +1,74 @@
+# student_dashboard/catalog.py
+from accounts.models import Course
+from admin_dashboard.models import Enrollment, CourseContentStats
+from .models import CourseProgress
+
+
+ENROLLED_STATUSES = ['approved', 'completed', 'enrolled']
+
+
+def catalog_courses(queryset=None):
+    """
+    Load courses together with their teacher and content counters
+    so a whole catalog page is read in one query.
+    """
+    if queryset is None:
+        queryset = Course.objects.filter(is_active=True)
+
+    return queryset.select_related('teacher__user', 'content_stats')
+
+
+def build_student_catalog(user, queryset=None):
+    """
+    Build the student course list payload from a constant number of queries:
+    the courses with their counters, the student's enrollments and the
+    student's stored progress rows.
+
+    Returns (courses_data, total_enrollments).
+    """
+    courses = catalog_courses(queryset)
+
+    enrollment_statuses = dict(
+        Enrollment.objects.filter(student=user).values_list('course_id', 'status')
+    )
+
+    completed_by_course = dict(
+        CourseProgress.objects.filter(student=user).values_list('course_id', 'completed_lessons')
+    )
+
+    courses_data = []
+    for course in courses:
+        enrollment_status = enrollment_statuses.get(course.id, 'not_enrolled')
+        is_enrolled = enrollment_status in ENROLLED_STATUSES
+        stats = CourseContentStats.for_course(course)
+        lessons_count = stats.active_lessons
+
+        completed_lessons = completed_by_course.get(course.id, 0) if is_enrolled else 0
+
+        progress = 0
+        if is_enrolled and lessons_count > 0:
+            progress = round((completed_lessons / lessons_count) * 100, 1)
+
+        courses_data.append({
+            'id': course.id,
+            'title': course.title,
+            'code': course.code,
+            'description': course.description,
+            'price': float(course.price) if course.price else 0.0,
+            'is_active': course.is_active,
+            'progress': progress,
+            'completed_lessons': completed_lessons,
+            'total_lessons': lessons_count,
+            'enrollment_status': enrollment_status,
+            'is_enrolled': is_enrolled,
+            'total_exercises': stats.exercise_lessons,
+            'video_count': stats.video_lessons,
+            'category': course.get_category_display(),
+            'is_popular': course.is_popular,
+            'is_new': course.is_new,
+            'duration': course.duration,
+            'teacher_name': course.teacher_name,
+            'created_at': course.created_at.isoformat() if course.created_at else None,
+        })
+
+    return courses_data, len(enrollment_statuses)
@@ -0,0 +1,170 @@
+# student_dashboard/certificate_pdf.py
+"""
+PDF rendering of certificates.
+
+A certificate is rendered once per version of its content. The file is
+named after the certificate_id and a hash of the template version and the
+text printed on the page, so a new file is only produced when one of them
+changes, and the hash doubles as a strong ETag for downloads. Rendering
+runs in the render_certificates worker: request handlers only queue it
+(request_render) and stream finished files.
+
+The PDF is written directly, one landscape A4 page in the standard
+Helvetica fonts, so no PDF library is needed.
+"""
+import hashlib
+import os
+
+from django.conf import settings
+
+
+TEMPLATE_VERSION = 1
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595  # A4 landscape, in points
+TEXT_WIDTH = 700
+
+# (line, font, size, baseline) from the top of the page down; F1 is
+# Helvetica, F2 Helvetica-Bold
+LAYOUT = [
+    ('heading', 'F2', 34, 470),
+    ('intro', 'F1', 16, 410),
+    ('name', 'F2', 30, 360),
+    ('completed', 'F1', 16, 315),
+    ('course', 'F2', 24, 270),
+    ('details', 'F1', 14, 215),
+    ('teacher', 'F1', 14, 190),
+    ('reference', 'F1', 10, 70),
+]
+
+# Advance widths of Helvetica for the printable ASCII range, per 1000 units
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+BOLD_FACTOR = 1.06  # Helvetica-Bold runs about this much wider
+
+
+def certificate_lines(certificate):
+    """The text printed on the certificate, by LAYOUT line"""
+    user = certificate.user
+    name = f"{user.first_name} {user.last_name}".strip() or user.email
+    return {
+        'heading': 'Certificate of Completion',
+        'intro': 'This certifies that',
+        'name': name,
+        'completed': 'has successfully completed the course',
+        'course': certificate.course.title,
+        'details': f"Grade: {float(certificate.grade):.2f}%  ·  Issued {certificate.issued_date.strftime('%B %d, %Y')}",
+        'teacher': f"Instructor: {certificate.course.teacher_name}",
+        'reference': f"Certificate ID: {certificate.certificate_id}",
+    }
+
+
+def render_key(certificate, lines=None):
+    """Hash of the template and the certificate's text; changes whenever the PDF would"""
+    lines = lines or certificate_lines(certificate)
+    source = repr((TEMPLATE_VERSION, PAGE_WIDTH, PAGE_HEIGHT, LAYOUT, sorted(lines.items())))
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def pdf_path(certificate, key):
+    return os.path.join(settings.CERTIFICATE_ROOT, f"{certificate.certificate_id}-{key}.pdf")
+
+
+def current_pdf(certificate):
+    """Path of the rendered PDF of the certificate as it is now, or None if it still has to be rendered"""
+    path = pdf_path(certificate, render_key(certificate))
+    return path if os.path.isfile(path) else None
+
+
+def _encode(text):
+    data = text.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _text_width(text, font, size):
+    units = sum(HELVETICA_WIDTHS[ord(char) - 32] if 32 <= ord(char) < 127 else 556 for char in text)
+    if font == 'F2':
+        units *= BOLD_FACTOR
+    return units * size / 1000
+
+
+def _page_content(lines):
+    commands = [
+        b'0.16 0.27 0.49 RG 3 w 28 28 786 539 re S',
+        b'0.5 w 40 40 762 515 re S',
+        b'0.1 0.1 0.1 rg',
+    ]
+    for key, font, size, baseline in LAYOUT:
+        text = lines[key]
+        # Shrink long lines, such as course titles, to the text width
+        size = min(size, size * TEXT_WIDTH / max(_text_width(text, font, size), 1))
+        x = (PAGE_WIDTH - _text_width(text, font, size)) / 2
+        commands.append(b'BT /%s %.1f Tf %.1f %d Td (%s) Tj ET' % (font.encode(), size, x, baseline, _encode(text)))
+    return b'\n'.join(commands)
+
+
+def render_pdf(lines):
+    """A one-page PDF of the certificate lines, byte-for-byte the same for the same lines"""
+    content = _page_content(lines)
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+        b'/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>' % (PAGE_WIDTH, PAGE_HEIGHT),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(content), content),
+        b'<< /Title (%s) >>' % _encode(f"{lines['heading']} - {lines['course']}"),
+    ]
+
+    pdf = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b'%010d 00000 n \n' % offset
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R /Info 7 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def render_certificate(certificate):
+    """
+    Write the certificate's PDF unless this version already exists and drop
+    older versions. Returns the path of the file.
+    """
+    lines = certificate_lines(certificate)
+    path = pdf_path(certificate, render_key(certificate, lines))
+    if not os.path.isfile(path):
+        os.makedirs(settings.CERTIFICATE_ROOT, exist_ok=True)
+        # Write aside and rename, so readers never see a partial file
+        partial = f"{path}.{os.getpid()}.part"
+        with open(partial, 'wb') as f:
+            f.write(render_pdf(lines))
+        os.replace(partial, path)
+
+    prefix = f"{certificate.certificate_id}-"
+    for name in os.listdir(settings.CERTIFICATE_ROOT):
+        if name.startswith(prefix) and name.endswith('.pdf') and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(settings.CERTIFICATE_ROOT, name))
+            except FileNotFoundError:
+                pass
+    return path
+
+
+def request_render(certificate):
+    """Queue a render of the certificate's current version unless it is on disk or already queued"""
+    from .models import CertificateTask
+
+    key = render_key(certificate)
+    if os.path.isfile(pdf_path(certificate, key)):
+        return None
+    return CertificateTask.enqueue(certificate, key)
@@ -0,0 +1,177 @@
+# student_dashboard/certificates.py
+"""
+Certificate overview of one student across a list of courses.
+
+CertificateOverview loads the lesson counts, completed lessons,
+enrollments and certificates for every course at once, one grouped query
+each, and answers the per-course questions of the certificates page from
+memory. overview_entries() builds that page; CertificateSerializer reads
+the same figures from its context.
+"""
+from django.db.models import Count
+from django.utils import timezone
+
+from admin_dashboard.models import CourseContentStats, Enrollment
+from .models import Certificate, CourseProgress, StudentExercise
+
+
+ENROLLED_STATUSES = ['approved', 'completed']
+
+
+class CertificateOverview:
+    def __init__(self, student_id, courses):
+        """`student_id` is None for guests, who only get lesson counts"""
+        self.student_id = student_id
+        self.courses = list(courses)
+        course_ids = [course.id for course in self.courses]
+
+        # 1. Active lessons per course
+        self._lessons = dict(
+            CourseContentStats.objects.filter(course_id__in=course_ids).values_list('course_id', 'active_lessons')
+        )
+        for course in self.courses:
+            if course.id not in self._lessons:
+                self._lessons[course.id] = CourseContentStats.for_course(course).active_lessons
+
+        self._completed = {}
+        self._enrollments = {}
+        self._certificates = {}
+        if student_id is None:
+            return
+
+        # 2. Completed lessons from the stored progress rows, counted for courses without one
+        self._completed = dict(
+            CourseProgress.objects.filter(student_id=student_id, course_id__in=course_ids)
+            .values_list('course_id', 'completed_lessons')
+        )
+        missing = [course_id for course_id in course_ids if course_id not in self._completed]
+        if missing:
+            self._completed.update(
+                StudentExercise.objects.filter(student_id=student_id, completed=True,
+                                               lesson__course_id__in=missing)
+                .values('lesson__course_id').annotate(count=Count('id'))
+                .values_list('lesson__course_id', 'count').order_by()
+            )
+
+        # 3. Enrollment status per course
+        self._enrollments = dict(
+            Enrollment.objects.filter(student_id=student_id, course_id__in=course_ids)
+            .values_list('course_id', 'status')
+        )
+
+        # 4. Active certificates
+        self._certificates = {
+            certificate.course_id: certificate
+            for certificate in Certificate.objects.filter(
+                user_id=student_id, course_id__in=course_ids, is_active=True
+            )
+        }
+
+    def covers(self, student_id, course_id):
+        return student_id == self.student_id and course_id in self._lessons
+
+    def total_lessons(self, course_id):
+        return self._lessons.get(course_id, 0)
+
+    def completed_lessons(self, course_id):
+        return self._completed.get(course_id, 0)
+
+    def progress(self, course_id):
+        total = self.total_lessons(course_id)
+        if total == 0:
+            return 0
+        return round((self.completed_lessons(course_id) / total) * 100, 1)
+
+    def is_enrolled(self, course_id):
+        return self._enrollments.get(course_id) in ENROLLED_STATUSES
+
+    def certificate(self, course_id):
+        return self._certificates.get(course_id)
+
+    def certificate_valid(self, course_id):
+        """Same rule as Certificate.is_valid: a completed enrollment and every lesson done"""
+        total = self.total_lessons(course_id)
+        return (self._enrollments.get(course_id) == 'completed'
+                and total > 0 and self.completed_lessons(course_id) >= total)
+
+
+def _guest_entry(course_data, course):
+    return {
+        **course_data,
+        'certificate_id': f'guest-{course.code}',
+        'issue_date': 'Available upon completion',
+        'formatted_grade': '0%',
+        'download_url': None,
+        'is_valid': False,
+        'accessible': False,
+        'message': 'Sign up and complete this course to earn a certificate',
+        'progress': 0,
+        'is_enrolled': False,
+        'is_real_certificate': False
+    }
+
+
+def _certificate_entry(course_data, certificate, is_valid, progress, is_enrolled):
+    return {
+        **course_data,
+        'certificate_id': str(certificate.certificate_id),
+        'issue_date': certificate.issued_date.strftime('%B %d, %Y'),
+        'formatted_grade': f"{certificate.grade}%",
+        'download_url': certificate.download_url,
+        'is_valid': is_valid,
+        'accessible': is_valid,
+        'message': 'Certificate available for download' if is_valid else 'Complete the course to access this certificate',
+        'progress': progress,
+        'is_enrolled': is_enrolled,
+        'is_real_certificate': True
+    }
+
+
+def _progress_entry(course_data, course, student_id, progress, is_enrolled):
+    is_completed = progress >= 100
+    return {
+        **course_data,
+        'certificate_id': f'course-{course.code}-{student_id}',
+        'issue_date': 'In Progress' if not is_completed else timezone.now().strftime('%B %d, %Y'),
+        'formatted_grade': f'{progress}%',
+        'download_url': f'/api/student/courses/{course.code}/generate-certificate/' if is_completed else None,
+        'is_valid': is_completed,
+        'accessible': is_completed and is_enrolled,
+        'message': 'Course completed! Click to generate certificate.' if is_completed else
+                  f'Progress: {progress}% - Complete all lessons to earn certificate' if is_enrolled else
+                  'Enroll in this course to earn a certificate',
+        'progress': progress,
+        'is_enrolled': is_enrolled,
+        'is_real_certificate': False
+    }
+
+
+def overview_entries(user, courses):
+    """Entries of the certificates page for `user` (or a guest), one per course"""
+    student_id = user.id if user is not None and user.is_authenticated else None
+    overview = CertificateOverview(student_id, courses)
+
+    entries = []
+    for course in overview.courses:
+        course_data = {
+            'id': course.id,
+            'course_title': course.title,
+            'course_code': course.code,
+            'category': course.category,
+            'teacher_name': course.teacher_name,
+            'total_lessons': overview.total_lessons(course.id),
+            'description': course.description,
+        }
+        if student_id is None:
+            entries.append(_guest_entry(course_data, course))
+            continue
+
+        progress = overview.progress(course.id)
+        is_enrolled = overview.is_enrolled(course.id)
+        certificate = overview.certificate(course.id)
+        if certificate is not None:
+            entries.append(_certificate_entry(course_data, certificate, overview.certificate_valid(course.id),
+                                              progress, is_enrolled))
+        else:
+            entries.append(_progress_entry(course_data, course, student_id, progress, is_enrolled))
+    return entries
@@ -0,0 +1,116 @@
+# student_dashboard/comment_threads.py
+"""
+Batch loading of comment threads for serialization.
+
+CommentThreads takes a page of comments and loads, in a fixed number of
+queries whatever the thread sizes, every reply of those comments with its
+author and the viewer's own reactions; like/dislike counts are stored on
+the rows. The reply trees are assembled in memory. The comment and reply
+serializers read from it through their context instead of querying per
+object.
+
+The paginated feed does not ship reply trees: CommentThreads.counts_only()
+loads just the reply counts of a comment page, and for_reply_page() the
+figures of one page of replies. Both keep the query count fixed.
+"""
+from collections import defaultdict
+
+from django.db.models import Count
+
+from .models import CommentReaction, Reply, ReplyReaction
+
+
+def _viewer(user):
+    return user if user is not None and user.is_authenticated else None
+
+
+class CommentThreads:
+    def __init__(self, comment_ids, user=None, replies=None):
+        """
+        Threads of `comment_ids`. `replies` defaults to every reply of those
+        comments; pass a list to limit the figures to those replies.
+        """
+        self.comment_ids = set(comment_ids)
+        self.viewer = _viewer(user)
+        self.full_tree = replies is None
+        self._comment_reply_counts = None
+        self._child_counts = None
+
+        # 1. Every reply of the page, nested or not, in thread order
+        if replies is None:
+            replies = list(
+                Reply.objects.filter(comment_id__in=self.comment_ids)
+                .select_related('user').order_by('created_at', 'id')
+            )
+        self._replies = defaultdict(list)
+        self._children = defaultdict(list)
+        for reply in replies:
+            self._replies[reply.comment_id].append(reply)
+            if reply.parent_reply_id is not None:
+                self._children[reply.parent_reply_id].append(reply)
+        reply_ids = [reply.id for reply in replies]
+
+        # 2 and 3. The viewer's own reactions
+        self._own_comment_reactions = {}
+        self._own_reply_reactions = {}
+        if self.viewer is not None:
+            self._own_comment_reactions = dict(
+                CommentReaction.objects.filter(user=self.viewer, comment_id__in=self.comment_ids)
+                .values_list('comment_id', 'reaction_type')
+            )
+            if reply_ids:
+                self._own_reply_reactions = dict(
+                    ReplyReaction.objects.filter(user=self.viewer, reply_id__in=reply_ids)
+                    .values_list('reply_id', 'reaction_type')
+                )
+
+        # Without the full tree, nested replies are only counted
+        if not self.full_tree and reply_ids:
+            self._child_counts = dict(
+                Reply.objects.filter(parent_reply_id__in=reply_ids).values('parent_reply_id')
+                .annotate(count=Count('id')).values_list('parent_reply_id', 'count').order_by()
+            )
+
+    @classmethod
+    def for_comments(cls, comments, request=None):
+        return cls([comment.id for comment in comments], request.user if request else None)
+
+    @classmethod
+    def counts_only(cls, comments, request=None):
+        """Reply counts and own reactions of a comment page, without loading any reply"""
+        threads = cls([comment.id for comment in comments], request.user if request else None, replies=[])
+        threads._comment_reply_counts = dict(
+            Reply.objects.filter(comment_id__in=threads.comment_ids).values('comment_id')
+            .annotate(count=Count('id')).values_list('comment_id', 'count').order_by()
+        )
+        return threads
+
+    @classmethod
+    def for_reply_page(cls, comment_id, replies, request=None):
+        """Own reactions and nested reply counts of one page of a comment's replies"""
+        return cls([comment_id], request.user if request else None, replies=list(replies))
+
+    def covers(self, comment_id):
+        return comment_id in self.comment_ids
+
+    def replies(self, comment_id):
+        return self._replies.get(comment_id, [])
+
+    def reply_count(self, comment_id):
+        if self._comment_reply_counts is not None:
+            return self._comment_reply_counts.get(comment_id, 0)
+        return len(self._replies.get(comment_id, []))
+
+    def children(self, reply_id):
+        return self._children.get(reply_id, [])
+
+    def nested_reply_count(self, reply_id):
+        if self._child_counts is not None:
+            return self._child_counts.get(reply_id, 0)
+        return len(self._children.get(reply_id, []))
+
+    def own_comment_reaction(self, comment_id):
+        return self._own_comment_reactions.get(comment_id)
+
+    def own_reply_reaction(self, reply_id):
+        return self._own_reply_reactions.get(reply_id)
@@ -0,0 +1,430 @@
+# student_dashboard/exercises.py
+"""
+Exercise compiler.
+
+Lesson.exercise is stored in several legacy shapes: a list of questions,
+a {'questions': [...]} dict, or one dict per exercise type
+({'multiple_choice': {...}, 'fill_blank': {...}, ...}). compile_lesson()
+normalizes it once into an immutable question table keyed by id, and keeps
+the payloads the lesson endpoints render. Results are cached per
+(lesson id, updated_at), so grading a submission is a dict lookup.
+"""
+import copy
+import json
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+
+EXERCISE_TYPE_KEYS = ['multiple_choice', 'fill_blank', 'paragraph', 'true_false']
+FILL_BLANK_TYPES = ('fill-blank', 'fill_blank')
+CHOICE_TYPES = ('multiple-choice', 'true-false', 'true_false')
+
+CACHE_SIZE = 512
+
+logger = logging.getLogger(__name__)
+
+Question = namedtuple('Question', ['id', 'type', 'data', 'correct_answer', 'normalized_answer', 'has_answer'])
+FollowUp = namedtuple('FollowUp', ['data', 'correct_answer', 'normalized_answer'])
+
+
+def normalize_answer(answer):
+    """Case and whitespace insensitive form used to compare fill-blank answers"""
+    if answer is None:
+        return ''
+    return ' '.join(str(answer).strip().lower().split())
+
+
+class CompiledExercise:
+    """Normalized, read-only view of one Lesson.exercise value"""
+
+    def __init__(self, exercise_data):
+        self.grading_error = None
+        try:
+            self.questions = tuple(_compile_question(q) for q in _grading_questions(exercise_data))
+        except Exception as e:
+            self.questions = ()
+            self.grading_error = str(e)
+
+        by_id = {}
+        for question in self.questions:
+            by_id.setdefault(question.id, question)  # The first question with an id wins
+        self.by_id = MappingProxyType(by_id)
+        self.question_ids = tuple(question.id for question in self.questions)
+
+        self.followups = MappingProxyType(_compile_followups(exercise_data))
+        self._exercises = tuple(_render_exercises(exercise_data))
+        self._guest_exercises = tuple(_render_guest_exercises(exercise_data))
+
+    @property
+    def total_questions(self):
+        return len(self.questions)
+
+    def question(self, question_id):
+        return self.by_id.get(str(question_id))
+
+    def followup(self, question_id):
+        return self.followups.get(str(question_id))
+
+    def exercises(self):
+        """Exercise payloads for LessonDetailSerializer (copies, safe to modify)"""
+        return copy.deepcopy(list(self._exercises))
+
+    def guest_exercises(self):
+        """Exercise payloads in the parse_exercises_from_lesson format (copies)"""
+        return copy.deepcopy(list(self._guest_exercises))
+
+
+def grade(question, submitted_answer):
+    """Return True when submitted_answer is correct for a compiled question"""
+    if question.type in CHOICE_TYPES:
+        return int(submitted_answer) == int(question.correct_answer)
+    if question.type in FILL_BLANK_TYPES:
+        return question.correct_answer is not None and normalize_answer(submitted_answer) == question.normalized_answer
+    return question.type == 'paragraph'
+
+
+# ── Grading table ────────────────────────────────────────────────────────────
+
+def _grading_questions(exercise_data):
+    if not exercise_data:
+        return []
+
+    if isinstance(exercise_data, list):
+        questions = [dict(q) for q in exercise_data]
+    elif isinstance(exercise_data, dict):
+        if 'questions' in exercise_data:
+            questions = [dict(q) for q in exercise_data['questions']]
+        else:
+            questions = []
+            for exercise_type in EXERCISE_TYPE_KEYS:
+                if exercise_type in exercise_data:
+                    ex_data = dict(exercise_data[exercise_type])
+                    ex_data['type'] = exercise_type.replace('_', '-')
+                    ex_data['id'] = ex_data.get('id', f'question_{len(questions) + 1}')
+                    questions.append(ex_data)
+    else:
+        return []
+
+    for i, question in enumerate(questions):
+        if not question.get('id'):
+            question['id'] = f'question_{i + 1}'
+    return questions
+
+
+def _compile_question(data):
+    question_type = data.get('type', 'multiple-choice')
+    correct_answer = None
+    has_answer = True
+
+    if question_type in CHOICE_TYPES:
+        correct_answer = data.get('correct_answer', data.get('correct', 0))
+    elif question_type in FILL_BLANK_TYPES:
+        if 'answers' in data and data['answers']:
+            correct_answer = data['answers'][0]
+        elif 'answer' in data:
+            correct_answer = data['answer']
+        elif 'correct_answer' in data:
+            correct_answer = data['correct_answer']
+        elif 'correct' in data:
+            correct_answer = data['correct']
+        else:
+            has_answer = False
+    elif question_type == 'paragraph':
+        correct_answer = "Answer saved successfully"
+
+    return Question(
+        id=str(data.get('id', '')),
+        type=question_type,
+        data=MappingProxyType(copy.deepcopy(data)),
+        correct_answer=correct_answer,
+        normalized_answer=normalize_answer(correct_answer),
+        has_answer=has_answer,
+    )
+
+
+# ── Follow-up questions ──────────────────────────────────────────────────────
+
+def _compile_followups(exercise_data):
+    """Follow-ups keyed by the question's own id (default ids are not assigned here)"""
+    if isinstance(exercise_data, list):
+        candidates = exercise_data
+    elif isinstance(exercise_data, dict):
+        if 'questions' in exercise_data:
+            candidates = exercise_data['questions']
+        elif 'id' in exercise_data:
+            candidates = [exercise_data]
+        else:
+            candidates = []
+    else:
+        candidates = []
+
+    followups = {}
+    for exercise in candidates:
+        if not isinstance(exercise, dict):
+            continue
+        key = str(exercise.get('id'))
+        if key in followups:
+            continue
+
+        follow_up_data = None
+        try:
+            if 'follow_up' in exercise:
+                follow_up_data = exercise['follow_up']
+            elif exercise.get('type') == 'multiple-choice' and exercise.get('options'):
+                # Generate auto follow-up
+                correct_option = exercise.get('options', [])[exercise.get('correct', 0)]
+                question_snippet = exercise.get('question', '')[:50]
+                follow_up_data = {
+                    'question': f'Complete this sentence: The correct answer to "{question_snippet}..." is _______.',
+                    'correct_answer': correct_option,
+                    'explanation': f'The correct answer is "{correct_option}". This reinforces your understanding of the concept.'
+                }
+        except Exception as e:
+            logger.warning(f"Error building follow-up for exercise {key}: {e}", exc_info=True)
+            follow_up_data = None
+
+        if follow_up_data:
+            correct_answer = follow_up_data.get('correct_answer', '')
+            followups[key] = FollowUp(
+                data=MappingProxyType(copy.deepcopy(follow_up_data)),
+                correct_answer=correct_answer,
+                normalized_answer=str(correct_answer).strip().lower(),
+            )
+        else:
+            followups[key] = None
+    return followups
+
+
+# ── Rendering ────────────────────────────────────────────────────────────────
+
+def _render_exercises(exercise_data):
+    """Payloads returned by LessonDetailSerializer.get_exercises"""
+    if not exercise_data:
+        return []
+
+    exercises = []
+    try:
+        if isinstance(exercise_data, list):
+            for i, ex in enumerate(exercise_data):
+                exercise = format_exercise(ex, i + 1)
+                if exercise:
+                    exercises.append(exercise)
+        elif isinstance(exercise_data, dict):
+            if 'questions' in exercise_data:
+                for i, ex in enumerate(exercise_data['questions']):
+                    exercise = format_exercise(ex, i + 1)
+                    if exercise:
+                        exercises.append(exercise)
+            else:
+                exercise_index = 1
+                for ex_type in EXERCISE_TYPE_KEYS:
+                    if ex_type in exercise_data:
+                        exercise = format_exercise_by_type(exercise_data[ex_type], ex_type, exercise_index)
+                        if exercise:
+                            exercises.append(exercise)
+                            exercise_index += 1
+    except Exception as e:
+        logger.warning(f"Error parsing exercises: {e}", exc_info=True)
+
+    return exercises
+
+
+def format_exercise_by_type(ex_data, ex_type, index):
+    """Format exercise based on type"""
+    exercise = {
+        'id': str(ex_data.get('id', f'question_{index}')),
+        'type': ex_type.replace('_', '-'),
+        'explanation': ex_data.get('explanation', ''),
+    }
+
+    if ex_type == 'multiple_choice':
+        exercise['options'] = ex_data.get('options', [])
+        exercise['question'] = ex_data.get('question', '')
+        exercise['correct'] = ex_data.get('correct_answer', ex_data.get('correct', 0))
+
+    elif ex_type == 'fill_blank':
+        exercise['question'] = ex_data.get('text', ex_data.get('question', ''))
+        exercise['options'] = []
+
+        if 'answers' in ex_data and ex_data['answers']:
+            exercise['correct'] = ex_data['answers'][0]
+        elif 'answer' in ex_data:
+            exercise['correct'] = ex_data['answer']
+        else:
+            exercise['correct'] = ''
+
+    elif ex_type == 'true_false':
+        exercise['options'] = ['True', 'False']
+        exercise['question'] = ex_data.get('question', '')
+        correct_val = ex_data.get('correct_answer', True)
+        exercise['correct'] = 0 if correct_val else 1
+
+    elif ex_type == 'paragraph':
+        exercise['options'] = []
+        exercise['question'] = ex_data.get('prompt', ex_data.get('question', ''))
+        exercise['correct'] = None
+        exercise['word_count'] = {
+            'min': ex_data.get('word_count', {}).get('min', 1),
+            'max': 3000
+        }
+
+    return exercise
+
+
+def format_exercise(ex, index):
+    """Format individual exercise when exercises are in a list"""
+    if not isinstance(ex, dict):
+        return None
+
+    exercise_type = ex.get('type', 'multiple-choice')
+
+    if exercise_type in FILL_BLANK_TYPES:
+        question_text = ex.get('text', ex.get('question', ''))
+        if 'answers' in ex and ex['answers']:
+            correct_answer = ex['answers'][0]
+        elif 'answer' in ex:
+            correct_answer = ex['answer']
+        else:
+            correct_answer = ''
+
+    elif exercise_type == 'paragraph':
+        question_text = ex.get('prompt', ex.get('question', ''))
+        correct_answer = None
+
+    else:
+        question_text = ex.get('question', ex.get('prompt', ''))
+        correct_answer = ex.get('correct', ex.get('correct_answer', 0))
+
+    return {
+        'id': str(ex.get('id', f'question_{index}')),
+        'type': exercise_type,
+        'question': question_text,
+        'options': ex.get('options', []),
+        'correct': correct_answer,
+        'explanation': ex.get('explanation', ''),
+        'word_count': ex.get('word_count', {'min': 1, 'max': 3000}) if exercise_type == 'paragraph' else None
+    }
+
+
+def _render_guest_exercises(exercise_data):
+    """
+    Convert the database exercise format to the format the guest and legacy
+    lesson endpoints return (numeric ids, one entry per exercise type).
+    """
+    if not exercise_data:
+        return []
+
+    try:
+        # Already a list (already converted)
+        if isinstance(exercise_data, list):
+            return list(exercise_data)
+
+        if isinstance(exercise_data, str):
+            try:
+                return _render_guest_exercises(json.loads(exercise_data))
+            except json.JSONDecodeError:
+                return []
+
+        if not isinstance(exercise_data, dict):
+            return []
+
+        exercises = []
+        if 'paragraph' in exercise_data:
+            paragraph_data = exercise_data['paragraph']
+            exercises.append({
+                'id': len(exercises) + 1,
+                'type': 'paragraph',
+                'question': paragraph_data.get('prompt', 'Write about what you learned.'),
+                'word_count': paragraph_data.get('word_count', {'min': 50, 'max': 300}),
+                'explanation': paragraph_data.get('guidelines', '')
+            })
+
+        if 'fill_blank' in exercise_data:
+            fill_data = exercise_data['fill_blank']
+            exercises.append({
+                'id': len(exercises) + 1,
+                'type': 'fill-blank',  # Frontend expects 'fill-blank' with hyphen
+                'question': fill_data.get('text', ''),
+                'correct': fill_data.get('answers', [''])[0] if fill_data.get('answers') else '',
+                'explanation': fill_data.get('explanation', '')
+            })
+
+        if 'multiple_choice' in exercise_data:
+            mc_data = exercise_data['multiple_choice']
+            exercises.append({
+                'id': len(exercises) + 1,
+                'type': 'multiple-choice',
+                'question': mc_data.get('question', 'Choose the correct answer.'),
+                'options': mc_data.get('options', ['Option A', 'Option B', 'Option C', 'Option D']),
+                'correct': mc_data.get('correct_answer', 0),  # 0-based index for frontend
+                'explanation': mc_data.get('explanation', '')
+            })
+
+        if 'true_false' in exercise_data:
+            tf_data = exercise_data['true_false']
+            exercises.append({
+                'id': len(exercises) + 1,
+                'type': 'true-false',
+                'question': tf_data.get('question', 'True or False?'),
+                'options': ['True', 'False'],
+                'correct': 0 if tf_data.get('correct', True) else 1,  # 0 for True, 1 for False
+                'explanation': tf_data.get('explanation', '')
+            })
+
+        return exercises
+
+    except Exception as e:
+        logger.warning(f"Error parsing exercises: {e}", exc_info=True)
+        return []
+
+
+# ── Cache ────────────────────────────────────────────────────────────────────
+
+class _LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_compiled_cache = _LRUCache(CACHE_SIZE)
+
+
+def compile_exercise(exercise_data):
+    return CompiledExercise(exercise_data)
+
+
+def compile_lesson(lesson):
+    """
+    Compiled exercise for a lesson. Saving a lesson bumps updated_at,
+    so edited exercises get a new cache key and old entries age out.
+    """
+    if lesson.pk is None or lesson.updated_at is None:
+        return compile_exercise(lesson.exercise)
+
+    key = (lesson.pk, lesson.updated_at)
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = compile_exercise(lesson.exercise)
+        _compiled_cache.set(key, compiled)
+    return compiled
@@ -0,0 +1,250 @@
+# student_dashboard/grading.py
+"""
+Write path for exercise answer submissions.
+
+The enrollment check and the StudentExercise upsert run in one transaction
+with the row locked (select_for_update), so concurrent submissions from the
+same student cannot lose score increments. Only the changed columns are
+written and nothing is re-read after the save.
+
+SQLite ignores select_for_update and starts transactions deferred: two
+submissions that have both read would fail when upgrading to write
+("database is locked") instead of waiting. _take_write_lock() opens the
+grading transaction with a write, so the second one waits its turn on the
+busy timeout. Other transactions keep the default deferred mode.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from rest_framework import status
+
+from admin_dashboard.models import Enrollment
+from .exercises import FILL_BLANK_TYPES, compile_lesson, grade
+from .models import StudentExercise, CourseProgress
+
+
+SUBMISSION_STATUSES = ['approved', 'completed']
+
+
+class GradingError(Exception):
+    """A submission that cannot be graded; carries the response detail and status"""
+
+    def __init__(self, detail, status_code):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _take_write_lock():
+    """On SQLite, take the database write lock now rather than on the first write"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        # Matches no rows, but a write statement takes the lock (waiting on the busy timeout)
+        cursor.execute(f'UPDATE {StudentExercise._meta.db_table} SET id = id WHERE 0')
+
+
+def _lock_student_exercise(student_id, lesson_id):
+    """Fetch the student's row for the lesson with a row lock, creating it if needed"""
+    locked = StudentExercise.objects.select_for_update()
+    try:
+        return locked.get(student_id=student_id, lesson_id=lesson_id)
+    except StudentExercise.DoesNotExist:
+        pass
+
+    try:
+        with transaction.atomic():
+            return StudentExercise.objects.create(
+                student_id=student_id, lesson_id=lesson_id,
+                completed=False, score=0.0, submission_data={}
+            )
+    except IntegrityError:
+        # A concurrent submission created it first
+        return locked.get(student_id=student_id, lesson_id=lesson_id)
+
+
+def _check_enrollment(user, lesson):
+    enrolled = Enrollment.objects.filter(
+        student=user,
+        course_id=lesson.course_id,
+        status__in=SUBMISSION_STATUSES
+    ).exists()
+    if not enrolled:
+        raise GradingError('You are not enrolled in this course.', status.HTTP_403_FORBIDDEN)
+
+
+def _compiled_for_grading(lesson):
+    # Compiled once per lesson version; finding a question is a dict lookup
+    compiled = compile_lesson(lesson)
+    if compiled.grading_error:
+        raise GradingError('Error parsing lesson questions.', status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return compiled
+
+
+def _gradable_question(compiled, exercise_id):
+    question = compiled.question(exercise_id)
+    if not question:
+        raise GradingError(f'Question with ID {exercise_id} not found.', status.HTTP_404_NOT_FOUND)
+    if question.type in FILL_BLANK_TYPES and not question.has_answer:
+        raise GradingError('Question is missing answer configuration.', status.HTTP_400_BAD_REQUEST)
+    return question
+
+
+def _apply_answers(user, lesson, compiled, graded):
+    """
+    Store graded answers, a list of (question, answer, is_correct), with one
+    locked read and one write of the student's row. Returns the saved row
+    and the number of questions answered correctly.
+    """
+    student_exercise = _lock_student_exercise(user.id, lesson.id)
+    was_completed = student_exercise.completed
+    previous_score = float(student_exercise.score or 0)
+    score = previous_score
+
+    submission_data = student_exercise.submission_data or {}
+    submitted_at = timezone.now().isoformat()
+    for question, submitted_answer, is_correct in graded:
+        was_previously_correct = submission_data.get(question.id, {}).get('is_correct', False)
+        submission_data[question.id] = {
+            'answer': submitted_answer,
+            'is_correct': is_correct,
+            'submitted_at': submitted_at,
+            'question_type': question.type
+        }
+        # One point per question answered correctly; taken back if a correct answer is changed
+        if is_correct and not was_previously_correct:
+            score += 1.0
+        elif not is_correct and was_previously_correct:
+            score = max(0, score - 1.0)
+
+    student_exercise.submission_data = submission_data
+    changed_fields = ['submission_data']
+    if score != previous_score:
+        student_exercise.score = score
+        changed_fields.append('score')
+
+    total_questions = compiled.total_questions
+    completed_questions = sum(
+        1 for question_id in compiled.question_ids
+        if submission_data.get(question_id, {}).get('is_correct')
+    )
+
+    # Mark as completed if all questions answered correctly
+    if total_questions > 0 and completed_questions >= total_questions:
+        if not student_exercise.completed:
+            student_exercise.completed = True
+            changed_fields.append('completed')
+        if not student_exercise.completed_at:
+            student_exercise.completed_at = timezone.now()
+            changed_fields.append('completed_at')
+
+    student_exercise.save(update_fields=changed_fields)
+
+    CourseProgress.record(
+        user.id, lesson.course_id,
+        completed_delta=int(student_exercise.completed and not was_completed),
+        score_delta=float(student_exercise.score) - previous_score
+    )
+    return student_exercise, completed_questions
+
+
+def _progress_payload(student_exercise, compiled, completed_questions):
+    return {
+        'score': float(student_exercise.score),
+        'total_questions': compiled.total_questions,
+        'completed_questions': completed_questions,
+        'lesson_completed': student_exercise.completed,
+        'completed_at': student_exercise.completed_at.isoformat() if student_exercise.completed_at else None
+    }
+
+
+def _question_result(question, submitted_answer, is_correct):
+    result = {
+        'question_id': question.id,
+        'submitted_answer': submitted_answer,
+        'is_correct': is_correct,
+    }
+    if not is_correct and question.type != 'paragraph':
+        result['correct_answer'] = question.correct_answer
+    return result
+
+
+def _grade(question, submitted_answer):
+    """grade(), with an answer of the wrong shape (e.g. text for a choice) rejected as a GradingError"""
+    try:
+        return grade(question, submitted_answer)
+    except (TypeError, ValueError):
+        raise GradingError('Invalid answer format for this question.', status.HTTP_400_BAD_REQUEST)
+
+
+def submit_answer(user, lesson, exercise_id, submitted_answer):
+    """
+    Grade one answer and store it. Returns the response payload;
+    raises GradingError for submissions that are rejected.
+    """
+    exercise_id = str(exercise_id)
+
+    with transaction.atomic():
+        _take_write_lock()
+        _check_enrollment(user, lesson)
+
+        if submitted_answer is None:
+            raise GradingError('Answer is required.', status.HTTP_400_BAD_REQUEST)
+
+        compiled = _compiled_for_grading(lesson)
+        question = _gradable_question(compiled, exercise_id)
+        is_correct = _grade(question, submitted_answer)
+
+        student_exercise, completed_questions = _apply_answers(
+            user, lesson, compiled, [(question, submitted_answer, is_correct)]
+        )
+
+    response_data = {'detail': 'Answer submitted successfully.'}
+    response_data.update(_question_result(question, submitted_answer, is_correct))
+    response_data.update(_progress_payload(student_exercise, compiled, completed_questions))
+    return response_data
+
+
+def submit_answers(user, lesson, answers):
+    """
+    Grade every answer of a lesson in one go; `answers` maps question id to
+    answer. Valid answers are stored with a single locked update of the
+    student's row. Unknown or ungradable questions, and answers of the wrong
+    shape, are reported per question and leave the stored submission untouched.
+    """
+    with transaction.atomic():
+        _take_write_lock()
+        _check_enrollment(user, lesson)
+
+        if not answers:
+            raise GradingError('Answers are required.', status.HTTP_400_BAD_REQUEST)
+
+        compiled = _compiled_for_grading(lesson)
+
+        results = []
+        graded = []
+        for exercise_id, submitted_answer in answers.items():
+            exercise_id = str(exercise_id)
+            if submitted_answer is None:
+                results.append({'question_id': exercise_id, 'detail': 'Answer is required.'})
+                continue
+            try:
+                question = _gradable_question(compiled, exercise_id)
+                is_correct = _grade(question, submitted_answer)
+            except GradingError as e:
+                results.append({'question_id': exercise_id, 'detail': e.detail})
+                continue
+
+            graded.append((question, submitted_answer, is_correct))
+            results.append(_question_result(question, submitted_answer, is_correct))
+
+        if not graded:
+            raise GradingError('No valid answers submitted.', status.HTTP_400_BAD_REQUEST)
+
+        student_exercise, completed_questions = _apply_answers(user, lesson, compiled, graded)
+
+    response_data = {
+        'detail': f'{len(graded)} answers submitted successfully.',
+        'results': results,
+    }
+    response_data.update(_progress_payload(student_exercise, compiled, completed_questions))
+    return response_data
@@ -0,0 +1,59 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from student_dashboard.suggestions import PrefixIndex, build_entries
+
+WORDS = [
+    'budget', 'savings', 'investing', 'marketing', 'branding', 'leadership', 'habits',
+    'accounting', 'taxes', 'credit', 'negotiation', 'planning', 'sales', 'strategy',
+    'writing', 'pricing', 'payroll', 'startup', 'funding', 'mindset', 'goals', 'teams',
+]
+
+class Command(BaseCommand):
+    help = 'Measure per-keystroke latency of the search suggestion prefix index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--synthetic', type=int, default=0,
+                            help='Benchmark against this many generated lesson titles instead of the database')
+        parser.add_argument('--queries', type=int, default=2000, help='Number of typed queries to replay')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        if options['synthetic']:
+            entries = []
+            for i in range(options['synthetic']):
+                title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+                entries.append({'type': 'lesson', 'title': f"{title} {i}", 'course_title': 'Course',
+                                'display': f"{title} {i} - Course"})
+        else:
+            entries = build_entries()
+
+        if not entries:
+            self.stdout.write(self.style.WARNING('No suggestion entries to benchmark'))
+            return
+
+        started = time.perf_counter()
+        index = PrefixIndex(entries)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        # Replay every prefix of a title as it would be typed, one lookup per keystroke
+        timings = []
+        for _ in range(options['queries']):
+            title = rng.choice(entries)['title'].lower()
+            for end in range(2, min(len(title), 20) + 1):
+                started = time.perf_counter()
+                index.lookup(title[:end])
+                timings.append((time.perf_counter() - started) * 1_000_000)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(f"Entries: {len(entries)}  build: {build_ms:.1f} ms  keystrokes: {len(timings)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"p50: {statistics.median(timings):.1f} µs  p99: {p99:.1f} µs  max: {timings[-1]:.1f} µs"
+            )
+        )
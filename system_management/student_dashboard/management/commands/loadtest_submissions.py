@@ -0,0 +1,81 @@
+import contextlib
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = ('Measure submit_exercise_answer throughput against a throwaway test database '
+            'and check that scores stay consistent under concurrent submissions')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=600, help='Total submissions to send')
+        parser.add_argument('--threads', type=int, default=1, help='Concurrent clients')
+        parser.add_argument('--students', type=int, default=3, help='Students sharing the load')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # A file database: SQLite's shared in-memory test database locks whole tables
+        test_name = os.path.join(tempfile.mkdtemp(), 'loadtest.sqlite3')
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = test_name
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+        try:
+            self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, options):
+        from accounts.models import CustomUser, Course
+        from admin_dashboard.models import Lesson, Enrollment
+        from student_dashboard.models import StudentExercise
+
+        course = Course.objects.create(title='Load test', code='LOAD001', description='')
+        lesson = Lesson.objects.create(course=course, title='Load test lesson', order=1, exercise={'questions': [
+            {'id': f'q{i}', 'type': 'fill-blank', 'question': f'Answer {i}', 'answer': f'answer {i}'}
+            for i in range(5)
+        ]})
+        students = []
+        for i in range(options['students']):
+            student = CustomUser.objects.create_user(email=f'load{i}@example.com', password='pass1234')
+            Enrollment.objects.create(student=student, course=course, status='approved')
+            students.append(student)
+
+        def submit(n):
+            client = APIClient()
+            client.force_authenticate(user=students[n % len(students)])
+            question = n % 5
+            # Alternate right and wrong answers so scores move up and down
+            answer = f'answer {question}' if (n // 5) % 2 == 0 else 'wrong'
+            url = reverse('submit-exercise-answer', args=[lesson.id, f'q{question}'])
+            response = client.post(url, {'answer': answer}, format='json')
+            connections.close_all()
+            return response.status_code
+
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                codes = list(pool.map(submit, range(options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        errors = sum(1 for code in codes if code != 200)
+        inconsistent = 0
+        for exercise in StudentExercise.objects.filter(lesson=lesson):
+            correct = sum(1 for entry in exercise.submission_data.values() if entry.get('is_correct'))
+            if float(exercise.score) != float(correct):
+                inconsistent += 1
+
+        self.stdout.write(
+            f"{options['requests']} submissions, {options['threads']} threads: "
+            f"{elapsed:.2f}s, {options['requests'] / elapsed:.0f} req/s, {errors} errors"
+        )
+        style = self.style.SUCCESS if not inconsistent else self.style.ERROR
+        self.stdout.write(style(f"{inconsistent} of {len(students)} score rows disagree with their answers"))
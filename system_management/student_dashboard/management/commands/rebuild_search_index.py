@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from accounts.models import Course
+from admin_dashboard.models import Lesson
+from student_dashboard.models import SearchDocument
+from student_dashboard.search import clear_index, index_course, index_lesson
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index for all courses, lessons and exercises'
+
+    def handle(self, *args, **options):
+        clear_index()
+
+        courses = Course.objects.all()
+        for course in courses:
+            index_course(course)
+
+        lessons = Lesson.objects.select_related('course')
+        for lesson in lessons:
+            index_lesson(lesson)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {courses.count()} courses and {lessons.count()} lessons "
+                f"({SearchDocument.objects.count()} documents)"
+            )
+        )
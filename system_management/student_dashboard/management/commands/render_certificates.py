@@ -0,0 +1,54 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from student_dashboard.certificate_pdf import render_certificate, render_key
+from student_dashboard.models import Certificate, CertificateTask
+
+
+class Command(BaseCommand):
+    help = 'Run queued certificate renders: write each certificate PDF under CERTIFICATE_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+        parser.add_argument('--sleep', type=float, default=5.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--max-tasks', type=int, default=0, help='Exit after this many tasks (0 = no limit)')
+        parser.add_argument('--stale-minutes', type=int, default=10,
+                            help='Requeue running tasks whose worker has not reported for this long')
+
+    def handle(self, *args, **options):
+        processed = 0
+        while not options['max_tasks'] or processed < options['max_tasks']:
+            CertificateTask.requeue_stale(timezone.now() - timedelta(minutes=options['stale_minutes']))
+            task = CertificateTask.claim_next()
+            if task is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.run_task(task)
+            processed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rendered {processed} certificates"))
+
+    def run_task(self, task):
+        started = time.perf_counter()
+        try:
+            certificate = Certificate.objects.select_related('user', 'course__teacher__user').get(
+                pk=task.certificate_id
+            )
+            # The certificate may have changed since it was queued; render what it is now
+            path = render_certificate(certificate)
+        except Exception as e:
+            task.fail(e)
+            self.stderr.write(f"  Task {task.id} (certificate {task.certificate_id}) failed: {e}")
+            return
+
+        task.finish({'path': path, 'render_key': render_key(certificate)})
+        self.stdout.write(
+            f"  Task {task.id}: certificate {certificate.certificate_id} "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_course_progress(apps, schema_editor):
+    StudentExercise = apps.get_model('student_dashboard', 'StudentExercise')
+    Enrollment = apps.get_model('admin_dashboard', 'Enrollment')
+    CourseContentStats = apps.get_model('admin_dashboard', 'CourseContentStats')
+    CourseProgress = apps.get_model('student_dashboard', 'CourseProgress')
+
+    totals = dict(CourseContentStats.objects.values_list('course_id', 'active_lessons'))
+
+    rows = {
+        (student_id, course_id): {}
+        for student_id, course_id in Enrollment.objects.values_list('student_id', 'course_id')
+    }
+    exercise_totals = StudentExercise.objects.values('student_id', 'lesson__course_id').annotate(
+        completed_lessons=models.Count('id', filter=models.Q(completed=True)),
+        score_total=models.Sum('score'),
+        last_activity_at=models.Max('completed_at'),
+    )
+    for row in exercise_totals:
+        rows[(row['student_id'], row['lesson__course_id'])] = row
+
+    CourseProgress.objects.bulk_create([
+        CourseProgress(
+            student_id=student_id,
+            course_id=course_id,
+            completed_lessons=row.get('completed_lessons', 0),
+            total_lessons=totals.get(course_id, 0),
+            score_total=row.get('score_total') or 0.0,
+            last_activity_at=row.get('last_activity_at'),
+        )
+        for (student_id, course_id), row in rows.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_course_level_course_category'),
+        ('admin_dashboard', '0019_coursecontentstats'),
+        ('student_dashboard', '0013_comment_edited_comment_edited_at_reply_edited_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_lessons', models.PositiveIntegerField(default=0)),
+                ('total_lessons', models.PositiveIntegerField(default=0)),
+                ('score_total', models.FloatField(default=0.0)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_progress', to='accounts.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('student', 'course')},
+            },
+        ),
+        migrations.RunPython(backfill_course_progress, migrations.RunPython.noop),
+    ]
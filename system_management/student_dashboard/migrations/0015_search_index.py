@@ -0,0 +1,151 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:20
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+# Frozen copy of the student_dashboard.search indexing helpers as of this
+# migration, so later changes to them do not alter the backfill.
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+QUESTION_KEYS = ('question', 'text', 'prompt')
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(strip_tags(str(text)).lower())
+        if len(token) > 1
+    ]
+
+
+def term_weights(fields):
+    weights = Counter()
+    for text, field_weight in fields:
+        for token in tokenize(text):
+            weights[token] += field_weight
+    return weights
+
+
+def exercise_question_text(exercise):
+    parts = []
+
+    def walk(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in QUESTION_KEYS and isinstance(item, str):
+                    parts.append(item)
+                else:
+                    walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(exercise)
+    return ' '.join(parts)
+
+
+def course_documents(course):
+    return [(
+        'course', course.id, course.title, bool(course.is_active),
+        [(course.title, TITLE_WEIGHT), (course.code, TITLE_WEIGHT), (course.description, BODY_WEIGHT)],
+    )]
+
+
+def lesson_documents(lesson):
+    question_text = exercise_question_text(lesson.exercise) if lesson.exercise else ''
+    return [
+        ('lesson', lesson.id, lesson.title, bool(lesson.is_active),
+         [(lesson.title, TITLE_WEIGHT), (lesson.description, BODY_WEIGHT), (lesson.content, BODY_WEIGHT)]),
+        ('exercise', lesson.id, lesson.title, bool(lesson.is_active), [(question_text, BODY_WEIGHT)]),
+    ]
+
+
+def write_documents(documents, course, SearchDocument, SearchPosting):
+    is_public = course.is_public is not False
+    for doc_type, object_id, title, is_active, fields in documents:
+        weights = term_weights(fields)
+        if not weights:
+            SearchDocument.objects.filter(doc_type=doc_type, object_id=object_id).delete()
+            continue
+
+        document, created = SearchDocument.objects.update_or_create(
+            doc_type=doc_type,
+            object_id=object_id,
+            defaults={
+                'course_id': course.id,
+                'title': title[:255],
+                'is_active': is_active,
+                'is_public': is_public,
+                'length': round(sum(weights.values())),
+            }
+        )
+        if not created:
+            SearchPosting.objects.filter(document_id=document.id).delete()
+        SearchPosting.objects.bulk_create([
+            SearchPosting(document_id=document.id, term=term, weight=weight)
+            for term, weight in weights.items()
+        ])
+
+
+def build_search_index(apps, schema_editor):
+    Course = apps.get_model('accounts', 'Course')
+    Lesson = apps.get_model('admin_dashboard', 'Lesson')
+    SearchDocument = apps.get_model('student_dashboard', 'SearchDocument')
+    SearchPosting = apps.get_model('student_dashboard', 'SearchPosting')
+
+    for course in Course.objects.all():
+        write_documents(course_documents(course), course, SearchDocument, SearchPosting)
+    for lesson in Lesson.objects.select_related('course'):
+        write_documents(lesson_documents(lesson), lesson.course, SearchDocument, SearchPosting)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_course_level_course_category'),
+        ('admin_dashboard', '0020_enrollment_list_indexes'),
+        ('student_dashboard', '0014_courseprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('doc_type', models.CharField(choices=[('course', 'Course'), ('lesson', 'Lesson'), ('exercise', 'Exercise')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_public', models.BooleanField(default=True)),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='accounts.course')),
+            ],
+            options={
+                'unique_together': {('doc_type', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.FloatField(default=0.0)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='student_dashboard.searchdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'document'], name='search_posting_term_idx')],
+                'unique_together': {('document', 'term')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
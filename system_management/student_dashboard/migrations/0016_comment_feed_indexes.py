@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_remove_course_level_course_category'),
+        ('student_dashboard', '0015_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['course', 'is_active', '-created_at', '-id'], name='comment_course_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reply',
+            index=models.Index(fields=['comment', 'parent_reply', 'created_at', 'id'], name='reply_thread_page_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _reaction_count(Reaction, target_field, reaction_type):
+    counts = (
+        Reaction.objects.filter(**{target_field: OuterRef('pk')}, reaction_type=reaction_type)
+        .values(target_field).annotate(count=Count('id')).values('count')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def backfill_reaction_counters(apps, schema_editor):
+    # Replies start counting from their reaction rows; comment counters are
+    # recounted too, since the old read-modify-write toggle could lose clicks
+    for target, reaction, field in [('Reply', 'ReplyReaction', 'reply'),
+                                    ('Comment', 'CommentReaction', 'comment')]:
+        Target = apps.get_model('student_dashboard', target)
+        Reaction = apps.get_model('student_dashboard', reaction)
+        Target.objects.update(
+            likes=_reaction_count(Reaction, field, 'like'),
+            dislikes=_reaction_count(Reaction, field, 'dislike'),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_dashboard', '0016_comment_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reply',
+            name='dislikes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reply',
+            name='likes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_reaction_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_dashboard', '0017_reply_reaction_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('render_key', models.CharField(help_text='Version of the certificate to render, see certificate_pdf.render_key', max_length=64)),
+                ('certificate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='render_tasks', to='student_dashboard.certificate')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['status', 'run_after'], name='certificate_task_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_dashboard', '0018_certificate_tasks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificatetask',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
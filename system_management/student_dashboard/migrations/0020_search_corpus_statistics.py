@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:38
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def store_corpus_statistics(apps, schema_editor):
+    SearchDocument = apps.get_model('student_dashboard', 'SearchDocument')
+    SearchPosting = apps.get_model('student_dashboard', 'SearchPosting')
+    SearchStats = apps.get_model('student_dashboard', 'SearchStats')
+    SearchTerm = apps.get_model('student_dashboard', 'SearchTerm')
+
+    totals = SearchDocument.objects.aggregate(count=Count('id'), length=Sum('length'))
+    SearchStats.objects.create(pk=1, documents=totals['count'], total_length=totals['length'] or 0)
+    SearchTerm.objects.bulk_create([
+        SearchTerm(term=term, documents=count)
+        for term, count in SearchPosting.objects.values('term').annotate(count=Count('id'))
+        .values_list('term', 'count').order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student_dashboard', '0019_background_task_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('total_length', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, unique=True)),
+                ('documents', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='searchposting',
+            name='search_posting_term_idx',
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', '-weight'], name='search_posting_weight_idx'),
+        ),
+        migrations.RunPython(store_corpus_statistics, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
 
 from django.db import models
 from accounts.models import CustomUser, Course
+from admin_dashboard.models import BackgroundTask
 from django.utils import timezone
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.db.models.functions import Greatest
 import uuid
 
 # Create your models here.
@@ -20,6 +24,247 @@ class StudentExercise(models.Model):
     def __str__(self):
         return f"{self.student.email} - {self.lesson.title}"
 
+
+class CourseProgress(models.Model):
+    """Materialized per-student course progress, updated when an exercise changes"""
+    student = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='student_progress')
+    completed_lessons = models.PositiveIntegerField(default=0)
+    total_lessons = models.PositiveIntegerField(default=0)
+    score_total = models.FloatField(default=0.0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'course')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id}: {self.completed_lessons}/{self.total_lessons}"
+
+    @property
+    def percentage(self):
+        if self.total_lessons == 0:
+            return 0
+        return round((self.completed_lessons / self.total_lessons) * 100, 1)
+
+    @classmethod
+    def compute(cls, student_id, course_id):
+        """An unsaved row computed from the student's exercises in one aggregate query"""
+        from admin_dashboard.models import CourseContentStats
+
+        totals = StudentExercise.objects.filter(
+            student_id=student_id,
+            lesson__course_id=course_id
+        ).aggregate(
+            completed_lessons=models.Count('id', filter=models.Q(completed=True)),
+            score_total=models.Sum('score'),
+            last_activity_at=models.Max('completed_at'),
+        )
+        total_lessons = CourseContentStats.objects.filter(course_id=course_id).values_list(
+            'active_lessons', flat=True
+        ).first()
+        if total_lessons is None:
+            total_lessons = CourseContentStats.compute(course_id)['active_lessons']
+
+        return cls(
+            student_id=student_id,
+            course_id=course_id,
+            completed_lessons=totals['completed_lessons'],
+            score_total=totals['score_total'] or 0.0,
+            total_lessons=total_lessons,
+            last_activity_at=totals['last_activity_at'],
+        )
+
+    @classmethod
+    def rebuild(cls, student_id, course_id):
+        """Recompute the row from the student's exercises and store it"""
+        computed = cls.compute(student_id, course_id)
+        progress, _ = cls.objects.update_or_create(
+            student_id=student_id,
+            course_id=course_id,
+            defaults={
+                'completed_lessons': computed.completed_lessons,
+                'score_total': computed.score_total,
+                'total_lessons': computed.total_lessons,
+                'last_activity_at': computed.last_activity_at,
+            }
+        )
+        return progress
+
+    @classmethod
+    def rebuild_course(cls, course_id):
+        """
+        Recompute the exercise totals of every stored row of a course in a
+        fixed number of queries. Rows are never created here, and the lesson
+        total is left to CourseContentStats.refresh.
+        """
+        rows = list(cls.objects.filter(course_id=course_id))
+        if not rows:
+            return
+        totals = {
+            entry['student_id']: entry
+            for entry in StudentExercise.objects.filter(
+                lesson__course_id=course_id,
+                student_id__in=[row.student_id for row in rows]
+            ).values('student_id').annotate(
+                completed_lessons=models.Count('id', filter=models.Q(completed=True)),
+                score_total=models.Sum('score'),
+                last_activity_at=models.Max('completed_at'),
+            ).order_by()
+        }
+        for row in rows:
+            entry = totals.get(row.student_id, {})
+            row.completed_lessons = entry.get('completed_lessons', 0)
+            row.score_total = entry.get('score_total') or 0.0
+            row.last_activity_at = entry.get('last_activity_at')
+            row.updated_at = timezone.now()
+        cls.objects.bulk_update(rows, ['completed_lessons', 'score_total', 'last_activity_at', 'updated_at'])
+
+    @classmethod
+    def record(cls, student_id, course_id, completed_delta=0, score_delta=0.0):
+        """
+        Apply a change from a single exercise to the stored progress.
+        Call after the StudentExercise has been saved; a missing row is
+        rebuilt from scratch so the first write is never lost.
+        """
+        updated = cls.objects.filter(student_id=student_id, course_id=course_id).update(
+            completed_lessons=Greatest(models.F('completed_lessons') + completed_delta, models.Value(0)),
+            score_total=Greatest(models.F('score_total') + score_delta, models.Value(0.0)),
+            last_activity_at=timezone.now(),
+        )
+        if not updated:
+            cls.rebuild(student_id, course_id)
+
+    @classmethod
+    def for_student(cls, student_id, course_id):
+        """
+        Return the stored progress row. A missing row is computed but not
+        saved, so read paths never write; the next exercise change stores it.
+        """
+        progress = cls.objects.filter(student_id=student_id, course_id=course_id).first()
+        if progress is None:
+            progress = cls.compute(student_id, course_id)
+        return progress
+
+
+@receiver(post_delete, sender='admin_dashboard.Lesson')
+def rebuild_progress_on_lesson_delete(sender, instance, **kwargs):
+    # The lesson's exercises are gone by now; a course cascade has already
+    # removed the progress rows, so there is nothing left to rebuild then
+    CourseProgress.rebuild_course(instance.course_id)
+
+
+class SearchDocument(models.Model):
+    """One searchable course, lesson or lesson exercise in the inverted index"""
+    COURSE = 'course'
+    LESSON = 'lesson'
+    EXERCISE = 'exercise'
+
+    DOC_TYPE_CHOICES = [
+        (COURSE, 'Course'),
+        (LESSON, 'Lesson'),
+        (EXERCISE, 'Exercise'),
+    ]
+
+    doc_type = models.CharField(max_length=10, choices=DOC_TYPE_CHOICES)
+    object_id = models.PositiveIntegerField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='search_documents')
+    title = models.CharField(max_length=255)
+    is_active = models.BooleanField(default=True)
+    is_public = models.BooleanField(default=True)
+    length = models.PositiveIntegerField(default=0)  # Weighted token count, used for BM25 normalisation
+
+    class Meta:
+        unique_together = ('doc_type', 'object_id')
+
+    def __str__(self):
+        return f"{self.doc_type} {self.object_id}: {self.title}"
+
+
+class SearchPosting(models.Model):
+    """A term occurring in a document, with its field-weighted frequency"""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    term = models.CharField(max_length=64)
+    weight = models.FloatField(default=0.0)
+
+    class Meta:
+        unique_together = ('document', 'term')
+        indexes = [
+            # A term's postings, heaviest first, so search reads a bounded top slice
+            models.Index(fields=['term', '-weight'], name='search_posting_weight_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.document_id}"
+
+
+class SearchTerm(models.Model):
+    """An indexed term and the number of documents it occurs in, kept in step by the indexer"""
+    term = models.CharField(max_length=64, unique=True)
+    documents = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.documents})"
+
+
+class SearchStats(models.Model):
+    """Corpus totals of the search index for BM25, kept in step by the indexer; a single row"""
+    documents = models.PositiveIntegerField(default=0)
+    total_length = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).first() or cls(pk=1)
+
+    @property
+    def avg_length(self):
+        return self.total_length / self.documents if self.documents else 0.0
+
+
+@receiver(post_save, sender=Course)
+def index_course_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import index_course
+    from .suggestions import invalidate_suggestions
+    index_course(instance)
+    invalidate_suggestions()
+
+
+@receiver(pre_delete, sender=Course)
+def remove_course_from_index(sender, instance, **kwargs):
+    # Before the cascade, so the corpus totals can be taken down with the documents
+    from .search import remove_documents
+    remove_documents(SearchDocument.objects.filter(course_id=instance.id))
+
+
+@receiver(post_delete, sender=Course)
+def drop_course_suggestions(sender, instance, **kwargs):
+    from .suggestions import invalidate_suggestions
+    invalidate_suggestions()
+
+
+@receiver(post_save, sender='admin_dashboard.Lesson')
+def index_lesson_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import index_lesson
+    from .suggestions import invalidate_suggestions
+    index_lesson(instance)
+    invalidate_suggestions()
+
+
+@receiver(post_delete, sender='admin_dashboard.Lesson')
+def remove_lesson_from_index(sender, instance, **kwargs):
+    from .search import remove_documents
+    from .suggestions import invalidate_suggestions
+    invalidate_suggestions()
+    remove_documents(SearchDocument.objects.filter(
+        doc_type__in=[SearchDocument.LESSON, SearchDocument.EXERCISE],
+        object_id=instance.id
+    ))
+
+
 class GuestSession(models.Model):
     session_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -79,15 +324,15 @@ class Certificate(models.Model):
         return f"{self.user.email} - {self.course.title}"
 
     def generate_certificate(self):
-        """Generate certificate PDF and return download URL"""
-        # This would be implemented with your PDF generation logic
-        # For now, return a placeholder URL
-        return f"/api/certificates/{self.certificate_id}/download/"
+        """Queue the PDF for rendering, unless it is current already, and return the download URL"""
+        from .certificate_pdf import request_render
+
+        request_render(self)
+        return f"/api/student/certificates/{self.certificate_id}/download/"
 
     @property
     def is_valid(self):
         """Check if certificate is valid (user completed course)"""
-        from student_dashboard.models import StudentExercise
         from admin_dashboard.models import Enrollment
 
         # Check if user is enrolled and course is completed
@@ -101,14 +346,32 @@ class Certificate(models.Model):
             return False
 
         # Check if all lessons are completed
-        total_lessons = Lesson.objects.filter(course=self.course, is_active=True).count()
-        completed_lessons = StudentExercise.objects.filter(
-            student=self.user,
-            lesson__course=self.course,
-            completed=True
-        ).count()
+        progress = CourseProgress.for_student(self.user_id, self.course_id)
+
+        return progress.total_lessons > 0 and progress.completed_lessons >= progress.total_lessons
+
+class CertificateTask(BackgroundTask):
+    """
+    Rendering of a certificate PDF, in the background so a burst of course
+    completions does not tie up request workers. Queued by
+    Certificate.generate_certificate, run by render_certificates.
+    """
+    certificate = models.ForeignKey(Certificate, on_delete=models.CASCADE, related_name='render_tasks')
+    render_key = models.CharField(max_length=64, help_text="Version of the certificate to render, see certificate_pdf.render_key")
+
+    class Meta(BackgroundTask.Meta):
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='certificate_task_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.certificate_id} {self.render_key} ({self.status})"
 
-        return total_lessons > 0 and completed_lessons >= total_lessons
+    @classmethod
+    def enqueue(cls, certificate, render_key):
+        queued = cls.objects.filter(certificate=certificate, render_key=render_key,
+                                    status__in=['pending', 'running']).first()
+        return queued or cls.objects.create(certificate=certificate, render_key=render_key)
 
 class Comment(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='comments')
@@ -125,6 +388,10 @@ class Comment(models.Model):
     class Meta:
         db_table = 'comments_comment'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pages of a course's feed, newest first
+            models.Index(fields=['course', 'is_active', '-created_at', '-id'], name='comment_course_feed_idx'),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.email} on {self.course.title}"
@@ -156,6 +423,9 @@ class Reply(models.Model):
     # Add field to track nested replies
     parent_reply = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='nested_replies')
     additional_data = models.JSONField(default=dict, blank=True)  # For storing any extra data
+    # Maintained by student_dashboard.reactions
+    likes = models.PositiveIntegerField(default=0)
+    dislikes = models.PositiveIntegerField(default=0)
     edited = models.BooleanField(default=False)
     edited_at = models.DateTimeField(null=True, blank=True)
 
@@ -163,19 +433,14 @@ class Reply(models.Model):
     class Meta:
         db_table = 'comments_reply'
         ordering = ['created_at']
+        indexes = [
+            # Keyset pages of a comment's replies, or of the replies to one reply
+            models.Index(fields=['comment', 'parent_reply', 'created_at', 'id'], name='reply_thread_page_idx'),
+        ]
 
     def __str__(self):
         return f"Reply by {self.user.email} to comment {self.comment.id}"
 
-    # ✅ ADDED: Properties to calculate likes and dislikes
-    @property
-    def likes(self):
-        return self.reactions.filter(reaction_type='like').count()
-
-    @property
-    def dislikes(self):
-        return self.reactions.filter(reaction_type='dislike').count()
-
     # ✅ ADDED: Property to get nested replies
     @property
     def nested_replies(self):
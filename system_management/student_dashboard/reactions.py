@@ -0,0 +1,68 @@
+# student_dashboard/reactions.py
+"""
+Likes and dislikes on comments and replies.
+
+Comment and Reply store their like/dislike counters, so reading them costs
+nothing. A toggle upserts the user's reaction row and moves the counters
+with F() expressions in the same transaction: the database applies each
+delta to whatever the row holds at that moment, so concurrent clicks from
+different users never overwrite each other's increments and nobody locks
+the comment or reply row itself. The only row locked is the user's own
+reaction.
+"""
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from .models import Comment, CommentReaction, Reply, ReplyReaction
+
+
+REACTION_TYPES = ('like', 'dislike')
+COUNTER_FIELDS = {'like': 'likes', 'dislike': 'dislikes'}
+
+# Target model -> (reaction model, name of the reaction's foreign key)
+REACTION_MODELS = {
+    Comment: (CommentReaction, 'comment'),
+    Reply: (ReplyReaction, 'reply'),
+}
+
+
+def _move_counters(target, deltas):
+    updates = {}
+    for reaction_type, delta in deltas.items():
+        field = COUNTER_FIELDS[reaction_type]
+        if delta > 0:
+            updates[field] = F(field) + delta
+        else:
+            # Never below zero, even if the stored counter drifted
+            updates[field] = Greatest(F(field) - (-delta), Value(0))
+    type(target).objects.filter(pk=target.pk).update(**updates)
+
+
+def toggle_reaction(target, user, reaction_type):
+    """
+    Apply `user` clicking `reaction_type` on a Comment or Reply: the same
+    reaction again removes it, the other one switches it. Refreshes the
+    target's counters and returns 'added', 'removed' or 'changed'.
+    """
+    if reaction_type not in REACTION_TYPES:
+        raise ValueError(f'Unknown reaction type: {reaction_type}')
+    reaction_model, target_field = REACTION_MODELS[type(target)]
+
+    with transaction.atomic():
+        reaction, created = reaction_model.objects.select_for_update().get_or_create(
+            user=user, **{target_field: target}, defaults={'reaction_type': reaction_type}
+        )
+        if created:
+            action, deltas = 'added', {reaction_type: 1}
+        elif reaction.reaction_type == reaction_type:
+            reaction.delete()
+            action, deltas = 'removed', {reaction_type: -1}
+        else:
+            deltas = {reaction.reaction_type: -1, reaction_type: 1}
+            reaction_model.objects.filter(pk=reaction.pk).update(reaction_type=reaction_type)
+            action = 'changed'
+        _move_counters(target, deltas)
+
+    target.refresh_from_db(fields=list(COUNTER_FIELDS.values()))
+    return action
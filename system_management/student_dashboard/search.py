@@ -0,0 +1,294 @@
+# student_dashboard/search.py
+import math
+import re
+from collections import Counter, defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Sum, Value, When, Window
+from django.db.models.functions import Greatest, RowNumber
+from django.utils.html import strip_tags
+
+from .models import SearchDocument, SearchPosting, SearchStats, SearchTerm
+
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+MAX_TERM_EXPANSIONS = 20  # Indexed terms one query term may match
+MAX_POSTINGS_PER_TERM = 500  # Heaviest postings read for each of them
+
+# Matches in titles and codes count more than matches in body text
+TITLE_WEIGHT = 3.0
+BODY_WEIGHT = 1.0
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+PREFIX_PENALTY = 0.5  # "budg" matching "budgeting" ranks below an exact term match
+
+QUESTION_KEYS = ('question', 'text', 'prompt')
+
+SearchHit = namedtuple('SearchHit', ['document_id', 'doc_type', 'object_id', 'score'])
+
+
+def tokenize(text):
+    """Lowercase word tokens, ignoring single characters"""
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(strip_tags(str(text)).lower())
+        if len(token) > 1
+    ]
+
+
+def term_weights(fields):
+    """Field-weighted term frequencies for a list of (text, weight) pairs"""
+    weights = Counter()
+    for text, field_weight in fields:
+        for token in tokenize(text):
+            weights[token] += field_weight
+    return weights
+
+
+def exercise_question_text(exercise):
+    """Collect the question/prompt text from an exercise JSON in any of its formats"""
+    parts = []
+
+    def walk(value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in QUESTION_KEYS and isinstance(item, str):
+                    parts.append(item)
+                else:
+                    walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(exercise)
+    return ' '.join(parts)
+
+
+def course_documents(course):
+    """Index entries for a course: [(doc_type, object_id, title, is_active, fields)]"""
+    return [(
+        SearchDocument.COURSE, course.id, course.title, bool(course.is_active),
+        [(course.title, TITLE_WEIGHT), (course.code, TITLE_WEIGHT), (course.description, BODY_WEIGHT)],
+    )]
+
+
+def lesson_documents(lesson):
+    """Index entries for a lesson and, when it has questions, its exercise"""
+    documents = [(
+        SearchDocument.LESSON, lesson.id, lesson.title, bool(lesson.is_active),
+        [(lesson.title, TITLE_WEIGHT), (lesson.description, BODY_WEIGHT), (lesson.content, BODY_WEIGHT)],
+    )]
+    question_text = exercise_question_text(lesson.exercise) if lesson.exercise else ''
+    documents.append((
+        SearchDocument.EXERCISE, lesson.id, lesson.title, bool(lesson.is_active),
+        [(question_text, BODY_WEIGHT)],
+    ))
+    return documents
+
+
+def _move_term_counts(deltas):
+    """Apply {term: change in document count} to the vocabulary, dropping terms no document uses"""
+    added = [term for term, delta in deltas.items() if delta > 0]
+    if added:
+        SearchTerm.objects.bulk_create([SearchTerm(term=term) for term in added], ignore_conflicts=True)
+
+    by_delta = defaultdict(list)
+    for term, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(term)
+    for delta, terms in by_delta.items():
+        SearchTerm.objects.filter(term__in=terms).update(documents=Greatest(F('documents') + delta, Value(0)))
+
+    removed = [term for term, delta in deltas.items() if delta < 0]
+    if removed:
+        SearchTerm.objects.filter(term__in=removed, documents=0).delete()
+
+
+def _move_corpus_totals(documents_delta, length_delta):
+    if not documents_delta and not length_delta:
+        return
+    SearchStats.objects.get_or_create(pk=1)
+    SearchStats.objects.filter(pk=1).update(
+        documents=Greatest(F('documents') + documents_delta, Value(0)),
+        total_length=Greatest(F('total_length') + length_delta, Value(0)),
+    )
+
+
+def write_documents(documents, course):
+    """
+    Replace the stored postings for the given documents, keeping the
+    vocabulary's document counts and the corpus totals in step. Documents
+    without any terms are removed.
+    """
+    is_public = course.is_public is not False
+    term_deltas = Counter()
+    documents_delta = length_delta = 0
+    with transaction.atomic():
+        for doc_type, object_id, title, is_active, fields in documents:
+            weights = term_weights(fields)
+            if not weights:
+                remove_documents(SearchDocument.objects.filter(doc_type=doc_type, object_id=object_id))
+                continue
+
+            length = round(sum(weights.values()))
+            document, created = SearchDocument.objects.update_or_create(
+                doc_type=doc_type,
+                object_id=object_id,
+                defaults={
+                    'course_id': course.id,
+                    'title': title[:255],
+                    'is_active': is_active,
+                    'is_public': is_public,
+                    'length': length,
+                }
+            )
+            previous = {}
+            if created:
+                documents_delta += 1
+            else:
+                old_postings = SearchPosting.objects.filter(document_id=document.id)
+                previous = dict(old_postings.values_list('term', 'weight'))
+                old_postings.delete()
+            length_delta += length - round(sum(previous.values()))
+            term_deltas.update({term: 1 for term in weights.keys() - previous.keys()})
+            term_deltas.subtract({term: 1 for term in previous.keys() - weights.keys()})
+
+            SearchPosting.objects.bulk_create([
+                SearchPosting(document_id=document.id, term=term, weight=weight)
+                for term, weight in weights.items()
+            ])
+
+        _move_term_counts(term_deltas)
+        _move_corpus_totals(documents_delta, length_delta)
+
+
+def remove_documents(documents):
+    """Delete a queryset of SearchDocuments and take them out of the vocabulary and corpus totals"""
+    with transaction.atomic():
+        totals = documents.aggregate(count=Count('id'), length=Sum('length'))
+        if not totals['count']:
+            return
+        term_deltas = {
+            term: -count for term, count in SearchPosting.objects.filter(document__in=documents)
+            .values('term').annotate(count=Count('id')).values_list('term', 'count').order_by()
+        }
+        documents.delete()
+        _move_term_counts(term_deltas)
+        _move_corpus_totals(-totals['count'], -(totals['length'] or 0))
+
+
+def clear_index():
+    """Drop every document, term and total, e.g. before a full rebuild"""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        SearchTerm.objects.all().delete()
+        SearchStats.objects.all().delete()
+
+
+def index_course(course):
+    write_documents(course_documents(course), course)
+    # Lessons inherit the course's public flag
+    SearchDocument.objects.filter(course_id=course.id).exclude(
+        is_public=course.is_public is not False
+    ).update(is_public=course.is_public is not False)
+
+
+def index_lesson(lesson):
+    write_documents(lesson_documents(lesson), lesson.course)
+
+
+def set_lessons_active(lesson_ids, is_active):
+    """Mirror a bulk Lesson.is_active update, which does not send post_save"""
+    SearchDocument.objects.filter(
+        doc_type__in=[SearchDocument.LESSON, SearchDocument.EXERCISE],
+        object_id__in=list(lesson_ids)
+    ).update(is_active=is_active)
+
+
+def expand_term(term):
+    """
+    Indexed terms a query term matches: the term itself first, then the
+    commonest terms it is a prefix of, at most MAX_TERM_EXPANSIONS, as
+    (term, document count) pairs.
+    """
+    return list(
+        SearchTerm.objects.filter(term__gte=term, term__lt=term + '\uffff')
+        .order_by(Case(When(term=term, then=Value(0)), default=Value(1)), '-documents', 'term')
+        .values_list('term', 'documents')[:MAX_TERM_EXPANSIONS]
+    )
+
+
+def search(query, doc_types=None, public_only=False, limit=50):
+    """
+    Rank documents matching every term of the query with BM25.
+
+    Each query term also matches indexed terms it is a prefix of. The work
+    is bounded whatever the size of the index: a query term expands to at
+    most MAX_TERM_EXPANSIONS indexed terms, at most MAX_POSTINGS_PER_TERM
+    postings (the heaviest) are read for each, and the document counts and
+    corpus totals BM25 needs are stored by the indexer.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return []
+
+    expansions = {term: expand_term(term) for term in terms}
+    if not all(expansions.values()):
+        # A query term that matches nothing in the index: no document has every term
+        return []
+    document_frequency = {
+        indexed_term: count for expanded in expansions.values() for indexed_term, count in expanded
+    }
+
+    postings = SearchPosting.objects.filter(term__in=document_frequency, document__is_active=True)
+    if public_only:
+        postings = postings.filter(document__is_public=True)
+    if doc_types:
+        postings = postings.filter(document__doc_type__in=doc_types)
+    postings = postings.annotate(
+        rank=Window(RowNumber(), partition_by=[F('term')], order_by=F('weight').desc())
+    ).filter(rank__lte=MAX_POSTINGS_PER_TERM)
+
+    rows = list(postings.values_list(
+        'document_id', 'document__doc_type', 'document__object_id',
+        'document__length', 'term', 'weight'
+    ))
+    if not rows:
+        return []
+
+    corpus = SearchStats.current()
+    total_documents = corpus.documents or 1
+    avg_length = corpus.avg_length or 1.0
+
+    scores = defaultdict(float)
+    matched_terms = defaultdict(set)
+    documents = {}
+
+    for document_id, doc_type, object_id, length, indexed_term, weight in rows:
+        frequency = document_frequency[indexed_term]
+        idf = math.log(1 + (total_documents - frequency + 0.5) / (frequency + 0.5))
+        tf = weight * (K1 + 1) / (weight + K1 * (1 - B + B * length / avg_length))
+        term_score = idf * tf
+
+        for term in terms:
+            if indexed_term == term:
+                matched_terms[document_id].add(term)
+                scores[document_id] += term_score
+            elif indexed_term.startswith(term):
+                matched_terms[document_id].add(term)
+                scores[document_id] += term_score * PREFIX_PENALTY
+        documents[document_id] = (doc_type, object_id)
+
+    hits = [
+        SearchHit(document_id, doc_type, object_id, scores[document_id])
+        for document_id, (doc_type, object_id) in documents.items()
+        if len(matched_terms[document_id]) == len(terms)
+    ]
+    hits.sort(key=lambda hit: (-hit.score, hit.document_id))
+    return hits[:limit]
@@ -1,15 +1,18 @@
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from accounts.models import Course, CustomUser
-from admin_dashboard.models import Lesson, Enrollment, LessonProgress
+from admin_dashboard.models import Lesson, Enrollment, LessonProgress, CourseContentStats
 from django.db.models import Count, Q
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 from .models import(
      StudentExercise, GuestSession,
-     Certificate, Comment, CommentReaction, Reply
+     Certificate, Comment, CommentReaction, Reply, CourseProgress
 )
 from django.utils import timezone
+from .exercises import compile_lesson
+from .comment_threads import CommentThreads
+from .certificates import CertificateOverview
 
 
 class VideoConfigSerializer(serializers.Serializer):
@@ -53,15 +56,11 @@ class CourseListSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return 0
 
-        total_lessons = Lesson.objects.filter(course=obj, is_active=True).count()
+        total_lessons = CourseContentStats.for_course(obj).active_lessons
         if total_lessons == 0:
             return 0
 
-        completed_lessons = StudentExercise.objects.filter(
-            student=user,
-            lesson__course=obj,
-            completed=True
-        ).count()
+        completed_lessons = CourseProgress.for_student(user.id, obj.id).completed_lessons
 
         return round((completed_lessons / total_lessons) * 100, 1)
 
@@ -70,14 +69,10 @@ class CourseListSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return 0
 
-        return StudentExercise.objects.filter(
-            student=user,
-            lesson__course=obj,
-            completed=True
-        ).count()
+        return CourseProgress.for_student(user.id, obj.id).completed_lessons
 
     def get_total_lessons(self, obj):
-        return Lesson.objects.filter(course=obj, is_active=True).count()
+        return CourseContentStats.for_course(obj).active_lessons
 
     def get_enrollment_status(self, obj):
         user = self.context['request'].user
@@ -91,45 +86,17 @@ class CourseListSerializer(serializers.ModelSerializer):
         """
         ✅ FIXED: Count lessons with exercises (each lesson = 1 exercise regardless of questions)
         """
-        try:
-            lessons = Lesson.objects.filter(course=obj, is_active=True)
-            exercises_count = 0
-
-            for lesson in lessons:
-                # Check if lesson has ANY exercise data
-                if lesson.exercise:
-                    # Count this lesson as having 1 exercise
-                    exercises_count += 1
-
-            (f"📊 Course {obj.code}: {exercises_count} lessons with exercises out of {lessons.count()} total lessons")
-            return exercises_count
-
-        except Exception as e:
-            (f"❌ Error counting exercises for course {obj.code}: {e}")
-            return 0
+        return CourseContentStats.for_course(obj).exercise_lessons
 
     def get_video_count(self, obj):
         """
         ✅ NEW: Count lessons with videos in this course
         """
-        try:
-            # Use cached property or calculate
-            if hasattr(obj, 'video_count'):
-                return obj.video_count
-
-            lessons_with_videos = Lesson.objects.filter(
-                course=obj,
-                is_active=True
-            ).exclude(
-                Q(video_url__isnull=True) |
-                Q(video_url='') |
-                Q(video_url='null')
-            ).count()
-
-            return lessons_with_videos
-        except Exception as e:
-            (f"Error counting videos for course {obj.code}: {e}")
-            return 0
+        # Use cached property or the stored counters
+        if hasattr(obj, 'video_count'):
+            return obj.video_count
+
+        return CourseContentStats.for_course(obj).video_lessons
 
 class CourseDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for individual course view"""
@@ -153,15 +120,11 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return 0
 
-        total_lessons = Lesson.objects.filter(course=obj, is_active=True).count()
+        total_lessons = CourseContentStats.for_course(obj).active_lessons
         if total_lessons == 0:
             return 0
 
-        completed_lessons = StudentExercise.objects.filter(
-            student=user,
-            lesson__course=obj,
-            completed=True
-        ).count()
+        completed_lessons = CourseProgress.for_student(user.id, obj.id).completed_lessons
 
         return round((completed_lessons / total_lessons) * 100, 1)
 
@@ -170,14 +133,10 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         if not user.is_authenticated:
             return 0
 
-        return StudentExercise.objects.filter(
-            student=user,
-            lesson__course=obj,
-            completed=True
-        ).count()
+        return CourseProgress.for_student(user.id, obj.id).completed_lessons
 
     def get_total_lessons(self, obj):
-        return Lesson.objects.filter(course=obj, is_active=True).count()
+        return CourseContentStats.for_course(obj).active_lessons
 
     def get_teacher_name(self, obj):
         if obj.teacher and obj.teacher.user:
@@ -188,42 +147,13 @@ class CourseDetailSerializer(serializers.ModelSerializer):
         """
         ✅ NEW: Count lessons with videos in this course
         """
-        try:
-            lessons_with_videos = Lesson.objects.filter(
-                course=obj,
-                is_active=True
-            ).exclude(
-                Q(video_url__isnull=True) |
-                Q(video_url='') |
-                Q(video_url='null')
-            ).count()
-
-            (f"📊 Course {obj.code}: {lessons_with_videos} lessons with videos")
-            return lessons_with_videos
-        except Exception as e:
-            (f"Error counting videos for course {obj.code}: {e}")
-            return 0
+        return CourseContentStats.for_course(obj).video_lessons
 
     def get_total_exercises(self, obj):
         """
         ✅ NEW: Count lessons with exercises (each lesson = 1 exercise)
         """
-        try:
-            lessons = Lesson.objects.filter(course=obj, is_active=True)
-            exercises_count = 0
-
-            for lesson in lessons:
-                # Check if lesson has ANY exercise data
-                if lesson.exercise:
-                    # Count this lesson as having 1 exercise
-                    exercises_count += 1
-
-            (f"📊 CourseDetail {obj.code}: {exercises_count} lessons with exercises")
-            return exercises_count
-
-        except Exception as e:
-            (f"❌ Error counting exercises for course {obj.code}: {e}")
-            return 0
+        return CourseContentStats.for_course(obj).exercise_lessons
 
     def get_level(self, obj):
         """
@@ -265,205 +195,14 @@ class LessonDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_video_config(self, obj):
-        """Generate comprehensive video configuration - ALWAYS included"""
-        if not obj.video_url:
-            return None
-
-        original_url = obj.video_url
-        url_lower = original_url.lower()
-
-        if 'youtube.com' in url_lower or 'youtu.be' in url_lower:
-            source = 'youtube'
-            format_type = 'youtube'
-            embed_url = self._get_youtube_embed_url(original_url)
-            mime_type = None
-            player_type = 'iframe'
-            streaming_url = None
-
-        elif 'vimeo.com' in url_lower:
-            source = 'vimeo'
-            format_type = 'vimeo'
-            embed_url = self._get_vimeo_embed_url(original_url)
-            mime_type = None
-            player_type = 'iframe'
-            streaming_url = None
-
-        else:
-            if original_url.startswith('/media/videos/'):
-                normalized_url = original_url
-            elif original_url.startswith('videos/'):
-                normalized_url = f'/media/{original_url}'
-            elif not original_url.startswith(('http://', 'https://')):
-                normalized_url = f'/media/videos/{original_url}'
-            else:
-                normalized_url = original_url
-
-            source = 'local' if '/media/' in normalized_url else 'external'
-            format_type = obj.video_format or 'mp4'
-            embed_url = None
-            mime_type = f'video/{format_type}'
-            player_type = 'html5'
-
-            if source == 'local':
-                streaming_url = f'http://localhost:8000{normalized_url}'
-            else:
-                streaming_url = normalized_url
-
-        config = {
-            'url': original_url,
-            'source': source,
-            'format': format_type,
-            'mime_type': mime_type,
-            'duration': obj.video_duration or 0,
-            'file_size': obj.video_file_size or 0,
-            'supports_streaming': obj.supports_streaming,
-            'requires_authentication': obj.requires_authentication,
-            'allow_download': obj.allow_download,
-            'player_type': player_type,
-        }
-
-        if embed_url:
-            config['embed_url'] = embed_url
-        if streaming_url:
-            config['streaming_url'] = streaming_url
-
-        return config
-
-    def _get_youtube_embed_url(self, url):
-        url_lower = url.lower()
-        if 'youtube.com/embed/' in url_lower:
-            return url
-
-        video_id = None
-        if 'youtube.com/watch?v=' in url_lower:
-            video_id = url.split('youtube.com/watch?v=')[1].split('&')[0]
-        elif 'youtu.be/' in url_lower:
-            video_id = url.split('youtu.be/')[1].split('?')[0]
-
-        if video_id:
-            return f'https://www.youtube.com/embed/{video_id}?enablejsapi=1&origin=http://localhost:5173&rel=0'
-        return url
-
-    def _get_vimeo_embed_url(self, url):
-        url_lower = url.lower()
-        if 'player.vimeo.com/video/' in url_lower:
-            return url
-
-        video_id = None
-        if 'vimeo.com/' in url_lower:
-            video_id = url.split('vimeo.com/')[1].split('/')[0].split('?')[0]
-
-        if video_id:
-            return f'https://player.vimeo.com/video/{video_id}?title=0&byline=0&portrait=0'
-        return url
+        """Video configuration - ALWAYS included; read from the lesson's stored descriptor"""
+        return obj.get_video_config()
 
     def get_exercises(self, obj):
         """✅ ALWAYS parse and return exercises - regardless of completion status"""
         if not obj.exercise:
             return []
-
-        exercises = []
-
-        try:
-            if isinstance(obj.exercise, list):
-                for i, ex in enumerate(obj.exercise):
-                    exercise = self._format_exercise(ex, i + 1)
-                    if exercise:
-                        exercises.append(exercise)
-            elif isinstance(obj.exercise, dict):
-                if 'questions' in obj.exercise:
-                    for i, ex in enumerate(obj.exercise['questions']):
-                        exercise = self._format_exercise(ex, i + 1)
-                        if exercise:
-                            exercises.append(exercise)
-                else:
-                    exercise_index = 1
-                    for ex_type in ['multiple_choice', 'fill_blank', 'paragraph', 'true_false']:
-                        if ex_type in obj.exercise:
-                            ex_data = obj.exercise[ex_type]
-                            exercise = self._format_exercise_by_type(ex_data, ex_type, exercise_index)
-                            if exercise:
-                                exercises.append(exercise)
-                                exercise_index += 1
-        except Exception as e:
-            (f"Error parsing exercises: {e}")
-
-        return exercises
-
-    def _format_exercise_by_type(self, ex_data, ex_type, index):
-        """Format exercise based on type"""
-        exercise = {
-            'id': str(ex_data.get('id', f'question_{index}')),
-            'type': ex_type.replace('_', '-'),
-            'explanation': ex_data.get('explanation', ''),
-        }
-
-        if ex_type == 'multiple_choice':
-            exercise['options'] = ex_data.get('options', [])
-            exercise['question'] = ex_data.get('question', '')
-            exercise['correct'] = ex_data.get('correct_answer', ex_data.get('correct', 0))
-
-        elif ex_type == 'fill_blank':
-            exercise['question'] = ex_data.get('text', ex_data.get('question', ''))
-            exercise['options'] = []
-
-            if 'answers' in ex_data and ex_data['answers']:
-                exercise['correct'] = ex_data['answers'][0]
-            elif 'answer' in ex_data:
-                exercise['correct'] = ex_data['answer']
-            else:
-                exercise['correct'] = ''
-
-        elif ex_type == 'true_false':
-            exercise['options'] = ['True', 'False']
-            exercise['question'] = ex_data.get('question', '')
-            correct_val = ex_data.get('correct_answer', True)
-            exercise['correct'] = 0 if correct_val else 1
-
-        elif ex_type == 'paragraph':
-            exercise['options'] = []
-            exercise['question'] = ex_data.get('prompt', ex_data.get('question', ''))
-            exercise['correct'] = None
-            exercise['word_count'] = {
-                'min': ex_data.get('word_count', {}).get('min', 1),
-                'max': 3000
-            }
-
-        return exercise
-
-    def _format_exercise(self, ex, index):
-        """Format individual exercise when exercises are in a list"""
-        if not isinstance(ex, dict):
-            return None
-
-        exercise_type = ex.get('type', 'multiple-choice')
-
-        if exercise_type in ['fill-blank', 'fill_blank']:
-            question_text = ex.get('text', ex.get('question', ''))
-            if 'answers' in ex and ex['answers']:
-                correct_answer = ex['answers'][0]
-            elif 'answer' in ex:
-                correct_answer = ex['answer']
-            else:
-                correct_answer = ''
-
-        elif exercise_type == 'paragraph':
-            question_text = ex.get('prompt', ex.get('question', ''))
-            correct_answer = None
-
-        else:
-            question_text = ex.get('question', ex.get('prompt', ''))
-            correct_answer = ex.get('correct', ex.get('correct_answer', 0))
-
-        return {
-            'id': str(ex.get('id', f'question_{index}')),
-            'type': exercise_type,
-            'question': question_text,
-            'options': ex.get('options', []),
-            'correct': correct_answer,
-            'explanation': ex.get('explanation', ''),
-            'word_count': ex.get('word_count', {'min': 1, 'max': 3000}) if exercise_type == 'paragraph' else None
-        }
+        return compile_lesson(obj).exercises()
 
     def get_completed(self, obj):
         """Check if lesson is completed"""
@@ -546,36 +285,10 @@ class LessonListSerializer(serializers.ModelSerializer):
             return 0
 
     def get_has_video(self, obj):
-        """
-        ✅ FIXED: Check if lesson has a video
-        """
-        if not obj.video_url:
-            return False
-
-        # Check if video_url is a valid string
-        if isinstance(obj.video_url, str):
-            video_url = obj.video_url.strip()
-            if video_url and video_url != 'null' and video_url != 'undefined':
-                return True
-
-        return False
+        return obj.has_video
 
     def get_video_config(self, obj):
-        """
-        ✅ FIXED: Get comprehensive video configuration
-        """
-        if not obj.video_url:
-            return None
-
-        try:
-            return obj.get_video_config()
-        except Exception as e:
-            (f"Error getting video config for lesson {obj.id}: {e}")
-            return {
-                'url': obj.video_url,
-                'source': 'unknown',
-                'format': 'unknown'
-            }
+        return obj.get_video_config()
 
 class LessonProgressSerializer(serializers.ModelSerializer):
     """Serializer for lesson progress tracking"""
@@ -621,27 +334,14 @@ class GuestCourseSerializer(serializers.ModelSerializer):
 
     def get_total_lessons(self, obj):
         # Return the REAL total lessons count, not limited by guest access
-        return obj.lessons.filter(is_active=True).count()
+        return CourseContentStats.for_course(obj).active_lessons
 
     def get_video_count(self, obj):
         """
         ✅ NEW: Count TOTAL videos in course for guest display
         """
-        try:
-            lessons_with_videos = Lesson.objects.filter(
-                course=obj,
-                is_active=True
-            ).exclude(
-                Q(video_url__isnull=True) |
-                Q(video_url='') |
-                Q(video_url='null')
-            ).count()
-
-            (f"📊 Guest Course {obj.code}: {lessons_with_videos} total videos")
-            return lessons_with_videos
-        except Exception as e:
-            (f"Error counting videos for guest course {obj.code}: {e}")
-            return 0
+        return CourseContentStats.for_course(obj).video_lessons
+
 class GuestLessonSerializer(serializers.ModelSerializer):
     """
     ✅ FIXED: Guest lesson serializer with video support
@@ -656,17 +356,10 @@ class GuestLessonSerializer(serializers.ModelSerializer):
                  'course_title', 'video_url', 'has_video', 'video_config']
 
     def get_has_video(self, obj):
-        return bool(obj.video_url and
-                   obj.video_url.strip() and
-                   obj.video_url != 'null')
+        return obj.has_video
 
     def get_video_config(self, obj):
-        if not self.get_has_video(obj):
-            return None
-        try:
-            return obj.get_video_config()
-        except:
-            return {'url': obj.video_url}
+        return obj.get_video_config()
 
 class CertificateSerializer(serializers.ModelSerializer):
     course_title = serializers.CharField(source='course.title', read_only=True)
@@ -735,39 +428,34 @@ class CertificateSerializer(serializers.ModelSerializer):
     def get_formatted_grade(self, obj):
         return f"{obj.grade}%"
 
+    def overview_for(self, obj):
+        """Figures of the certificate's course; list views put a CertificateOverview in the context"""
+        overview = self.context.get('certificate_overview')
+        if overview is None or not overview.covers(obj.user_id, obj.course_id):
+            overview = CertificateOverview(obj.user_id, [obj.course])
+            self.context['certificate_overview'] = overview
+        return overview
+
     def get_is_valid(self, obj):
-        return obj.is_valid
+        return self.overview_for(obj).certificate_valid(obj.course_id)
 
     def get_accessible(self, obj):
-        return obj.is_valid
+        return self.get_is_valid(obj)
 
     def get_message(self, obj):
-        return 'Certificate available for download' if obj.is_valid else 'Complete the course to access this certificate'
+        return 'Certificate available for download' if self.get_is_valid(obj) else 'Complete the course to access this certificate'
 
     def get_progress(self, obj):
-        # Calculate progress for this course
-        user = self.context['request'].user
-        total_lessons = Lesson.objects.filter(course=obj.course, is_active=True).count()
-        completed_lessons = StudentExercise.objects.filter(
-            student=user,
-            lesson__course=obj.course,
-            completed=True
-        ).count()
-        return round((completed_lessons / total_lessons) * 100, 1) if total_lessons > 0 else 0
+        return self.overview_for(obj).progress(obj.course_id)
 
     def get_is_enrolled(self, obj):
-        user = self.context['request'].user
-        return Enrollment.objects.filter(
-            student=user,
-            course=obj.course,
-            status__in=['approved', 'completed']
-        ).exists()
+        return self.overview_for(obj).is_enrolled(obj.course_id)
 
     def get_is_real_certificate(self, obj):
         return True
 
     def get_total_lessons(self, obj):
-        return Lesson.objects.filter(course=obj.course, is_active=True).count()
+        return self.overview_for(obj).total_lessons(obj.course_id)
 
 class UserProfileSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
@@ -778,7 +466,33 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip()
-class ReplySerializer(serializers.ModelSerializer):
+class CommentThreadsMixin:
+    """
+    Replies and reaction figures come from the CommentThreads in the context
+    (views put one there for a whole page); a single object loads its own.
+    With `lazy_replies` in the context the nested reply list is left out and
+    clients page through it instead.
+    """
+    nested_field = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.context.get('lazy_replies'):
+            self.fields.pop(self.nested_field, None)
+
+    def threads_for(self, comment_id):
+        threads = self.context.get('comment_threads')
+        if threads is None or not threads.covers(comment_id):
+            threads = CommentThreads([comment_id], self._viewer())
+            self.context['comment_threads'] = threads
+        return threads
+
+    def _viewer(self):
+        request = self.context.get('request')
+        return request.user if request else None
+
+
+class ReplySerializer(CommentThreadsMixin, serializers.ModelSerializer):
     user = UserProfileSerializer(read_only=True)
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_data = serializers.SerializerMethodField()
@@ -787,19 +501,21 @@ class ReplySerializer(serializers.ModelSerializer):
     can_delete = serializers.SerializerMethodField()
     liked = serializers.SerializerMethodField()
     disliked = serializers.SerializerMethodField()
-    likes = serializers.SerializerMethodField()
-    dislikes = serializers.SerializerMethodField()
+    likes = serializers.IntegerField(read_only=True)
+    dislikes = serializers.IntegerField(read_only=True)
     nested_replies = serializers.SerializerMethodField()  # Add nested replies
+    nested_reply_count = serializers.SerializerMethodField()
     show_nested_replies = serializers.SerializerMethodField()
     edited = serializers.BooleanField(read_only=True)
     edited_at = serializers.DateTimeField(read_only=True)
+    nested_field = 'nested_replies'
 
     class Meta:
         model = Reply
         fields = [
             'id', 'user', 'user_name', 'user_data', 'content', 'created_at', 'date',
             'can_edit', 'can_delete', 'likes', 'dislikes', 'liked', 'disliked',
-            'nested_replies', 'show_nested_replies', 'edited', 'edited_at'  # Include nested replies
+            'nested_replies', 'nested_reply_count', 'show_nested_replies', 'edited', 'edited_at'  # Include nested replies
         ]
         read_only_fields = ['user', 'created_at', 'edited', 'edited_at']
 
@@ -855,34 +571,19 @@ class ReplySerializer(serializers.ModelSerializer):
         return False
 
     def get_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.reactions.filter(
-                user=request.user,
-                reaction_type='like'
-            ).exists()
-        return False
+        return self.threads_for(obj.comment_id).own_reply_reaction(obj.id) == 'like'
 
     def get_disliked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.reactions.filter(
-                user=request.user,
-                reaction_type='dislike'
-            ).exists()
-        return False
-
-    def get_likes(self, obj):
-        return obj.reactions.filter(reaction_type='like').count()
-
-    def get_dislikes(self, obj):
-        return obj.reactions.filter(reaction_type='dislike').count()
+        return self.threads_for(obj.comment_id).own_reply_reaction(obj.id) == 'dislike'
 
     def get_nested_replies(self, obj):
         """Get nested replies for this reply"""
-        nested_replies = obj.nested_replies.all()
+        nested_replies = self.threads_for(obj.comment_id).children(obj.id)
         return ReplySerializer(nested_replies, many=True, context=self.context).data
 
+    def get_nested_reply_count(self, obj):
+        return self.threads_for(obj.comment_id).nested_reply_count(obj.id)
+
     def format_time_ago(self, date):
         now = timezone.now()
         diff = now - date
@@ -904,12 +605,12 @@ class ReplySerializer(serializers.ModelSerializer):
         else:
             return "Just now"
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(CommentThreadsMixin, serializers.ModelSerializer):
     user = UserProfileSerializer(read_only=True)
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_data = serializers.SerializerMethodField()
     course_name = serializers.CharField(source='course.title', read_only=True)
-    replies = ReplySerializer(many=True, read_only=True)
+    replies = serializers.SerializerMethodField()
     date = serializers.SerializerMethodField()
     liked = serializers.SerializerMethodField()
     disliked = serializers.SerializerMethodField()
@@ -918,6 +619,7 @@ class CommentSerializer(serializers.ModelSerializer):
     can_delete = serializers.SerializerMethodField()
     edited = serializers.BooleanField(read_only=True)
     edited_at = serializers.DateTimeField(read_only=True)
+    nested_field = 'replies'
 
     class Meta:
         model = Comment
@@ -938,26 +640,18 @@ class CommentSerializer(serializers.ModelSerializer):
     def get_date(self, obj):
         return self.format_time_ago(obj.created_at)
 
+    def get_replies(self, obj):
+        replies = self.threads_for(obj.id).replies(obj.id)
+        return ReplySerializer(replies, many=True, context=self.context).data
+
     def get_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.reactions.filter(
-                user=request.user,
-                reaction_type='like'
-            ).exists()
-        return False
+        return self.threads_for(obj.id).own_comment_reaction(obj.id) == 'like'
 
     def get_disliked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.reactions.filter(
-                user=request.user,
-                reaction_type='dislike'
-            ).exists()
-        return False
+        return self.threads_for(obj.id).own_comment_reaction(obj.id) == 'dislike'
 
     def get_reply_count(self, obj):
-        return obj.replies.count()
+        return self.threads_for(obj.id).reply_count(obj.id)
 
     def get_can_edit(self, obj):
         request = self.context.get('request')
@@ -0,0 +1,168 @@
+# student_dashboard/suggestions.py
+import heapq
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import accumulate, chain, islice
+
+from django.core.cache import cache
+
+from .search import TOKEN_RE, tokenize
+
+
+CACHE_VERSION_KEY = 'search_suggestions:version'
+CACHE_ENTRIES_KEY = 'search_suggestions:entries:{version}'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+LIMITS = {'course': 5, 'lesson': 5, 'category': 3}
+
+# Upper bound on postings inspected per type and keystroke; suggestions are best effort
+MAX_SCAN = 5000
+
+# Per-process copy of the index, rebuilt whenever the shared version changes
+_local = {'version': None, 'index': None}
+
+
+class _TypeIndex:
+    """Prefix index over the suggestions of one type, kept in title order"""
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda entry: entry['title'].lower())
+        self.titles = [entry['title'].lower() for entry in self.entries]
+        self.entry_terms = [frozenset(tokenize(title)) for title in self.titles]
+
+        postings = defaultdict(list)
+        for position, terms in enumerate(self.entry_terms):
+            for term in terms:
+                postings[term].append(position)
+        self.terms = sorted(postings)
+        self.postings = [postings[term] for term in self.terms]
+        # Running posting counts, so the size of any prefix range is known in O(1)
+        self.cumulative = [0, *accumulate(len(positions) for positions in self.postings)]
+
+    def _range(self, prefix):
+        start = bisect_left(self.terms, prefix)
+        return start, bisect_left(self.terms, prefix + '\uffff', start)
+
+    def _matches_all(self, position, words):
+        terms = self.entry_terms[position]
+        return all(any(term.startswith(word) for term in terms) for word in words)
+
+    def lookup(self, query, words, limit):
+        # Titles that start with the query come first; they are a contiguous slice
+        taken = []
+        start = bisect_left(self.titles, query)
+        for position in range(start, len(self.titles)):
+            if len(taken) == limit or not self.titles[position].startswith(query):
+                break
+            taken.append(position)
+
+        if len(taken) < limit:
+            # Walk the rarest word's postings in title order and stop once the limit is reached
+            ranges = [self._range(word) for word in words]
+            rarest = min(range(len(words)),
+                         key=lambda i: self.cumulative[ranges[i][1]] - self.cumulative[ranges[i][0]])
+            others = words[:rarest] + words[rarest + 1:]
+            seen = set(taken)
+            first, last = ranges[rarest]
+            if self.cumulative[last] - self.cumulative[first] <= MAX_SCAN:
+                candidates = sorted(chain.from_iterable(self.postings[first:last]))
+            else:
+                # Very common prefixes: merge lazily and give up after MAX_SCAN postings
+                candidates = islice(heapq.merge(*self.postings[first:last]), MAX_SCAN)
+            for position in candidates:
+                if position in seen:
+                    continue
+                seen.add(position)
+                if self._matches_all(position, others):
+                    taken.append(position)
+                    if len(taken) == limit:
+                        break
+
+        return [dict(self.entries[position]) for position in taken]
+
+
+class PrefixIndex:
+    """
+    Autocomplete index: every word of the query must be a prefix of some word
+    in the suggestion's title. Lookups cost a few bisects plus at most one
+    merged posting walk per type, independent of how many entries match.
+    """
+
+    def __init__(self, entries, limits=LIMITS):
+        self.limits = limits
+        self.by_type = {
+            doc_type: _TypeIndex([entry for entry in entries if entry['type'] == doc_type])
+            for doc_type in limits
+        }
+
+    def lookup(self, query):
+        query = query.lower()
+        # Unlike tokenize(), keep one-letter words: "personal b" is a user still typing
+        words = TOKEN_RE.findall(query)
+        if not words:
+            return []
+
+        suggestions = []
+        for doc_type, limit in self.limits.items():
+            suggestions.extend(self.by_type[doc_type].lookup(query, words, limit))
+        return suggestions
+
+
+def build_entries():
+    """Suggestion payloads for every active course, lesson and category (two queries)"""
+    from accounts.models import Course
+    from admin_dashboard.models import Lesson
+
+    entries = []
+    for title, code in Course.objects.filter(is_active=True).values_list('title', 'code'):
+        entries.append({'type': 'course', 'title': title, 'code': code, 'display': title})
+
+    lessons = Lesson.objects.filter(is_active=True).values_list('title', 'course__title')
+    for title, course_title in lessons:
+        entries.append({
+            'type': 'lesson',
+            'title': title,
+            'course_title': course_title,
+            'display': f"{title} - {course_title}"
+        })
+
+    for category, _ in Course.CATEGORY_CHOICES:
+        entries.append({'type': 'category', 'title': category, 'display': f"Category: {category}"})
+
+    return entries
+
+
+def get_index():
+    """
+    Return the prefix index for the current shared version. The entries are
+    built once per version and shared through the Django cache, so only the
+    first worker after an invalidation touches the database.
+    """
+    version = cache.get(CACHE_VERSION_KEY)
+    if version is None:
+        version = str(time.time_ns())
+        cache.add(CACHE_VERSION_KEY, version, None)
+        version = cache.get(CACHE_VERSION_KEY, version)
+
+    if _local['version'] == version and _local['index'] is not None:
+        return _local['index']
+
+    entries_key = CACHE_ENTRIES_KEY.format(version=version)
+    entries = cache.get(entries_key)
+    if entries is None:
+        entries = build_entries()
+        cache.set(entries_key, entries, CACHE_TIMEOUT)
+
+    index = PrefixIndex(entries)
+    _local['version'], _local['index'] = version, index
+    return index
+
+
+def suggest(query):
+    return get_index().lookup(query)
+
+
+def invalidate_suggestions():
+    """Called when a course or lesson changes; every worker rebuilds on its next lookup"""
+    cache.set(CACHE_VERSION_KEY, str(time.time_ns()), None)
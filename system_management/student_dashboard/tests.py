@@ -1,3 +1,833 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import CustomUser, Course
+from admin_dashboard.models import Lesson, Enrollment, LessonProgress
+from .models import StudentExercise, CourseProgress
+
+
+class StudentCourseListViewTests(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(
+            email='student@example.com', password='pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('student-courses')
+
+    def make_course(self, title, code):
+        course = Course.objects.create(title=title, code=code, description='')
+        Lesson.objects.create(course=course, title='Video', order=1,
+                              video_url='https://www.youtube.com/embed/abc',
+                              exercise={'paragraph': 'Explain.'})
+        Lesson.objects.create(course=course, title='Reading', order=2,
+                              video_url='null', exercise={})
+        Lesson.objects.create(course=course, title='Hidden', order=3,
+                              is_active=False, video_url='videos/x.mp4',
+                              exercise={'paragraph': 'Hidden.'})
+        return course
+
+    def test_payload_counts_and_progress(self):
+        enrolled = self.make_course('Budgeting', 'FIN0001')
+        self.make_course('Algebra', 'EDU0001')
+        Enrollment.objects.create(student=self.student, course=enrolled, status='approved')
+        StudentExercise.objects.create(
+            student=self.student, lesson=enrolled.lessons.get(order=1), completed=True
+        )
+        CourseProgress.rebuild(self.student.id, enrolled.id)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        first, second = response.data['courses']
+        self.assertEqual(first['code'], 'FIN0001')
+        self.assertTrue(first['is_enrolled'])
+        self.assertEqual(first['total_lessons'], 2)
+        self.assertEqual(first['video_count'], 1)
+        self.assertEqual(first['total_exercises'], 1)
+        self.assertEqual(first['completed_lessons'], 1)
+        self.assertEqual(first['progress'], 50.0)
+        self.assertEqual(second['enrollment_status'], 'not_enrolled')
+        self.assertEqual(second['completed_lessons'], 0)
+        self.assertEqual(second['progress'], 0)
+        self.assertEqual(response.data['statistics'], {
+            'total_courses': 2,
+            'total_enrollments': 1,
+            'enrolled_courses': 1,
+            'completed_courses': 0,
+            'active_courses': 1,
+        })
+
+    def test_query_count_does_not_grow_with_courses(self):
+        for i in range(2):
+            self.make_course(f'Course {i}', f'CRS{i:04d}')
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+
+        for i in range(2, 12):
+            course = self.make_course(f'Course {i}', f'CRS{i:04d}')
+            Enrollment.objects.create(student=self.student, course=course, status='approved')
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data['courses']), 12)
+
+
+class CourseProgressTests(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(
+            email='student@example.com', password='pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.course = Course.objects.create(title='Geography', code='EDU0002', description='')
+        self.lesson = Lesson.objects.create(course=self.course, title='Capitals', order=1,
+                                            exercise={'fill_blank': {'question': 'Capital of France?',
+                                                                     'answer': 'Paris'}})
+        Lesson.objects.create(course=self.course, title='Rivers', order=2)
+        self.enrollment = Enrollment.objects.create(student=self.student, course=self.course,
+                                                    status='approved')
+
+    def submit(self, answer):
+        url = reverse('submit-exercise-answer', args=[self.lesson.id, 'question_1'])
+        return self.client.post(url, {'answer': answer}, format='json')
+
+    def test_submission_updates_stored_progress(self):
+        self.submit('London')
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual((progress.completed_lessons, progress.score_total), (0, 0.0))
+
+        self.submit(' paris ')
+        progress.refresh_from_db()
+        self.assertEqual((progress.completed_lessons, progress.total_lessons), (1, 2))
+        self.assertEqual(progress.score_total, 1.0)
+        self.assertIsNotNone(progress.last_activity_at)
+        self.assertEqual(self.enrollment.progress, 50.0)
+
+        # Answering again does not count the lesson twice
+        self.submit('Paris')
+        progress.refresh_from_db()
+        self.assertEqual((progress.completed_lessons, progress.score_total), (1, 1.0))
+
+    def test_lesson_changes_update_total(self):
+        CourseProgress.rebuild(self.student.id, self.course.id)
+        Lesson.objects.create(course=self.course, title='Mountains', order=3)
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual(progress.total_lessons, 3)
+
+    def test_deleting_a_completed_lesson_discounts_it(self):
+        third = Lesson.objects.create(course=self.course, title='Mountains', order=3)
+        for lesson in (self.lesson, third):
+            StudentExercise.objects.create(student=self.student, lesson=lesson, completed=True, score=1.0)
+        CourseProgress.rebuild(self.student.id, self.course.id)
+
+        third.delete()
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        self.assertEqual((progress.completed_lessons, progress.total_lessons, progress.score_total), (1, 2, 1.0))
+
+    def test_deleting_a_lesson_costs_the_same_for_any_number_of_students(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def delete_lesson_taken_by(count):
+            lesson = Lesson.objects.create(course=self.course, title=f'Taken by {count}', order=3)
+            for n in range(count):
+                student = CustomUser.objects.create_user(email=f'taker{count}-{n}@example.com', password='pass1234')
+                StudentExercise.objects.create(student=student, lesson=lesson, completed=True, score=1.0)
+                CourseProgress.rebuild(student.id, self.course.id)
+            with CaptureQueriesContext(connection) as queries:
+                lesson.delete()
+            return len(queries)
+
+        self.assertEqual(delete_lesson_taken_by(1), delete_lesson_taken_by(8))
+        progress = CourseProgress.objects.filter(course=self.course).values_list(
+            'completed_lessons', 'score_total', 'total_lessons').distinct()
+        self.assertEqual(list(progress), [(0, 0.0, 2)])
+
+    def test_reading_progress_does_not_store_it(self):
+        progress = CourseProgress.for_student(self.student.id, self.course.id)
+        self.assertEqual((progress.completed_lessons, progress.total_lessons), (0, 2))
+        self.assertFalse(CourseProgress.objects.filter(student=self.student).exists())
+
+    def test_bulk_submission_grades_every_answer_in_one_update(self):
+        self.lesson.exercise = {'questions': [
+            {'id': 'q1', 'type': 'fill-blank', 'question': 'Capital of France?', 'answer': 'Paris'},
+            {'id': 'q2', 'type': 'fill-blank', 'question': 'Capital of Italy?', 'answer': 'Rome'},
+        ]}
+        self.lesson.save()
+        url = reverse('submit-exercise-answers', args=[self.lesson.id])
+
+        response = self.client.post(url, {'answers': {'q1': 'paris', 'q2': 'Milan', 'q9': 'x'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['question_id'], r.get('is_correct')) for r in response.data['results']],
+                         [('q1', True), ('q2', False), ('q9', None)])
+        self.assertEqual(response.data['results'][1]['correct_answer'], 'Rome')
+        self.assertEqual((response.data['score'], response.data['lesson_completed']), (1.0, False))
+
+        response = self.client.post(url, {'answers': [{'question_id': 'q2', 'answer': 'rome'}]}, format='json')
+        self.assertTrue(response.data['lesson_completed'])
+        exercise = StudentExercise.objects.get(student=self.student, lesson=self.lesson)
+        self.assertEqual((exercise.score, sorted(exercise.submission_data)), (2.0, ['q1', 'q2']))
+
+        response = self.client.post(url, {'answers': {'q9': 'x'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_submission_reports_malformed_answers_per_question(self):
+        self.lesson.exercise = {'questions': [
+            {'id': 'q1', 'type': 'multiple-choice', 'question': 'Pick one', 'options': ['a', 'b'], 'correct': 1},
+            {'id': 'q2', 'type': 'fill-blank', 'question': 'Capital of France?', 'answer': 'Paris'},
+        ]}
+        self.lesson.save()
+        url = reverse('submit-exercise-answers', args=[self.lesson.id])
+
+        response = self.client.post(url, {'answers': {'q1': 'b', 'q2': 'paris'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0],
+                         {'question_id': 'q1', 'detail': 'Invalid answer format for this question.'})
+        self.assertTrue(response.data['results'][1]['is_correct'])
+        exercise = StudentExercise.objects.get(student=self.student, lesson=self.lesson)
+        self.assertEqual(sorted(exercise.submission_data), ['q2'])
+
+
+class GradingTests(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(email='student@example.com', password='pass1234')
+        self.course = Course.objects.create(title='Geography', code='EDU0002', description='')
+        self.lesson = Lesson.objects.create(course=self.course, title='Capitals', order=1, exercise={'questions': [
+            {'id': 'q1', 'type': 'fill-blank', 'question': 'Capital of France?', 'answer': 'Paris'},
+            {'id': 'q2', 'type': 'fill-blank', 'question': 'Capital of Italy?', 'answer': 'Rome'},
+            {'id': 'q3', 'type': 'fill-blank', 'question': 'Capital of Spain?'},
+        ]})
+        Enrollment.objects.create(student=self.student, course=self.course, status='approved')
+
+    def progress(self):
+        progress = CourseProgress.objects.get(student=self.student, course=self.course)
+        return progress.completed_lessons, progress.score_total
+
+    def test_write_lock_is_taken_before_anything_is_read(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .grading import submit_answer
+
+        with CaptureQueriesContext(connection) as queries:
+            submit_answer(self.student, self.lesson, 'q1', 'Paris')
+        statements = [q['sql'] for q in queries.captured_queries if not q['sql'].startswith('SAVEPOINT')]
+        self.assertTrue(statements[0].startswith('UPDATE') and statements[0].endswith('WHERE 0'))
+
+    def test_progress_follows_score_changes(self):
+        from .grading import submit_answer, submit_answers
+
+        submit_answers(self.student, self.lesson, {'q1': 'paris', 'q2': 'rome'})
+        self.assertEqual(self.progress(), (0, 2.0))
+
+        # A correct answer changed to a wrong one takes its point back
+        response = submit_answer(self.student, self.lesson, 'q2', 'Milan')
+        self.assertEqual((response['score'], response['completed_questions']), (1.0, 1))
+        self.assertEqual(self.progress(), (0, 1.0))
+
+        # Answering the same question correctly twice scores once
+        submit_answer(self.student, self.lesson, 'q2', 'Rome')
+        submit_answer(self.student, self.lesson, 'q2', 'Rome')
+        self.assertEqual(self.progress(), (0, 2.0))
+
+    def test_rejected_submissions_write_nothing(self):
+        from .grading import GradingError, submit_answer
+
+        outsider = CustomUser.objects.create_user(email='outsider@example.com', password='pass1234')
+        cases = [
+            (outsider, 'q1', 'Paris', 403),
+            (self.student, 'q9', 'Paris', 404),
+            (self.student, 'q1', None, 400),
+            (self.student, 'q3', 'Madrid', 400),  # no answer configured
+        ]
+        for user, question_id, answer, status_code in cases:
+            with self.subTest(question_id=question_id, status_code=status_code):
+                with self.assertRaises(GradingError) as raised:
+                    submit_answer(user, self.lesson, question_id, answer)
+                self.assertEqual(raised.exception.status_code, status_code)
+
+        self.assertFalse(StudentExercise.objects.exists())
+        self.assertFalse(CourseProgress.objects.exists())
+
+
+class VideoProgressBufferTests(TestCase):
+    def setUp(self):
+        from .video_progress import buffer
+        self.buffer = buffer
+        self.buffer.clear()
+        self.addCleanup(self.buffer.clear)
+
+        self.student = CustomUser.objects.create_user(
+            email='student@example.com', password='pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        self.lesson = Lesson.objects.create(course=self.course, title='Intro', order=1)
+        Enrollment.objects.create(student=self.student, course=self.course, status='approved')
+        self.url = reverse('update-video-progress', args=[self.lesson.id])
+
+    def beat(self, seconds, watched, engagement=8):
+        return self.client.post(self.url, {'video_progress': seconds, 'video_duration': 100,
+                                           'watched_percentage': watched,
+                                           'engagement_score': engagement}, format='json')
+
+    def test_heartbeats_are_coalesced_until_flush(self):
+        self.beat(10, 10)
+        with self.assertNumQueries(0):
+            self.beat(30, 30)
+            response = self.beat(20, 25, engagement=3)
+        self.assertEqual((response.data['video_progress'], response.data['watched_percentage']), (30, 30))
+        self.assertFalse(LessonProgress.objects.exists())
+
+        self.assertEqual(self.buffer.flush(), 1)
+        progress = LessonProgress.objects.get(student=self.student, lesson=self.lesson)
+        self.assertEqual((progress.video_progress, progress.engagement_data['engagement_score']), (30, 8))
+
+    def test_completion_is_written_immediately(self):
+        self.beat(50, 50)
+        response = self.beat(99, 90)
+        self.assertTrue(response.data['video_completed'])
+        progress = LessonProgress.objects.get(student=self.student, lesson=self.lesson)
+        self.assertTrue(progress.video_completed)
+        self.assertIsNotNone(progress.completed_at)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_not_enrolled(self):
+        Enrollment.objects.all().delete()
+        self.assertEqual(self.beat(10, 10).status_code, 403)
+
+    def test_failed_flush_keeps_the_heartbeats(self):
+        from django.db import DatabaseError, connection
+
+        LessonProgress.objects.create(student=self.student, lesson=self.lesson, video_progress=5)
+        self.beat(30, 30)
+
+        def fail_updates(execute, sql, params, many, context):
+            if sql.startswith('UPDATE'):
+                raise DatabaseError('disk I/O error')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(fail_updates), self.assertRaises(DatabaseError):
+            self.buffer.flush()
+        # A later, smaller heartbeat merges with the entry put back
+        self.beat(20, 35)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        progress = LessonProgress.objects.get(student=self.student, lesson=self.lesson)
+        self.assertEqual((progress.video_progress, progress.engagement_data['watched_percentage']), (30, 35))
+
+    def test_row_inserted_by_another_worker_is_merged(self):
+        from django.db import connection
+
+        self.beat(30, 30)
+        inserted = []
+
+        def insert_first(execute, sql, params, many, context):
+            # Another worker creates the row between the read and the bulk insert
+            if sql.startswith('INSERT') and 'lessonprogress' in sql and not inserted:
+                inserted.append(True)
+                LessonProgress.objects.create(student=self.student, lesson=self.lesson, video_progress=60,
+                                              engagement_data={'watched_percentage': 10})
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(insert_first):
+            self.buffer.flush()
+
+        progress = LessonProgress.objects.get(student=self.student, lesson=self.lesson)
+        self.assertEqual((progress.video_progress, progress.engagement_data['watched_percentage']), (60, 30))
+
+    def test_idle_buffer_is_flushed_by_the_timer(self):
+        import threading
+        from .video_progress import ProgressBuffer
+
+        idle = ProgressBuffer(flush_interval=0.2)
+        flushed = threading.Event()
+        idle.flush = lambda: (idle.dirty.clear(), flushed.set())
+        idle.dirty.add((self.student.id, self.lesson.id))
+        idle._start_timer()
+        # No further heartbeat arrives, yet the pending one is written
+        self.assertTrue(flushed.wait(2))
+
+
+class VideoStreamingTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self.video_root = tempfile.mkdtemp()
+        self.data = bytes(range(256)) * 4
+        with open(f'{self.video_root}/clip.mp4', 'wb') as f:
+            f.write(self.data)
+        settings = self.settings(VIDEO_ROOT=self.video_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.url = '/media/videos/clip.mp4'
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_single_and_multi_range(self):
+        response, body = self.get(Range='bytes=100-199')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 100-199/1024'))
+        self.assertEqual(body, self.data[100:200])
+
+        response, body = self.get(Range='bytes=-24')
+        self.assertEqual(body, self.data[-24:])
+
+        response, body = self.get(Range='bytes=0-9, 20-29')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertIn(b'Content-Range: bytes 20-29/1024\r\n\r\n' + self.data[20:30], body)
+
+        response, _ = self.get(Range='bytes=5000-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+
+    def test_conditional_requests(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.data))
+        etag = response['ETag']
+
+        response, _ = self.get(If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response, body = self.get(Range='bytes=0-9', If_Range='"stale"')
+        self.assertEqual((response.status_code, len(body)), (200, 1024))
+        response, body = self.get(Range='bytes=0-9', If_Range=etag)
+        self.assertEqual((response.status_code, body), (206, self.data[:10]))
+
+    def test_hls_output_is_cached_for_good(self):
+        import os
+        from .serializers import LessonDetailSerializer
+
+        os.makedirs(f'{self.video_root}/course_1/lesson_1/hls/v1')
+        with open(f'{self.video_root}/course_1/lesson_1/hls/v1/master.m3u8', 'w') as f:
+            f.write('#EXTM3U\n')
+        response = self.client.get('/media/videos/course_1/lesson_1/hls/v1/master.m3u8')
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.get()[0]['Cache-Control'], 'public, max-age=3600')
+
+        course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        lesson = Lesson.objects.create(course=course, title='Intro', order=1,
+                                       video_url='videos/course_1/lesson_1/intro.mp4')
+        lesson.hls_playlist = 'videos/course_1/lesson_1/hls/v1/master.m3u8'
+        lesson.save()
+        config = LessonDetailSerializer().get_video_config(lesson)
+        self.assertEqual(config['hls_url'], 'http://localhost:8000/media/videos/course_1/lesson_1/hls/v1/master.m3u8')
+        self.assertTrue(config['streaming_url'].endswith('intro.mp4'))
+
+        # A new file drops the packaged output of the old one
+        lesson.video_url = 'videos/course_1/lesson_1/other.mp4'
+        lesson.save()
+        self.assertEqual(lesson.hls_playlist, '')
+
+    def test_paths_outside_video_root(self):
+        self.assertEqual(self.client.get('/media/videos/../settings.py').status_code, 404)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(
+            email='student@example.com', password='pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+        self.budgeting = Course.objects.create(title='Personal Budgeting', code='FIN0001',
+                                               description='Plan a monthly budget.')
+        self.private = Course.objects.create(title='Budget Forecasting', code='FIN0002',
+                                             description='Internal only.', is_public=False)
+        self.lesson = Lesson.objects.create(course=self.budgeting, title='Tracking expenses', order=1,
+                                            content='<p>Write down every budget item.</p>',
+                                            exercise={'questions': [{'question': 'What is a sinking fund?'}]})
+        Lesson.objects.create(course=self.private, title='Hidden lesson', order=1, is_active=False,
+                              content='budget')
+        Enrollment.objects.create(student=self.student, course=self.budgeting, status='approved')
+
+    def test_ranked_prefix_search_with_enrollment(self):
+        response = self.client.get(reverse('search-content'), {'q': 'budg'})
+
+        results = [(row['type'], row['id']) for row in response.data['results']]
+        self.assertEqual(results, [
+            ('course', self.budgeting.id),
+            ('course', self.private.id),
+            ('lesson', self.lesson.id),
+        ])
+        self.assertEqual(response.data['results'][0]['enrollment_status'], 'approved')
+        self.assertEqual(response.data['results'][2]['enrollment_status'], 'approved')
+
+        response = self.client.get(reverse('search-content'), {'q': 'sinking fund'})
+        self.assertEqual([row['id'] for row in response.data['results']], [f'exercise_{self.lesson.id}'])
+
+    def test_index_follows_edits_and_visibility(self):
+        self.lesson.title = 'Envelope method'
+        self.lesson.save()
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get(reverse('search-public-content'), {'q': 'envelope'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.lesson.id])
+
+        response = self.client.get(reverse('search-public-content'), {'q': 'forecasting'})
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.get(reverse('search-suggestions'), {'q': 'envel'})
+        self.assertEqual(response.data['suggestions'][0]['display'], 'Envelope method - Personal Budgeting')
+
+    def test_query_count_is_constant(self):
+        for i in range(10):
+            Lesson.objects.create(course=self.budgeting, title=f'Budget part {i}', order=i + 2)
+        # Vocabulary, capped postings, stored corpus totals, then the page's own three
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('search-content'), {'q': 'budget'})
+        self.assertEqual(len(response.data['results']), 13)
+
+    def test_index_keeps_corpus_statistics(self):
+        from django.db.models import Count, Sum
+        from .models import SearchDocument, SearchPosting, SearchStats, SearchTerm
+
+        def assert_in_step():
+            totals = SearchDocument.objects.aggregate(count=Count('id'), length=Sum('length'))
+            stats = SearchStats.current()
+            self.assertEqual((stats.documents, stats.total_length), (totals['count'], totals['length'] or 0))
+            self.assertEqual(
+                dict(SearchTerm.objects.values_list('term', 'documents')),
+                dict(SearchPosting.objects.values('term').annotate(count=Count('id'))
+                     .values_list('term', 'count').order_by())
+            )
+
+        assert_in_step()
+        self.lesson.content = 'Envelope budgeting'
+        self.lesson.exercise = {}
+        self.lesson.save()
+        assert_in_step()
+        self.lesson.delete()
+        assert_in_step()
+        self.private.delete()
+        assert_in_step()
+        self.assertFalse(SearchTerm.objects.filter(term='forecasting').exists())
+
+    def test_prefix_expansion_and_postings_are_capped(self):
+        from . import search as search_module
+
+        words = ' '.join(f'budg{chr(ord("a") + i)}' for i in range(search_module.MAX_TERM_EXPANSIONS + 5))
+        Lesson.objects.create(course=self.budgeting, title='Budg', order=2, content=words)
+        expanded = [term for term, _ in search_module.expand_term('budg')]
+        self.assertEqual(len(expanded), search_module.MAX_TERM_EXPANSIONS)
+        self.assertEqual(expanded[:2], ['budg', 'budget'])  # exact term, then the commonest
+
+        for i in range(4):
+            Lesson.objects.create(course=self.budgeting, title=f'Budget part {i}', order=i + 3)
+        self.addCleanup(setattr, search_module, 'MAX_POSTINGS_PER_TERM', search_module.MAX_POSTINGS_PER_TERM)
+        search_module.MAX_POSTINGS_PER_TERM = 2
+        hits = search_module.search('budget', doc_types=['lesson'])
+        self.assertEqual(len(hits), 2)
+
+    def test_suggestions_are_served_from_prefix_index(self):
+        url = reverse('search-suggestions')
+        self.client.get(url, {'q': 'tr'})  # builds the index
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'q': 'personal b'})
+        self.assertEqual([s['display'] for s in response.data['suggestions']], ['Personal Budgeting'])
+
+        Lesson.objects.create(course=self.budgeting, title='Personal balance sheet', order=2)
+        response = self.client.get(url, {'q': 'personal b'})
+        self.assertEqual([s['display'] for s in response.data['suggestions']], [
+            'Personal Budgeting',
+            'Personal balance sheet - Personal Budgeting',
+        ])
+
+        response = self.client.get(url, {'q': 'develop'})
+        self.assertEqual(response.data['suggestions'][0]['display'], 'Category: Personal Development')
+
+
+class LessonSlugTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        self.hidden = Lesson.objects.create(course=self.course, title='Intro!', order=1, is_active=False)
+        self.intro = Lesson.objects.create(course=self.course, title='Intro', order=2)
+        self.lesson = Lesson.objects.create(course=self.course, title='Needs & Wants', order=3)
+
+    def test_slugs_are_unique_per_course_and_follow_title(self):
+        self.assertEqual((self.hidden.slug, self.intro.slug, self.lesson.slug),
+                         ('intro', 'intro-2', 'needs-wants'))
+
+        self.lesson.title = 'Needs vs Wants'
+        self.lesson.save()
+        self.assertEqual(self.lesson.slug, 'needs-vs-wants')
+
+    def test_rename_drops_a_numeric_slug_from_the_old_title(self):
+        lesson = Lesson.objects.create(course=self.course, title='Budget 2022', order=4)
+        self.assertEqual(lesson.slug, 'budget-2022')
+
+        lesson.title = 'Budget'
+        lesson.save()
+        self.assertEqual(lesson.slug, 'budget')
+
+        # Renaming to a title whose slug is taken still gets a dedup suffix
+        self.intro.title = 'Intro?'
+        self.intro.save()
+        self.assertEqual(self.intro.slug, 'intro-2')
+
+    def test_resolution(self):
+        from .views import get_lesson_by_slug
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_lesson_by_slug(self.course, 'needs-wants'), self.lesson)
+        self.assertEqual(get_lesson_by_slug(self.course, 'Needs-Wants!'), self.lesson)
+        # The frontend builds "intro" from the title; the active lesson holds intro-2
+        self.assertEqual(get_lesson_by_slug(self.course, 'intro'), self.intro)
+        self.assertEqual(get_lesson_by_slug(self.course, str(self.lesson.id)), self.lesson)
+        self.assertIsNone(get_lesson_by_slug(self.course, 'missing'))
+
+    def test_suffix_fallback_only_matches_the_same_title(self):
+        from .views import get_lesson_by_slug
+
+        # The only "intro" lesson is inactive; "Intro 2" is a different lesson
+        self.intro.delete()
+        intro_two = Lesson.objects.create(course=self.course, title='Intro 2', order=4)
+        self.assertEqual(intro_two.slug, 'intro-2')
+
+        self.assertIsNone(get_lesson_by_slug(self.course, 'intro'))
+        self.assertEqual(get_lesson_by_slug(self.course, 'intro-2'), intro_two)
+
+
+class ExerciseCompilerTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+
+    def test_per_type_shape_and_cache(self):
+        from .exercises import compile_lesson, grade
+
+        lesson = Lesson.objects.create(course=self.course, title='Intro', order=1, exercise={
+            'multiple_choice': {'question': 'Pick one', 'options': ['a', 'b'], 'correct_answer': 1},
+            'fill_blank': {'text': 'Money __', 'answers': ['  Matters  ']},
+        })
+        compiled = compile_lesson(lesson)
+        self.assertIs(compile_lesson(Lesson.objects.get(pk=lesson.pk)), compiled)
+        self.assertEqual(compiled.question_ids, ('question_1', 'question_2'))
+        self.assertTrue(grade(compiled.question('question_1'), '1'))
+        self.assertTrue(grade(compiled.question('question_2'), ' MATTERS'))
+        self.assertEqual([e['type'] for e in compiled.guest_exercises()], ['fill-blank', 'multiple-choice'])
+
+        lesson.exercise = {'paragraph': {'prompt': 'Explain.'}}
+        lesson.save()
+        recompiled = compile_lesson(lesson)
+        self.assertIsNot(recompiled, compiled)
+        self.assertEqual(recompiled.exercises()[0]['question'], 'Explain.')
+
+    def test_question_list_with_follow_up(self):
+        from .exercises import compile_lesson
+
+        lesson = Lesson.objects.create(course=self.course, title='Quiz', order=1, exercise={'questions': [
+            {'id': 'q1', 'type': 'multiple-choice', 'question': 'Best habit?', 'options': ['Save', 'Spend'],
+             'correct': 0},
+            {'type': 'fill-blank', 'question': 'No answer key'},
+        ]})
+        compiled = compile_lesson(lesson)
+        self.assertEqual(compiled.question_ids, ('q1', 'question_2'))
+        self.assertFalse(compiled.question('question_2').has_answer)
+        self.assertEqual(compiled.followup('q1').correct_answer, 'Save')
+        self.assertIsNone(compiled.followup('question_2'))
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.viewer = CustomUser.objects.create_user(email='viewer@example.com', password='pass1234')
+        self.course = Course.objects.create(title='Budgeting', code='FIN0001', description='')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.viewer)
+
+    def add_thread(self, replies):
+        from .models import Comment, Reply
+        from .reactions import toggle_reaction
+
+        comment = Comment.objects.create(user=self.viewer, course=self.course, content='Question')
+        toggle_reaction(comment, self.viewer, 'like')
+        parent = None
+        for i in range(replies):
+            # Every other reply answers the previous one
+            parent = Reply.objects.create(user=self.viewer, comment=comment, content=f'Reply {i}',
+                                          parent_reply=parent if i % 2 else None)
+            toggle_reaction(parent, self.viewer, 'dislike')
+        return comment
+
+    def fetch(self, url=None, params=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url or reverse('comment-list'), params or {'course_id': self.course.id})
+        return response.json(), len(queries)
+
+    def test_thread_queries_do_not_grow_with_the_thread(self):
+        self.add_thread(2)
+        _, small = self.fetch()
+        for _ in range(3):
+            self.add_thread(6)
+        page, large = self.fetch()
+        self.assertEqual(small, large)
+
+        # The feed carries counts only; replies load from their own endpoint
+        comment = page['results'][-1]
+        self.assertEqual((comment['liked'], comment['reply_count']), (True, 2))
+        self.assertNotIn('replies', comment)
+
+        replies_url = reverse('comment-replies', args=[comment['id']])
+        replies, _ = self.fetch(replies_url, {})
+        first = replies['results'][0]
+        self.assertEqual([reply['content'] for reply in replies['results']], ['Reply 0'])
+        self.assertEqual((first['dislikes'], first['disliked'], first['liked']), (1, True, False))
+        self.assertEqual(first['nested_reply_count'], 1)
+        self.assertNotIn('nested_replies', first)
+
+        nested, _ = self.fetch(replies_url, {'parent': first['id']})
+        self.assertEqual([reply['content'] for reply in nested['results']], ['Reply 1'])
+
+    def test_reaction_counters_apply_deltas_to_the_stored_row(self):
+        from .models import Comment, Reply
+        from .reactions import toggle_reaction
+
+        other = CustomUser.objects.create_user(email='other@example.com', password='pass1234')
+        comment = self.add_thread(1)
+        reply = Reply.objects.get(comment=comment)
+        stale = Comment.objects.get(pk=comment.pk)
+
+        # Another user's like lands between reading the comment and reacting to it
+        self.client.force_authenticate(user=other)
+        self.client.post(reverse('comment-react', args=[comment.id]), {'reaction_type': 'like'})
+        self.client.post(reverse('reply-react', args=[reply.id]), {'reaction_type': 'like'})
+        self.client.force_authenticate(user=self.viewer)
+        self.assertEqual(toggle_reaction(stale, self.viewer, 'dislike'), 'changed')
+        self.assertEqual((stale.likes, stale.dislikes), (1, 1))
+
+        response = self.client.post(reverse('reply-react', args=[reply.id]), {'reaction_type': 'dislike'})
+        self.assertEqual(response.json()['detail'], 'Removed dislike from reply')
+        self.assertEqual((response.json()['likes'], response.json()['dislikes']), (1, 0))
+
+    def test_feed_pages_follow_the_cursor(self):
+        for _ in range(3):
+            self.add_thread(0)
+        first, _ = self.fetch(params={'course_id': self.course.id, 'page_size': 2})
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+        seen = [comment['id'] for comment in first['results'] + second['results']]
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+
+class CertificateOverviewTests(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user(email='student@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+
+    def add_course(self, index):
+        from .models import Certificate
+
+        course = Course.objects.create(title=f'Course {index}', code=f'CRT{index:04d}', description='')
+        lessons = [Lesson.objects.create(course=course, title=f'Lesson {order}', order=order)
+                   for order in (1, 2)]
+        Enrollment.objects.create(student=self.student, course=course,
+                                  status='completed' if index % 2 else 'approved')
+        StudentExercise.objects.create(student=self.student, lesson=lessons[0], completed=True)
+        if index % 2:
+            StudentExercise.objects.create(student=self.student, lesson=lessons[1], completed=True)
+            Certificate.objects.create(user=self.student, course=course, lesson=lessons[1], grade=90)
+        return course
+
+    def fetch(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('student-certificates-list'))
+        return response.json()['certificates'], len(queries)
+
+    def test_query_count_does_not_grow_with_courses(self):
+        for index in range(2):
+            self.add_course(index)
+        _, small = self.fetch()
+        for index in range(2, 8):
+            self.add_course(index)
+        entries, large = self.fetch()
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 6)
+        by_code = {entry['course_code']: entry for entry in entries}
+        self.assertEqual(len(by_code), 8)
+        earned, studying = by_code['CRT0001'], by_code['CRT0002']
+        self.assertEqual((earned['is_real_certificate'], earned['is_valid'], earned['progress']), (True, True, 100.0))
+        self.assertEqual((studying['is_real_certificate'], studying['progress'], studying['total_lessons']),
+                         (False, 50.0, 2))
+        self.assertTrue(studying['is_enrolled'])
+
+    def test_serializer_reads_the_shared_overview(self):
+        from .certificates import CertificateOverview
+        from .models import Certificate
+        from .serializers import CertificateSerializer
+
+        courses = [self.add_course(index) for index in (1, 3, 5)]
+        overview = CertificateOverview(self.student.id, courses)
+        certificates = list(Certificate.objects.select_related('course__teacher__user').order_by('id'))
+        with self.assertNumQueries(0):
+            data = CertificateSerializer(certificates, many=True,
+                                         context={'certificate_overview': overview}).data
+        self.assertEqual([(item['total_lessons'], item['progress'], item['is_valid']) for item in data],
+                         [(2, 100.0, True)] * 3)
+
+
+class CertificateRenderingTests(TestCase):
+    def setUp(self):
+        import tempfile
+        root = tempfile.mkdtemp()
+        settings = self.settings(CERTIFICATE_ROOT=root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        from .models import Certificate
+        self.student = CustomUser.objects.create_user(email='grad@example.com', password='pass1234',
+                                                      first_name='Ada', last_name='Lovelace')
+        course = Course.objects.create(title='Budgeting (Basics)', code='FIN0001', description='')
+        lesson = Lesson.objects.create(course=course, title='Only lesson', order=1)
+        Enrollment.objects.create(student=self.student, course=course, status='completed')
+        StudentExercise.objects.create(student=self.student, lesson=lesson, completed=True)
+        self.certificate = Certificate.objects.create(user=self.student, course=course, lesson=lesson, grade=92)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student)
+        self.url = reverse('download-certificate', args=[self.certificate.certificate_id])
+
+    def render(self):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command('render_certificates', '--once', stdout=StringIO())
+
+    def test_renders_in_background_and_serves_with_etag(self):
+        from .models import CertificateTask
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.client.get(self.url)
+        self.assertEqual(CertificateTask.objects.filter(status='pending').count(), 1)
+
+        self.render()
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/pdf'))
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'%PDF-1.4') and body.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'(Budgeting \\(Basics\\)) Tj', body)
+
+        cached = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        # A changed grade is a new version, rendered again
+        self.certificate.grade = 97
+        self.certificate.save()
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        self.render()
+        fresh = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
@@ -39,6 +39,7 @@ urlpatterns = [
     # student_dashboard/urls.py - Add this line
 path('lessons/<int:lesson_id>/', views.student_lesson_detail, name='student-lesson-detail'),
     # Exercise and question management
+    path('lessons/<int:lesson_id>/exercises/submit/', views.submit_exercise_answers, name='submit-exercise-answers'),
     path('lessons/<int:lesson_id>/exercises/<str:exercise_id>/submit/', views.submit_exercise_answer, name='submit-exercise-answer'),
     path('lessons/<int:lesson_id>/exercises/<str:exercise_id>/followup/', views.submit_followup_answer, name='submit-followup-answer'),
     path('lessons/<int:lesson_id>/progress/', views.get_exercise_progress, name='exercise-progress'),
@@ -86,6 +87,7 @@ path('lessons/<int:lesson_id>/', views.student_lesson_detail, name='student-less
     path('comments/create/', views.CommentCreateView.as_view(), name='comment-create'),
     path('comments/reply/', views.ReplyCreateView.as_view(), name='reply-create'),
     path('comments/<int:comment_id>/react/', views.toggle_comment_reaction, name='comment-react'),
+    path('comments/<int:comment_id>/replies/', views.CommentReplyListView.as_view(), name='comment-replies'),
     path('comments/stats/', views.comment_stats, name='comment-stats'),
     path('comments/my-comments/', views.user_comments, name='user-comments'),
     # Comment edit/delete endpoints - FIXED URL PATTERNS
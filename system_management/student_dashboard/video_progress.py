@@ -0,0 +1,323 @@
+# student_dashboard/video_progress.py
+"""
+Buffered ingestion of video progress heartbeats.
+
+Playing clients report progress every few seconds. Heartbeats are merged per
+(student, lesson) in a per-process buffer, keeping the maximum progress,
+watched percentage and engagement score, and written to LessonProgress in
+batches. A heartbeat that completes the video, or the final one of a
+session, is written immediately so the UI never waits for a flush.
+
+Batches are written when MAX_PENDING pairs are dirty, by a daemon thread
+once a heartbeat has waited FLUSH_INTERVAL seconds (also when the worker is
+idle), and at a clean exit. A worker that is killed outright (SIGKILL, OOM)
+loses at most its last FLUSH_INTERVAL of intermediate heartbeats; the next
+heartbeat of the session restores the position.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from admin_dashboard.models import Enrollment, LessonProgress
+from .models import CourseProgress
+
+
+FLUSH_INTERVAL = 60  # seconds a heartbeat may wait in the buffer
+MAX_PENDING = 500    # pairs buffered before a flush is forced
+
+# Completion criteria
+FINISHED_RATIO = 0.98
+MIN_WATCHED_PERCENTAGE = 85
+MIN_ENGAGEMENT_SCORE = 7
+
+ENROLLED_STATUSES = ['approved', 'completed']
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """Merged heartbeats of one student on one lesson"""
+    __slots__ = ('course_id', 'video_progress', 'video_duration', 'watched_percentage',
+                 'engagement_score', 'video_completed', 'last_seen')
+
+    def __init__(self, course_id, stored=None):
+        self.course_id = course_id
+        self.video_progress = 0
+        self.video_duration = 0
+        self.watched_percentage = 0
+        self.engagement_score = 0
+        self.video_completed = False
+        self.last_seen = timezone.now()
+        if stored is not None:
+            self.merge_row(stored)
+
+    def merge(self, video_progress, video_duration, watched_percentage, engagement_score):
+        self.video_progress = max(self.video_progress, int(video_progress))
+        if video_duration > 0:
+            self.video_duration = int(video_duration)
+        self.watched_percentage = max(self.watched_percentage, watched_percentage)
+        self.engagement_score = max(self.engagement_score, engagement_score)
+        self.last_seen = timezone.now()
+
+    def merge_row(self, progress):
+        """Fold a stored LessonProgress into the entry, keeping the larger values"""
+        engagement = progress.engagement_data or {}
+        self.video_progress = max(self.video_progress, progress.video_progress or 0)
+        self.video_duration = self.video_duration or progress.video_duration or 0
+        self.watched_percentage = max(self.watched_percentage, engagement.get('watched_percentage', 0))
+        self.engagement_score = max(self.engagement_score, engagement.get('engagement_score', 0))
+        self.video_completed = self.video_completed or progress.video_completed
+
+    def merge_entry(self, other):
+        """Fold another entry for the same pair into this one"""
+        self.video_progress = max(self.video_progress, other.video_progress)
+        self.video_duration = self.video_duration or other.video_duration
+        self.watched_percentage = max(self.watched_percentage, other.watched_percentage)
+        self.engagement_score = max(self.engagement_score, other.engagement_score)
+        self.video_completed = self.video_completed or other.video_completed
+        self.last_seen = max(self.last_seen, other.last_seen)
+
+    def apply_to(self, progress):
+        progress.video_progress = self.video_progress
+        progress.video_duration = self.video_duration
+        progress.last_accessed = self.last_seen
+        engagement = dict(progress.engagement_data or {})
+        engagement['engagement_score'] = self.engagement_score
+        engagement['watched_percentage'] = self.watched_percentage
+        progress.engagement_data = engagement
+
+    def meets_completion(self):
+        video_finished = (self.video_duration > 0
+                          and self.video_progress >= self.video_duration * FINISHED_RATIO)
+        return (video_finished
+                and self.watched_percentage >= MIN_WATCHED_PERCENTAGE
+                and self.engagement_score >= MIN_ENGAGEMENT_SCORE)
+
+
+class ProgressBuffer:
+    """Thread-safe buffer of pending heartbeats keyed by (student_id, lesson_id)"""
+
+    FIELDS = ['video_progress', 'video_duration', 'engagement_data', 'last_accessed']
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.dirty = set()
+        self.last_flush = time.monotonic()
+        self._timer = None
+
+    def _start_timer(self):
+        """Start the background flusher the first time a heartbeat is buffered in this process"""
+        if self._timer is not None or not self.flush_interval:
+            return
+        with self.lock:
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._run_timer, name='video-progress-flush', daemon=True)
+                self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            time.sleep(self.flush_interval / 4)
+            if not self.dirty or time.monotonic() - self.last_flush < self.flush_interval:
+                continue
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.warning("Timed video progress flush failed", exc_info=True)
+            finally:
+                # This thread's connection would otherwise stay open between flushes
+                connections.close_all()
+
+    def _load_entry(self, student_id, lesson_id):
+        """
+        First heartbeat for a pair since its last flush: check enrollment and
+        seed the entry with the stored row. Returns None if not enrolled.
+        """
+        course_id = Enrollment.objects.filter(
+            student_id=student_id,
+            status__in=ENROLLED_STATUSES,
+            course__lessons__id=lesson_id,
+            course__lessons__is_active=True,
+        ).values_list('course_id', flat=True).first()
+        if course_id is None:
+            return None
+        stored = LessonProgress.objects.filter(
+            student_id=student_id, lesson_id=lesson_id
+        ).only('video_progress', 'video_duration', 'video_completed', 'engagement_data').first()
+        return _Entry(course_id, stored)
+
+    def record(self, student_id, lesson_id, video_progress, video_duration,
+               watched_percentage, engagement_score, is_final=False):
+        """
+        Buffer one heartbeat. Returns the merged entry, or None when the
+        student is not enrolled in the lesson's course.
+        """
+        self._start_timer()
+        key = (student_id, lesson_id)
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            loaded = self._load_entry(student_id, lesson_id)
+            if loaded is None:
+                return None
+            with self.lock:
+                entry = self.entries.setdefault(key, loaded)
+
+        with self.lock:
+            # A concurrent flush may have taken the entry; its merged values carry over
+            entry = self.entries.setdefault(key, entry)
+            entry.merge(video_progress, video_duration, watched_percentage, engagement_score)
+            completes = not entry.video_completed and entry.meets_completion()
+            self.dirty.add(key)
+            due = (len(self.dirty) >= self.max_pending
+                   or time.monotonic() - self.last_flush >= self.flush_interval)
+
+        if completes:
+            self._complete(key, entry)
+        elif is_final:
+            self.flush([key])
+        if due:
+            self.flush()
+        return entry
+
+    def _complete(self, key, entry):
+        """Write a completion straight away and count it as course activity"""
+        student_id, lesson_id = key
+        now = timezone.now()
+        with transaction.atomic():
+            progress, _ = LessonProgress.objects.select_for_update().get_or_create(
+                student_id=student_id, lesson_id=lesson_id
+            )
+            entry.merge_row(progress)
+            entry.apply_to(progress)
+            newly_completed = not progress.video_completed
+            progress.video_completed = True
+            progress.completed_at = progress.completed_at or now
+            progress.save(update_fields=self.FIELDS + ['video_completed', 'completed_at'])
+            if newly_completed:
+                CourseProgress.record(student_id, entry.course_id)
+        with self.lock:
+            entry.video_completed = True
+            self.dirty.discard(key)
+            self.entries.pop(key, None)
+
+    def flush(self, keys=None):
+        """
+        Write buffered heartbeats: one read of the stored rows, then one
+        bulk_update and one bulk_create, whose rows are read back in case
+        another process inserted them first. Returns the number of rows written.
+        If the write fails the entries go back into the buffer and the error
+        is raised.
+        """
+        with self.lock:
+            if keys is None:
+                keys = list(self.dirty)
+                self.last_flush = time.monotonic()
+            keys = [key for key in keys if key in self.dirty]
+            pending = {key: self.entries.pop(key) for key in keys}
+            self.dirty.difference_update(keys)
+        if not pending:
+            return 0
+
+        try:
+            return self._write(pending)
+        except Exception:
+            self._requeue(pending)
+            raise
+
+    def _requeue(self, pending):
+        """Put entries whose write failed back, merged with heartbeats that arrived meanwhile"""
+        with self.lock:
+            for key, entry in pending.items():
+                current = self.entries.setdefault(key, entry)
+                if current is not entry:
+                    current.merge_entry(entry)
+                self.dirty.add(key)
+
+    def _write(self, pending):
+        student_ids = {student_id for student_id, _ in pending}
+        lesson_ids = {lesson_id for _, lesson_id in pending}
+        existing = {
+            (progress.student_id, progress.lesson_id): progress
+            for progress in LessonProgress.objects.filter(
+                student_id__in=student_ids, lesson_id__in=lesson_ids
+            ).only('id', 'student_id', 'lesson_id', 'video_progress', 'video_duration',
+                   'video_completed', 'engagement_data')
+        }
+
+        to_update, to_create = [], []
+        for (student_id, lesson_id), entry in pending.items():
+            progress = existing.get((student_id, lesson_id))
+            if progress is None:
+                progress = LessonProgress(student_id=student_id, lesson_id=lesson_id)
+                to_create.append(progress)
+            else:
+                # Another process may have written since this entry was seeded
+                entry.merge_row(progress)
+                to_update.append(progress)
+            entry.apply_to(progress)
+
+        with transaction.atomic():
+            if to_update:
+                LessonProgress.objects.bulk_update(to_update, self.FIELDS)
+            if to_create:
+                LessonProgress.objects.bulk_create(to_create, ignore_conflicts=True)
+                self._merge_conflicts(pending, to_create)
+        return len(to_update) + len(to_create)
+
+    def _merge_conflicts(self, pending, created):
+        """
+        A row another process inserted after the read above is kept by
+        ignore_conflicts: read the new rows back and write the merged values
+        into those that do not already hold them.
+        """
+        created_keys = {(progress.student_id, progress.lesson_id) for progress in created}
+        conflicting = []
+        for progress in LessonProgress.objects.filter(
+            student_id__in={student_id for student_id, _ in created_keys},
+            lesson_id__in={lesson_id for _, lesson_id in created_keys},
+        ).only('id', 'student_id', 'lesson_id', *self.FIELDS, 'video_completed'):
+            key = (progress.student_id, progress.lesson_id)
+            if key not in created_keys:
+                continue
+            stored = [getattr(progress, field) for field in self.FIELDS]
+            entry = pending[key]
+            entry.merge_row(progress)
+            entry.apply_to(progress)
+            if [getattr(progress, field) for field in self.FIELDS] != stored:
+                conflicting.append(progress)
+        if conflicting:
+            LessonProgress.objects.bulk_update(conflicting, self.FIELDS)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.dirty.clear()
+
+
+buffer = ProgressBuffer()
+atexit.register(buffer.flush)
+
+
+def record_heartbeat(user, lesson_id, data):
+    """Parse a heartbeat payload and buffer it; returns the merged entry or None"""
+    return buffer.record(
+        user.id, int(lesson_id),
+        video_progress=float(data.get('video_progress', 0)),
+        video_duration=float(data.get('video_duration', 0)),
+        watched_percentage=float(data.get('watched_percentage', 0)),
+        engagement_score=int(data.get('engagement_score', 0)),
+        is_final=bool(data.get('is_final', False)),
+    )
+
+
+def flush_progress(student_id, lesson_id):
+    """Write one pair's pending heartbeats, e.g. before its progress is read"""
+    return buffer.flush([(student_id, int(lesson_id))])
@@ -4,7 +4,9 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from accounts.models import Course, CustomUser, UserProfile
-from admin_dashboard.models import Lesson, Enrollment, LessonProgress, VideoAnalytics
+from admin_dashboard.models import (Lesson, Enrollment, LessonProgress, VideoAnalytics,
+ CourseContentStats, LESSON_HAS_EXERCISE, generate_lesson_slug
+)
 from django.db.models import Count, Q, F
 from rest_framework.serializers import ModelSerializer
 from .serializers import (CourseListSerializer, LessonSerializer, CourseDetailSerializer,
@@ -31,10 +33,23 @@ from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 from .models import (
  StudentExercise, GuestSession, GuestAccessSettings, Certificate,
- CommentReaction, Reply, Comment, ReplyReaction
+ CommentReaction, Reply, Comment, ReplyReaction, CourseProgress, SearchDocument
 )
+from .catalog import build_student_catalog, ENROLLED_STATUSES
+from .exercises import compile_lesson, compile_exercise
+from .grading import submit_answer, submit_answers, GradingError
+from .search import search as search_index
+from .suggestions import suggest
+from .video_progress import record_heartbeat, flush_progress
+from .comment_threads import CommentThreads
+from .reactions import toggle_reaction
+from .certificates import overview_entries
+from .certificate_pdf import current_pdf
+from system_management.video_views import stream_file
 from django.utils.text import slugify as django_slugify
 from rest_framework.views import APIView
+from rest_framework.pagination import CursorPagination
+import os
 import re
 import ast
 import uuid
@@ -60,80 +75,13 @@ class StudentCourseListView(generics.ListAPIView):
         queryset = self.get_queryset()
         user = request.user
 
-        # Serialize all courses
-        all_courses_data = []
-
-        for course in queryset:
-            # Get enrollment status
-            enrollment = Enrollment.objects.filter(student=user, course=course).first()
-            enrollment_status = enrollment.status if enrollment else 'not_enrolled'
-            is_enrolled = enrollment_status in ['approved', 'completed', 'enrolled']
-
-            # Get lessons count
-            lessons_count = Lesson.objects.filter(course=course, is_active=True).count()
-
-            # ✅ Count videos
-            video_count = Lesson.objects.filter(
-                course=course,
-                is_active=True
-            ).exclude(
-                Q(video_url__isnull=True) |
-                Q(video_url='') |
-                Q(video_url='null')
-            ).count()
-
-            # ✅ Count exercises (lessons with exercises)
-            exercises_count = 0
-            lessons = Lesson.objects.filter(course=course, is_active=True)
-            for lesson in lessons:
-                if lesson.exercise:
-                    exercises_count += 1
-
-            # Calculate progress for enrolled courses
-            progress = 0
-            if is_enrolled and lessons_count > 0:
-                from student_dashboard.models import StudentExercise
-                completed_lessons = StudentExercise.objects.filter(
-                    student=user,
-                    lesson__course=course,
-                    completed=True
-                ).count()
-                progress = round((completed_lessons / lessons_count) * 100, 1)
-
-            # Build course data
-            course_data = {
-                'id': course.id,
-                'title': course.title,
-                'code': course.code,
-                'description': course.description,
-                'price': float(course.price) if course.price else 0.0,
-                'is_active': course.is_active,
-                'progress': progress,
-                'completed_lessons': StudentExercise.objects.filter(
-                    student=user,
-                    lesson__course=course,
-                    completed=True
-                ).count() if is_enrolled else 0,
-                'total_lessons': lessons_count,
-                'enrollment_status': enrollment_status,
-                'is_enrolled': is_enrolled,
-                'total_exercises': exercises_count,
-                'video_count': video_count,  # ✅ INCLUDE VIDEO COUNT
-                'category': course.get_category_display(),
-                'is_popular': course.is_popular,
-                'is_new': course.is_new,
-                'duration': course.duration,
-                'teacher_name': course.teacher_name,
-                'created_at': course.created_at.isoformat() if course.created_at else None,
-            }
-
-            all_courses_data.append(course_data)
+        # Counts, enrollment and progress come from a fixed number of queries
+        all_courses_data, total_enrollments = build_student_catalog(user, queryset)
 
         # ✅ SORT: Enrolled courses first, then others
         all_courses_data.sort(key=lambda x: (not x['is_enrolled'], x['title']))
 
         # Calculate statistics
-        total_enrollments = Enrollment.objects.filter(student=user).count()
         enrolled_count = sum(1 for c in all_courses_data if c['is_enrolled'])
         completed_courses = sum(1 for c in all_courses_data if c['progress'] == 100)
 
@@ -184,14 +132,7 @@ class StudentCourseDetailView(generics.RetrieveAPIView):
         Each lesson with exercise = 1 exercise
         """
         try:
-            lessons = Lesson.objects.filter(course=course, is_active=True)
-            total_exercises = 0
-
-            for lesson in lessons:
-                if lesson.exercise:
-                    total_exercises += 1
-
-            return total_exercises
+            return CourseContentStats.for_course(course).exercise_lessons
         except Exception as e:
             print(f"Error calculating total exercises for course {course.code}: {e}")
             return 0
@@ -421,7 +362,7 @@ def student_lesson_detail_by_slug(request, course_slug, lesson_slug):
         exercises = []
         if lesson.exercise:
             try:
-                exercises = parse_exercises_from_lesson(lesson.exercise)
+                exercises = compile_lesson(lesson).guest_exercises()
                 print(f"Parsed {len(exercises)} exercises")
             except Exception as e:
                 print(f"Error parsing exercises for lesson {lesson.id}: {e}")
@@ -693,7 +634,7 @@ def student_courses_with_exercises(request):
             admin_enrollments__student=user,
             admin_enrollments__status__in=['approved', 'completed'],
             is_active=True
-        ).distinct().order_by('title')
+        ).distinct().select_related('content_stats').order_by('title')
 
         course_data = []
         total_exercises = 0  # Total lessons with exercises
@@ -701,18 +642,14 @@ def student_courses_with_exercises(request):
         completed_courses_count = 0
 
         for course in enrolled_courses:
-            # Get lessons for this course
-            lessons = Lesson.objects.filter(course=course, is_active=True)
-            lessons_count = lessons.count()
+            # Lesson counters for this course
+            stats = CourseContentStats.for_course(course)
+            lessons_count = stats.active_lessons
             total_lessons += lessons_count
 
             # ✅ FIXED: Count LESSONS with exercises, not individual questions
             # Each lesson with an exercise = 1 exercise
-            exercises_count = 0
-            for lesson in lessons:
-                if lesson.exercise:
-                    # This lesson HAS an exercise (regardless of how many questions)
-                    exercises_count += 1
+            exercises_count = stats.exercise_lessons
 
             total_exercises += exercises_count
 
@@ -720,11 +657,7 @@ def student_courses_with_exercises(request):
             if lessons_count == 0:
                 progress = 0
             else:
-                completed_lessons = StudentExercise.objects.filter(
-                    student=user,
-                    lesson__course=course,
-                    completed=True
-                ).count()
+                completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
                 progress = round((completed_lessons / lessons_count) * 100, 1)
 
             # Track completed courses
@@ -811,11 +744,7 @@ def course_lessons_list(request, course_code):
 
     # Calculate progress
     total_lessons = lessons.count()
-    completed_lessons = StudentExercise.objects.filter(
-        student=user,
-        lesson__course=course,
-        completed=True
-    ).count()
+    completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
 
     progress = round((completed_lessons / total_lessons) * 100, 1) if total_lessons > 0 else 0
 
@@ -911,205 +840,66 @@ def student_lesson_detail(request, lesson_id):
 def submit_exercise_answer(request, lesson_id, exercise_id):
     """
     ✅ FIXED: Properly accumulates score for each correct answer
+    Grading and the locked StudentExercise update live in grading.submit_answer.
     """
-    user = request.user
+    lesson = get_object_or_404(
+        Lesson.objects.only('id', 'course_id', 'exercise', 'updated_at'),
+        id=lesson_id,
+        is_active=True
+    )
 
     try:
-        lesson = get_object_or_404(Lesson, id=lesson_id, is_active=True)
-
-        enrollment = Enrollment.objects.filter(
-            student=user,
-            course=lesson.course,
-            status__in=['approved', 'completed']
-        ).first()
-
-        if not enrollment:
-            return Response(
-                {'detail': 'You are not enrolled in this course.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-
-        student_exercise, created = StudentExercise.objects.get_or_create(
-            student=user,
-            lesson=lesson,
-            defaults={'completed': False, 'score': 0.0, 'submission_data': {}}
-        )
-
-        submitted_answer = request.data.get('answer')
-        if submitted_answer is None:
-            return Response(
-                {'detail': 'Answer is required.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Parse questions from lesson
-        questions = []
-        if lesson.exercise:
-            try:
-                if isinstance(lesson.exercise, list):
-                    questions = lesson.exercise
-                elif isinstance(lesson.exercise, dict):
-                    if 'questions' in lesson.exercise:
-                        questions = lesson.exercise['questions']
-                    else:
-                        question_index = 1
-                        for exercise_type in ['multiple_choice', 'fill_blank', 'paragraph', 'true_false']:
-                            if exercise_type in lesson.exercise:
-                                ex_data = lesson.exercise[exercise_type].copy()
-                                ex_data['type'] = exercise_type.replace('_', '-')
-                                ex_data['id'] = ex_data.get('id', f'question_{question_index}')
-                                questions.append(ex_data)
-                                question_index += 1
-
-                for i, question in enumerate(questions):
-                    if not question.get('id'):
-                        question['id'] = f'question_{i + 1}'
-
-            except Exception as e:
-                print(f"Error parsing questions: {e}")
-                return Response(
-                    {'detail': 'Error parsing lesson questions.'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-        # Find the specific question
-        question = None
-        for q in questions:
-            q_id = str(q.get('id', ''))
-            if q_id == str(exercise_id):
-                question = q
-                break
-
-        if not question:
-            return Response(
-                {'detail': f'Question with ID {exercise_id} not found.'},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        # Check correctness based on question type
-        is_correct = False
-        correct_answer = None
-        question_type = question.get('type', 'multiple-choice')
-
-        print(f"\n=== Processing Question {exercise_id} ===")
-        print(f"Type: {question_type}")
-        print(f"Submitted answer: '{submitted_answer}'")
-
-        if question_type == 'multiple-choice':
-            correct_answer = question.get('correct_answer', question.get('correct', 0))
-            is_correct = int(submitted_answer) == int(correct_answer)
-
-        elif question_type in ['fill-blank', 'fill_blank']:
-            if 'answers' in question and question['answers']:
-                correct_answer = question['answers'][0]
-            elif 'answer' in question:
-                correct_answer = question['answer']
-            elif 'correct_answer' in question:
-                correct_answer = question['correct_answer']
-            elif 'correct' in question:
-                correct_answer = question['correct']
-            else:
-                return Response(
-                    {'detail': 'Question is missing answer configuration.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            if correct_answer is not None:
-                def normalize_answer(ans):
-                    if ans is None:
-                        return ""
-                    normalized = str(ans).strip().lower()
-                    normalized = ' '.join(normalized.split())
-                    return normalized
-
-                correct_normalized = normalize_answer(correct_answer)
-                submitted_normalized = normalize_answer(submitted_answer)
-                is_correct = correct_normalized == submitted_normalized
-
-        elif question_type == 'paragraph':
-            is_correct = True
-            correct_answer = "Answer saved successfully"
-
-        elif question_type in ['true-false', 'true_false']:
-            correct_answer = question.get('correct_answer', question.get('correct', 0))
-            is_correct = int(submitted_answer) == int(correct_answer)
-
-        # ✅ CRITICAL FIX: Initialize submission_data if needed
-        if not student_exercise.submission_data:
-            student_exercise.submission_data = {}
-
-        # Check if this question was already answered correctly
-        previous_submission = student_exercise.submission_data.get(str(exercise_id), {})
-        was_previously_correct = previous_submission.get('is_correct', False)
-
-        # Store submission
-        student_exercise.submission_data[str(exercise_id)] = {
-            'answer': submitted_answer,
-            'is_correct': is_correct,
-            'submitted_at': timezone.now().isoformat(),
-            'question_type': question_type
-        }
+        response_data = submit_answer(request.user, lesson, exercise_id, request.data.get('answer'))
+        return Response(response_data, status=status.HTTP_200_OK)
 
-        # ✅ CRITICAL FIX: Update score properly
-        # If this answer is correct and wasn't correct before, add 1 to score
-        if is_correct and not was_previously_correct:
-            student_exercise.score = float(student_exercise.score or 0) + 1.0
-            print(f"✅ Correct answer! New score: {student_exercise.score}")
-        elif not is_correct and was_previously_correct:
-            # If changing from correct to incorrect (rare case)
-            student_exercise.score = max(0, float(student_exercise.score or 0) - 1.0)
-            print(f"⚠️ Answer changed to incorrect. New score: {student_exercise.score}")
-        else:
-            print(f"ℹ️ Score unchanged: {student_exercise.score}")
+    except GradingError as e:
+        return Response({'detail': e.detail}, status=e.status_code)
 
-        # Check completion
-        total_questions = len(questions)
-        completed_questions = sum(
-            1 for q in questions
-            if student_exercise.submission_data.get(str(q.get('id', '')), {}).get('is_correct')
+    except Exception as e:
+        logger.error(f"Error in submit_exercise_answer: {str(e)}", exc_info=True)
+        return Response(
+            {'detail': f'Server error: {str(e)}'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-        print(f"📊 Progress: {completed_questions}/{total_questions} questions answered correctly")
-
-        # Mark as completed if all questions answered correctly
-        if total_questions > 0 and completed_questions >= total_questions:
-            student_exercise.completed = True
-            if not student_exercise.completed_at:
-                student_exercise.completed_at = timezone.now()
-            print(f"🎉 Lesson completed! Final score: {student_exercise.score}/{total_questions}")
-
-        # ✅ SAVE TO DATABASE
-        student_exercise.save()
-
-        # ✅ VERIFY SAVE
-        student_exercise.refresh_from_db()
-        print(f"✅ Saved to DB - Score: {student_exercise.score}, Completed: {student_exercise.completed}")
-
-        response_data = {
-            'detail': 'Answer submitted successfully.',
-            'question_id': exercise_id,
-            'submitted_answer': submitted_answer,
-            'is_correct': is_correct,
-            'score': float(student_exercise.score),
-            'total_questions': total_questions,
-            'completed_questions': completed_questions,
-            'lesson_completed': student_exercise.completed,
-            'completed_at': student_exercise.completed_at.isoformat() if student_exercise.completed_at else None
-        }
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def submit_exercise_answers(request, lesson_id):
+    """
+    Submit every answer of a lesson in one request.
+    Accepts {"answers": {"<question_id>": <answer>, ...}} or
+    {"answers": [{"question_id": ..., "answer": ...}, ...]} and returns per-question results.
+    """
+    lesson = get_object_or_404(
+        Lesson.objects.only('id', 'course_id', 'exercise', 'updated_at'),
+        id=lesson_id,
+        is_active=True
+    )
 
-        if not is_correct and question_type != 'paragraph':
-            response_data['correct_answer'] = correct_answer
+    answers = request.data.get('answers')
+    if isinstance(answers, list):
+        if not all(isinstance(item, dict) and 'question_id' in item for item in answers):
+            return Response({'detail': 'Each answer needs a question_id.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        answers = {str(item['question_id']): item.get('answer') for item in answers}
+    elif answers is not None and not isinstance(answers, dict):
+        return Response({'detail': 'Answers must be an object or a list.'},
+                        status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        response_data = submit_answers(request.user, lesson, answers)
         return Response(response_data, status=status.HTTP_200_OK)
 
+    except GradingError as e:
+        return Response({'detail': e.detail}, status=e.status_code)
+
     except Exception as e:
-        print(f"❌ ERROR in submit_exercise_answer: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error in submit_exercise_answers: {str(e)}", exc_info=True)
         return Response(
             {'detail': f'Server error: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def submit_followup_answer(request, lesson_id, exercise_id):
@@ -1148,50 +938,22 @@ def submit_followup_answer(request, lesson_id, exercise_id):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Locate the exercise and its follow-up
-    exercise = None
-    follow_up_data = None
+    # Locate the exercise's follow-up in the compiled exercise
+    follow_up = compile_lesson(lesson).followup(exercise_id)
 
-    if lesson.exercise:
-        try:
-            if isinstance(lesson.exercise, list):
-                exercise = next((ex for ex in lesson.exercise if str(ex.get('id')) == str(exercise_id)), None)
-            elif isinstance(lesson.exercise, dict):
-                if 'questions' in lesson.exercise:
-                    exercise = next((ex for ex in lesson.exercise['questions'] if str(ex.get('id')) == str(exercise_id)), None)
-                elif str(lesson.exercise.get('id')) == str(exercise_id):
-                    exercise = lesson.exercise
-
-            if exercise:
-                # Get follow-up data
-                if 'follow_up' in exercise:
-                    follow_up_data = exercise['follow_up']
-                elif exercise.get('type') == 'multiple-choice' and exercise.get('options'):
-                    # Generate auto follow-up
-                    correct_option = exercise.get('options', [])[exercise.get('correct', 0)]
-                    question_snippet = exercise.get('question', '')[:50]
-                    follow_up_data = {
-                        'question': f'Complete this sentence: The correct answer to "{question_snippet}..." is _______.',
-                        'correct_answer': correct_option,
-                        'explanation': f'The correct answer is "{correct_option}". This reinforces your understanding of the concept.'
-                    }
-
-        except Exception as e:
-            print(f"Error finding exercise: {e}")
-
-    if not exercise or not follow_up_data:
+    if not follow_up:
         return Response(
             {'detail': 'Exercise or follow-up question not found.'},
             status=status.HTTP_404_NOT_FOUND
         )
 
     # Check correctness of follow-up answer
-    correct_answer = follow_up_data.get('correct_answer', '')
-    is_correct = str(submitted_answer).strip().lower() == str(correct_answer).strip().lower()
+    correct_answer = follow_up.correct_answer
+    is_correct = str(submitted_answer).strip().lower() == follow_up.normalized_answer
 
     # Update score for follow-up (bonus points)
-    if is_correct:
-        student_exercise.score += 0.5  # Half point for follow-up
+    score_delta = 0.5 if is_correct else 0.0
+    student_exercise.score += score_delta  # Half point for follow-up
 
     # Store follow-up answer in additional data
     if not student_exercise.additional_data:
@@ -1204,6 +966,7 @@ def submit_followup_answer(request, lesson_id, exercise_id):
     }
 
     student_exercise.save()
+    CourseProgress.record(user.id, lesson.course_id, score_delta=score_delta)
 
     return Response({
         'detail': 'Follow-up answer submitted successfully.',
@@ -1211,7 +974,7 @@ def submit_followup_answer(request, lesson_id, exercise_id):
         'submitted_answer': submitted_answer,
         'correct_answer': correct_answer,
         'is_correct': is_correct,
-        'explanation': follow_up_data.get('explanation', ''),
+        'explanation': follow_up.data.get('explanation', ''),
         'score': student_exercise.score,
         'completed': student_exercise.completed
     }, status=status.HTTP_200_OK)
@@ -1265,96 +1028,39 @@ def get_exercise_progress(request, lesson_id):
 def update_video_progress(request, lesson_id):
     """
     ✅ FIXED: Properly marks video as completed
+    Heartbeats are buffered and merged per student and lesson (see video_progress.py);
+    completions are written immediately.
     """
     user = request.user
 
     try:
-        lesson = get_object_or_404(Lesson, id=lesson_id, is_active=True)
-
-        # Check enrollment
-        enrollment = Enrollment.objects.filter(
-            student=user,
-            course=lesson.course,
-            status__in=['approved', 'completed']
-        ).first()
+        entry = record_heartbeat(user, lesson_id, request.data)
 
-        if not enrollment:
+        if entry is None:
+            get_object_or_404(Lesson, id=lesson_id, is_active=True)
             return Response(
                 {'detail': 'You are not enrolled in this course.'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Extract progress data
-        video_progress = float(request.data.get('video_progress', 0))
-        video_duration = float(request.data.get('video_duration', 0))
-        watched_percentage = float(request.data.get('watched_percentage', 0))
-        engagement_score = int(request.data.get('engagement_score', 0))
-        is_final = request.data.get('is_final', False)
-
-        # ✅ CRITICAL: Determine if video is completed
-        video_finished = video_progress >= video_duration * 0.98 if video_duration > 0 else False
-        watch_requirement_met = watched_percentage >= 85
-        engagement_met = engagement_score >= 7
-
-        # Auto-complete if ALL criteria are met
-        should_complete = video_finished and watch_requirement_met and engagement_met
-
-        print(f"\n🎥 VIDEO PROGRESS UPDATE:")
-        print(f"   Progress: {video_progress}/{video_duration}")
-        print(f"   Watched: {watched_percentage}%")
-        print(f"   Engagement: {engagement_score}/10")
-        print(f"   Should Complete: {should_complete}")
-
-        # Get or create progress record
-        progress, created = LessonProgress.objects.get_or_create(
-            student=user,
-            lesson=lesson,
-            defaults={
-                'video_progress': video_progress,
-                'video_duration': video_duration,
-                'video_completed': should_complete,
-                'engagement_data': {
-                    'engagement_score': engagement_score,
-                    'watched_percentage': watched_percentage,
-                }
-            }
-        )
-
-        if not created:
-            # Update existing progress
-            progress.video_progress = max(progress.video_progress, video_progress)
-            progress.video_duration = video_duration if video_duration > 0 else progress.video_duration
-
-            if not progress.engagement_data:
-                progress.engagement_data = {}
-
-            progress.engagement_data.update({
-                'engagement_score': max(progress.engagement_data.get('engagement_score', 0), engagement_score),
-                'watched_percentage': max(progress.engagement_data.get('watched_percentage', 0), watched_percentage),
-            })
-
-            # ✅ CRITICAL: Mark as completed when criteria are met
-            if should_complete and not progress.video_completed:
-                progress.video_completed = True
-                progress.completed_at = timezone.now()
-                print(f"   ✅ Video marked as COMPLETED")
-
-        progress.save()
-
         response_data = {
             'detail': 'Progress updated successfully.',
-            'video_progress': progress.video_progress,
-            'video_completed': progress.video_completed,
-            'watched_percentage': progress.engagement_data.get('watched_percentage', 0),
-            'engagement_score': progress.engagement_data.get('engagement_score', 0),
+            'video_progress': entry.video_progress,
+            'video_completed': entry.video_completed,
+            'watched_percentage': entry.watched_percentage,
+            'engagement_score': entry.engagement_score,
         }
 
         return Response(response_data, status=status.HTTP_200_OK)
 
+    except (TypeError, ValueError) as e:
+        return Response(
+            {'detail': f'Invalid progress data: {str(e)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     except Exception as e:
-        print(f"❌ ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Error in update_video_progress: {str(e)}", exc_info=True)
         return Response(
             {'detail': f'Error updating progress: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1383,7 +1089,8 @@ def get_video_progress(request, lesson_id):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Get progress record
+        # Get progress record, including heartbeats still in the buffer
+        flush_progress(user.id, lesson.id)
         progress = LessonProgress.objects.filter(
             student=user,
             lesson=lesson
@@ -1544,6 +1251,7 @@ def mark_lesson_completed(request, lesson_id):
             total_questions = int(request.data.get('total_questions', 0))
 
             # ✅ MARK AS COMPLETED
+            previous_score = float(student_exercise.score or 0)
             student_exercise.completed = True
             student_exercise.completed_at = timezone.now()
             student_exercise.score = score if score > 0 else 1.0
@@ -1561,6 +1269,12 @@ def mark_lesson_completed(request, lesson_id):
 
             student_exercise.save()
 
+            CourseProgress.record(
+                user.id, lesson.course_id,
+                completed_delta=1,
+                score_delta=float(student_exercise.score) - previous_score
+            )
+
         # ✅ REFRESH FROM DATABASE (outside transaction)
         student_exercise.refresh_from_db()
         print(f"✅ Saved - Completed: {student_exercise.completed}")
@@ -2010,7 +1724,8 @@ def calculate_exercise_completion_score(lesson, user):
 def calculate_course_progress(course, user):
     """Calculate overall course progress for sidebar updates"""
     try:
-        total_lessons = Lesson.objects.filter(course=course, is_active=True).count()
+        progress = CourseProgress.for_student(user.id, course.id)
+        total_lessons = progress.total_lessons
 
         if total_lessons == 0:
             return {
@@ -2019,13 +1734,7 @@ def calculate_course_progress(course, user):
                 'progress_percentage': 100.0
             }
 
-        # Assuming StudentExercise tracks completed lessons
-        completed_lessons = StudentExercise.objects.filter(
-            lesson__course=course,
-            lesson__is_active=True,
-            user=user,
-            is_completed=True  # Assumes there's a boolean field to indicate completion
-        ).values('lesson').distinct().count()
+        completed_lessons = progress.completed_lessons
 
         progress_percentage = (completed_lessons / total_lessons) * 100
 
@@ -2068,9 +1777,7 @@ def get_lesson_with_video(request, lesson_id):
             )
 
         # Build video configuration
-        video_config = None
-        if lesson.video_url:
-            video_config = build_video_config(lesson)
+        video_config = build_video_config(lesson)
 
         # Serialize lesson data
         lesson_data = {
@@ -2097,66 +1804,7 @@ def build_video_config(lesson):
     """
     Build comprehensive video configuration for frontend
     """
-    if not lesson.video_url:
-        return None
-
-    url = lesson.video_url.lower()
-
-    # Detect source and format
-    if 'youtube.com' in url or 'youtu.be' in url:
-        source = 'youtube'
-        format_type = 'youtube'
-        embed_url = lesson.get_youtube_embed_url()
-        mime_type = None
-        supports_streaming = True
-        requires_proxy = False
-
-    elif 'vimeo.com' in url:
-        source = 'vimeo'
-        format_type = 'vimeo'
-        embed_url = lesson.get_vimeo_embed_url()
-        mime_type = None
-        supports_streaming = True
-        requires_proxy = False
-
-    elif '/media/' in url or 'localhost' in url:
-        source = 'local'
-        format_type = lesson.video_format or 'mp4'
-        embed_url = None
-        mime_type = f'video/{format_type}'
-        supports_streaming = True
-        requires_proxy = True
-
-    else:
-        source = 'external'
-        format_type = lesson.video_format or 'mp4'
-        embed_url = None
-        mime_type = f'video/{format_type}'
-        supports_streaming = True
-        requires_proxy = False
-
-    # Build final configuration
-    config = {
-        'url': lesson.video_url,
-        'source': source,
-        'format': format_type,
-        'mime_type': mime_type,
-        'duration': lesson.video_duration or 0,
-        'file_size': lesson.video_file_size or 0,
-        'supports_streaming': supports_streaming,
-        'requires_authentication': lesson.requires_authentication,
-        'allow_download': lesson.allow_download,
-        'requires_proxy': requires_proxy,
-    }
-
-    if embed_url:
-        config['embed_url'] = embed_url
-
-    if source == 'local':
-        # Provide streaming URL for local files
-        config['streaming_url'] = f'http://localhost:8000{lesson.video_url}'
-
-    return config
+    return lesson.get_video_config()
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -2499,10 +2147,10 @@ class GuestCourseListView(generics.ListAPIView):
         # Return ALL active courses from guest settings
         settings = GuestAccessSettings.objects.first()
         if settings and settings.allowed_courses.exists():
-            return settings.allowed_courses.filter(is_active=True).order_by('title')
+            return settings.allowed_courses.filter(is_active=True).select_related('content_stats').order_by('title')
         else:
             # Fallback to all active courses
-            return Course.objects.filter(is_active=True).order_by('title')
+            return Course.objects.filter(is_active=True).select_related('content_stats').order_by('title')
 
     def list(self, request, *args, **kwargs):
         try:
@@ -2514,17 +2162,11 @@ class GuestCourseListView(generics.ListAPIView):
             course_data = []
             for course in queryset:
                 # Get actual lessons count
-                lessons_count = course.lessons.filter(is_active=True).count()
+                stats = CourseContentStats.for_course(course)
+                lessons_count = stats.active_lessons
 
                 # ✅ CRITICAL FIX: Calculate video count for this course
-                video_count = Lesson.objects.filter(
-                    course=course,
-                    is_active=True
-                ).exclude(
-                    Q(video_url__isnull=True) |
-                    Q(video_url='') |
-                    Q(video_url='null')
-                ).count()
+                video_count = stats.video_lessons
 
                 # Get teacher name
                 teacher_name = course.teacher_name
@@ -2713,23 +2355,17 @@ def guest_available_courses(request):
         settings = GuestAccessSettings.objects.first()
 
         # ✅ Return ALL active courses (not just allowed ones)
-        queryset = Course.objects.filter(is_active=True).order_by('title')
+        queryset = Course.objects.filter(is_active=True).select_related('teacher__user', 'content_stats').order_by('title')
 
         print(f"🔍 Found {queryset.count()} courses for guest access")
 
         course_data = []
         for course in queryset:
-            total_lessons = course.lessons.filter(is_active=True).count()
+            stats = CourseContentStats.for_course(course)
+            total_lessons = stats.active_lessons
 
             # ✅ Calculate video count
-            video_count = Lesson.objects.filter(
-                course=course,
-                is_active=True
-            ).exclude(
-                Q(video_url__isnull=True) |
-                Q(video_url='') |
-                Q(video_url='null')
-            ).count()
+            video_count = stats.video_lessons
 
             teacher_name = None
             if course.teacher and course.teacher.user:
@@ -2805,80 +2441,42 @@ def guest_available_courses(request):
 
 def generate_slug(text):
     """Generate slug matching frontend's generateSlug function"""
-    if not text:
-        return ''
-
-    # Convert to lowercase
-    slug = text.lower()
-
-    # Remove special characters (keep letters, numbers, spaces, hyphens)
-    slug = re.sub(r'[^\w\s-]', '', slug)
-
-    # Replace spaces with hyphens
-    slug = re.sub(r'\s+', '-', slug)
-
-    # Replace multiple hyphens with single hyphen
-    slug = re.sub(r'--+', '-', slug)
-
-    # Trim leading/trailing hyphens and spaces
-    slug = slug.strip('- ')
-
-    return slug
+    return generate_lesson_slug(text)
 
 def get_lesson_by_slug(course, lesson_slug):
     """
-    Get lesson by slug (generated from title)
+    Get lesson by its stored slug (indexed, unique per course).
+    Falls back to the legacy normalized slug, to a -N suffixed duplicate
+    title and finally to a numeric lesson ID.
     """
     try:
-        # First try exact match with the new slug generation
-        lessons = Lesson.objects.filter(
-            course=course,
-            is_active=True
-        )
-
-        for lesson in lessons:
-            # Generate slug from title using the same logic as frontend
-            lesson_slug_from_title = generate_slug(lesson.title)
-
-            # Debug logging
-            print(f"🔍 Comparing slugs: '{lesson_slug_from_title}' vs '{lesson_slug}'")
-
-            if lesson_slug_from_title == lesson_slug:
-                print(f"✅ Exact match found: {lesson.title}")
-                return lesson
-
-        # If not found, try case-insensitive and with special character variations
-        for lesson in lessons:
-            lesson_slug_from_title = generate_slug(lesson.title)
-            # Remove any remaining special characters and compare
-            clean_backend_slug = re.sub(r'[^\w-]', '', lesson_slug_from_title).lower()
-            clean_frontend_slug = re.sub(r'[^\w-]', '', lesson_slug).lower()
-
-            if clean_backend_slug == clean_frontend_slug:
-                print(f"✅ Clean match found: {lesson.title}")
+        lessons = Lesson.objects.filter(course=course, is_active=True)
+
+        # Exact slug, or the slug with any leftover special characters removed
+        clean_slug = re.sub(r'[^\w-]', '', lesson_slug).lower()
+        matches = {lesson.slug: lesson for lesson in lessons.filter(slug__in={lesson_slug, clean_slug})}
+        lesson = matches.get(lesson_slug) or matches.get(clean_slug)
+        if lesson:
+            return lesson
+
+        # A title shared with another lesson in the course is stored as slug-2, slug-3...;
+        # only accept such a slug when the lesson's own title still gives clean_slug
+        suffix_pattern = re.compile(rf'{re.escape(clean_slug)}-\d+')
+        for lesson in lessons.filter(slug__startswith=f"{clean_slug}-").order_by('order'):
+            if suffix_pattern.fullmatch(lesson.slug) and generate_lesson_slug(lesson.title)[:240] == clean_slug:
                 return lesson
 
         # Try to find by ID (for backward compatibility)
         if lesson_slug.isdigit():
-            try:
-                lesson = Lesson.objects.get(
-                    course=course,
-                    id=int(lesson_slug),
-                    is_active=True
-                )
-                print(f"✅ Found by ID fallback: {lesson.title}")
+            lesson = lessons.filter(id=int(lesson_slug)).first()
+            if lesson:
                 return lesson
-            except Lesson.DoesNotExist:
-                pass
 
-        # If still not found, return None
-        print(f"❌ No lesson found for slug: {lesson_slug}")
+        logger.info(f"No lesson found for slug: {lesson_slug}")
         return None
 
     except Exception as e:
-        print(f"❌ Error in get_lesson_by_slug: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning(f"Error in get_lesson_by_slug: {e}", exc_info=True)
         return None
 
 @api_view(['GET'])
@@ -2952,26 +2550,8 @@ def get_guest_lesson_by_slug(request, course_slug, lesson_slug):
         except Course.DoesNotExist:
             return Response({'error': 'Course not found'}, status=404)
 
-        # ✅ FIXED: Get ALL lessons for the course
-        lessons = Lesson.objects.filter(course=course, is_active=True).order_by('order')
-
-        # Find the specific lesson by slug
-        target_lesson = None
-        for lesson in lessons:
-            # Generate slug from title
-            lesson_title_slug = slugify(lesson.title)
-            print(f"🔍 Comparing: {lesson_title_slug} == {lesson_slug}")
-
-            if lesson_title_slug == lesson_slug:
-                target_lesson = lesson
-                break
-
-        # If not found by slug, try by ID
-        if not target_lesson and lesson_slug.isdigit():
-            try:
-                target_lesson = Lesson.objects.get(id=int(lesson_slug), course=course, is_active=True)
-            except Lesson.DoesNotExist:
-                pass
+        # Find the specific lesson by slug (falls back to the lesson ID)
+        target_lesson = get_lesson_by_slug(course, lesson_slug)
 
         if not target_lesson:
             return Response({'error': 'Lesson not found'}, status=404)
@@ -2979,7 +2559,7 @@ def get_guest_lesson_by_slug(request, course_slug, lesson_slug):
         # Parse exercises
         exercises = []
         if target_lesson.exercise:
-            exercises = parse_exercises_from_lesson(target_lesson.exercise)
+            exercises = compile_lesson(target_lesson).guest_exercises()
 
         # Build response
         response_data = {
@@ -3016,9 +2596,9 @@ class GuestCourseListView(generics.ListAPIView):
     def get_queryset(self):
         settings = GuestAccessSettings.objects.first()
         if settings and settings.allowed_courses.exists():
-            return settings.allowed_courses.filter(is_active=True).order_by('title')
+            return settings.allowed_courses.filter(is_active=True).select_related('content_stats').order_by('title')
         else:
-            return Course.objects.filter(is_active=True).order_by('title')
+            return Course.objects.filter(is_active=True).select_related('content_stats').order_by('title')
 
     def list(self, request, *args, **kwargs):
         try:
@@ -3030,17 +2610,11 @@ class GuestCourseListView(generics.ListAPIView):
             course_data = []
             for course in queryset:
                 # Get actual lessons count
-                lessons_count = course.lessons.filter(is_active=True).count()
+                stats = CourseContentStats.for_course(course)
+                lessons_count = stats.active_lessons
 
                 # ✅ CRITICAL FIX: Calculate video count for this course
-                video_count = Lesson.objects.filter(
-                    course=course,
-                    is_active=True
-                ).exclude(
-                    Q(video_url__isnull=True) |
-                    Q(video_url='') |
-                    Q(video_url='null')
-                ).count()
+                video_count = stats.video_lessons
 
                 # Get teacher name
                 teacher_name = None
@@ -3123,7 +2697,7 @@ class HomeCourseListView(generics.ListAPIView):
     serializer_class = CourseListSerializer
 
     def get_queryset(self):
-        return Course.objects.filter(is_active=True).order_by('title')
+        return Course.objects.filter(is_active=True).select_related('teacher__user', 'content_stats').order_by('title')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -3143,34 +2717,22 @@ class HomeCourseListView(generics.ListAPIView):
                 is_enrolled = enrollment_status in ['approved', 'completed', 'enrolled']
 
             # Get lessons count
-            lessons_count = Lesson.objects.filter(course=course, is_active=True).count()
+            stats = CourseContentStats.for_course(course)
+            lessons_count = stats.active_lessons
 
             # Count videos
-            video_count = Lesson.objects.filter(
-                course=course,
-                is_active=True
-            ).exclude(
-                Q(video_url__isnull=True) |
-                Q(video_url='') |
-                Q(video_url='null')
-            ).count()
+            video_count = stats.video_lessons
 
             # Count exercises (lessons with exercises)
-            exercises_count = 0
-            lessons = Lesson.objects.filter(course=course, is_active=True)
-            for lesson in lessons:
-                if lesson.exercise:
-                    exercises_count += 1
+            exercises_count = stats.exercise_lessons
 
             # Calculate progress only for enrolled users
             progress = 0
-            if is_enrolled and lessons_count > 0:
-                completed_lessons = StudentExercise.objects.filter(
-                    student=user,
-                    lesson__course=course,
-                    completed=True
-                ).count()
-                progress = round((completed_lessons / lessons_count) * 100, 1)
+            completed_lessons = 0
+            if is_enrolled:
+                completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
+                if lessons_count > 0:
+                    progress = round((completed_lessons / lessons_count) * 100, 1)
 
             # Build course data for home
             course_data = {
@@ -3181,11 +2743,7 @@ class HomeCourseListView(generics.ListAPIView):
                 'price': float(course.price) if course.price else 0.0,
                 'is_active': course.is_active,
                 'progress': progress,
-                'completed_lessons': StudentExercise.objects.filter(
-                    student=user,
-                    lesson__course=course,
-                    completed=True
-                ).count() if is_enrolled else 0,
+                'completed_lessons': completed_lessons,
                 'total_lessons': lessons_count,
                 'enrollment_status': enrollment_status,
                 'is_enrolled': is_enrolled,
@@ -3269,7 +2827,7 @@ class HomeExercisesView(generics.ListAPIView):
     serializer_class = CourseListSerializer
 
     def get_queryset(self):
-        return Course.objects.filter(is_active=True).order_by('title')
+        return Course.objects.filter(is_active=True).select_related('teacher__user', 'content_stats').order_by('title')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -3278,16 +2836,15 @@ class HomeExercisesView(generics.ListAPIView):
         courses_with_exercises = []
 
         for course in queryset:
-            # Get lessons with exercises
-            lessons_with_exercises = Lesson.objects.filter(
-                course=course,
-                is_active=True,
-                exercise__isnull=False
-            ).exclude(exercise={})
-
-            exercises_count = lessons_with_exercises.count()
+            # Skip courses without exercises using the stored counters
+            exercises_count = CourseContentStats.for_course(course).exercise_lessons
 
             if exercises_count > 0:
+                lessons_with_exercises = Lesson.objects.filter(
+                    course=course,
+                    is_active=True
+                ).filter(LESSON_HAS_EXERCISE)
+
                 # Enrollment status for exercise access
                 enrollment_status = 'not_enrolled'
                 if user.is_authenticated:
@@ -3336,7 +2893,7 @@ class DashboardCourseListView(generics.ListAPIView):
             admin_enrollments__student=user,
             admin_enrollments__status__in=['approved', 'completed'],
             is_active=True
-        ).distinct().order_by('title')
+        ).distinct().select_related('teacher__user', 'content_stats').order_by('title')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -3350,33 +2907,19 @@ class DashboardCourseListView(generics.ListAPIView):
             enrollment_status = enrollment.status if enrollment else 'not_enrolled'
 
             # Get lessons count
-            lessons_count = Lesson.objects.filter(course=course, is_active=True).count()
+            stats = CourseContentStats.for_course(course)
+            lessons_count = stats.active_lessons
 
             # Count videos
-            video_count = Lesson.objects.filter(
-                course=course,
-                is_active=True
-            ).exclude(
-                Q(video_url__isnull=True) |
-                Q(video_url='') |
-                Q(video_url='null')
-            ).count()
+            video_count = stats.video_lessons
 
             # Count exercises
-            exercises_count = 0
-            lessons = Lesson.objects.filter(course=course, is_active=True)
-            for lesson in lessons:
-                if lesson.exercise:
-                    exercises_count += 1
+            exercises_count = stats.exercise_lessons
 
             # Calculate progress for enrolled courses
             progress = 0
+            completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
             if lessons_count > 0:
-                completed_lessons = StudentExercise.objects.filter(
-                    student=user,
-                    lesson__course=course,
-                    completed=True
-                ).count()
                 progress = round((completed_lessons / lessons_count) * 100, 1)
 
             course_data = {
@@ -3385,11 +2928,7 @@ class DashboardCourseListView(generics.ListAPIView):
                 'code': course.code,
                 'description': course.description,
                 'progress': progress,
-                'completed_lessons': StudentExercise.objects.filter(
-                    student=user,
-                    lesson__course=course,
-                    completed=True
-                ).count(),
+                'completed_lessons': completed_lessons,
                 'total_lessons': lessons_count,
                 'enrollment_status': enrollment_status,
                 'total_exercises': exercises_count,
@@ -3467,11 +3006,7 @@ class DashboardCourseLessonsView(generics.ListAPIView):
 
         # Calculate progress for dashboard
         total_lessons = lessons.count()
-        completed_lessons = StudentExercise.objects.filter(
-            student=user,
-            lesson__course=course,
-            completed=True
-        ).count()
+        completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
 
         progress = round((completed_lessons / total_lessons) * 100, 1) if total_lessons > 0 else 0
 
@@ -3530,12 +3065,7 @@ def guest_course_detail(request, course_code):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-    #Calculate total exercises
-    total_exercises = 0
-    lessons = Lesson.objects.filter(course=course, is_active=True)
-    for lesson in lessons:
-        if lesson.exercise:
-            total_exercises += 1
+    stats = CourseContentStats.for_course(course)
 
     # Basic course data - NO LEVEL FIELD
     course_data = {
@@ -3546,8 +3076,8 @@ def guest_course_detail(request, course_code):
         'duration': course.duration,
         'category': course.display_category,  # Use display_category instead of level
         'teacher_name': course.teacher_name,
-        'lessons_count': course.total_lessons,
-        'total_exercises': total_exercises,
+        'lessons_count': stats.active_lessons,
+        'total_exercises': stats.exercise_lessons,
         'level': 'Beginner',
         'is_public': course.is_public,
     }
@@ -3610,25 +3140,10 @@ def guest_lesson_detail_by_slug(request, course_slug, lesson_slug):
     lesson = get_lesson_by_slug(course, lesson_slug)
     if not lesson:
         print(f"❌ Lesson not found by slug: {lesson_slug} in course {course_slug}")
-        # Try to find by ID as fallback
-        if lesson_slug.isdigit():
-            try:
-                lesson = Lesson.objects.get(
-                    course=course,
-                    id=int(lesson_slug),
-                    is_active=True
-                )
-                print(f"✅ Found lesson by ID fallback: {lesson.title}")
-            except Lesson.DoesNotExist:
-                return Response(
-                    {'detail': 'Lesson not found.'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-        else:
-            return Response(
-                {'detail': 'Lesson not found.'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        return Response(
+            {'detail': 'Lesson not found.'},
+            status=status.HTTP_404_NOT_FOUND
+        )
 
     print(f"✅ Lesson found: {lesson.title} (ID: {lesson.id})")
 
@@ -3671,7 +3186,7 @@ def guest_lesson_detail_by_slug(request, course_slug, lesson_slug):
     exercises = []
     if lesson.exercise:
         try:
-            exercises = parse_exercises_from_lesson(lesson.exercise)
+            exercises = compile_lesson(lesson).guest_exercises()
             print(f"✅ Parsed {len(exercises)} exercises for guest lesson {lesson.id}")
         except Exception as e:
             print(f"❌ Error parsing exercises for guest lesson {lesson.id}: {e}")
@@ -3823,7 +3338,7 @@ def guest_course_lessons(request, course_code):
             )
 
             # ✅ Generate slug for frontend navigation
-            lesson_slug = generate_slug(lesson.title)
+            lesson_slug = lesson.slug or generate_slug(lesson.title)
 
             lesson_data.append({
                 'id': lesson.id,
@@ -3858,191 +3373,10 @@ def guest_course_lessons(request, course_code):
 
 def parse_exercises_from_lesson(exercise_data):
     """
-    Convert the database exercise format to frontend expected format
-    Database format: Dict with keys 'paragraph', 'fill_blank', 'multiple_choice'
-    Frontend format: Array of exercise objects with 'type', 'question', etc.
+    Convert the database exercise format to frontend expected format.
+    Prefer compile_lesson(lesson).guest_exercises(), which is cached.
     """
-    print(f"🔧 PARSING EXERCISE DATA: Type={type(exercise_data)}")
-
-    if not exercise_data:
-        print("❌ No exercise data provided")
-        return []
-
-    exercises = []
-    exercise_id_counter = 1
-
-    try:
-        # CASE 1: Already a list (already converted)
-        if isinstance(exercise_data, list):
-            print(f"✅ Exercise data is already a list with {len(exercise_data)} items")
-            return exercise_data
-
-        # CASE 2: Dictionary with exercise types as keys (YOUR DATABASE FORMAT)
-        elif isinstance(exercise_data, dict):
-            print(f"📊 Processing dictionary with keys: {list(exercise_data.keys())}")
-
-            # Process paragraph exercise
-            if 'paragraph' in exercise_data:
-                paragraph_data = exercise_data['paragraph']
-                print(f"📝 Found paragraph exercise: {paragraph_data.get('prompt', '')[:50]}...")
-
-                exercises.append({
-                    'id': exercise_id_counter,
-                    'type': 'paragraph',
-                    'question': paragraph_data.get('prompt', 'Write about what you learned.'),
-                    'word_count': paragraph_data.get('word_count', {'min': 50, 'max': 300}),
-                    'explanation': paragraph_data.get('guidelines', '')
-                })
-                exercise_id_counter += 1
-
-            # Process fill_blank exercise
-            if 'fill_blank' in exercise_data:
-                fill_data = exercise_data['fill_blank']
-                print(f"📝 Found fill_blank exercise: {fill_data.get('text', '')[:50]}...")
-
-                # Extract the blank from text (text like "The number drie represents __________.")
-                text = fill_data.get('text', '')
-                question = text
-                correct_answer = fill_data.get('answers', [''])[0] if fill_data.get('answers') else ''
-
-                exercises.append({
-                    'id': exercise_id_counter,
-                    'type': 'fill-blank',  # Frontend expects 'fill-blank' with hyphen
-                    'question': question,
-                    'correct': correct_answer,
-                    'explanation': fill_data.get('explanation', '')
-                })
-                exercise_id_counter += 1
-
-            # Process multiple_choice exercise
-            if 'multiple_choice' in exercise_data:
-                mc_data = exercise_data['multiple_choice']
-                print(f"📝 Found multiple_choice exercise: {mc_data.get('question', '')[:50]}...")
-
-                exercises.append({
-                    'id': exercise_id_counter,
-                    'type': 'multiple-choice',
-                    'question': mc_data.get('question', 'Choose the correct answer.'),
-                    'options': mc_data.get('options', ['Option A', 'Option B', 'Option C', 'Option D']),
-                    'correct': mc_data.get('correct_answer', 0),  # 0-based index for frontend
-                    'explanation': mc_data.get('explanation', '')
-                })
-                exercise_id_counter += 1
-
-            # Process true_false if it exists
-            if 'true_false' in exercise_data:
-                tf_data = exercise_data['true_false']
-                question = tf_data.get('question', 'True or False?')
-                correct = tf_data.get('correct', True)
-
-                exercises.append({
-                    'id': exercise_id_counter,
-                    'type': 'true-false',
-                    'question': question,
-                    'options': ['True', 'False'],
-                    'correct': 0 if correct else 1,  # 0 for True, 1 for False
-                    'explanation': tf_data.get('explanation', '')
-                })
-                exercise_id_counter += 1
-
-            print(f"✅ Converted {len(exercises)} exercises from dictionary format")
-            return exercises
-
-        # CASE 3: String that might be JSON
-        elif isinstance(exercise_data, str):
-            try:
-                # Try to parse as JSON
-                parsed = json.loads(exercise_data)
-                # Recursively parse
-                return parse_exercises_from_lesson(parsed)
-            except json.JSONDecodeError:
-                print(f"❌ Could not parse string as JSON")
-                return []
-
-        else:
-            print(f"⚠️ Unknown exercise data type: {type(exercise_data)}")
-            return []
-
-    except Exception as e:
-        print(f"❌ Error parsing exercises: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return []
-
-def format_exercise_by_type(ex_data, ex_type, index):
-    """Format exercise based on type"""
-    exercise = {
-        'id': str(ex_data.get('id', f'question_{index}')),
-        'type': ex_type.replace('_', '-'),
-        'explanation': ex_data.get('explanation', ''),
-    }
-
-    if ex_type == 'multiple_choice':
-        exercise['question'] = ex_data.get('question', '')
-        exercise['options'] = ex_data.get('options', [])
-        exercise['correct'] = ex_data.get('correct_answer', ex_data.get('correct', 0))
-
-    elif ex_type == 'fill_blank':
-        exercise['question'] = ex_data.get('text', ex_data.get('question', ''))
-        exercise['options'] = []
-
-        if 'answers' in ex_data and ex_data['answers']:
-            exercise['correct'] = ex_data['answers'][0]
-        elif 'answer' in ex_data:
-            exercise['correct'] = ex_data['answer']
-        else:
-            exercise['correct'] = ''
-
-    elif ex_type == 'true_false':
-        exercise['question'] = ex_data.get('question', '')
-        exercise['options'] = ['True', 'False']
-        correct_val = ex_data.get('correct_answer', True)
-        exercise['correct'] = 0 if correct_val else 1
-
-    elif ex_type == 'paragraph':
-        exercise['question'] = ex_data.get('prompt', ex_data.get('question', ''))
-        exercise['options'] = []
-        exercise['correct'] = None
-        exercise['word_count'] = {
-            'min': ex_data.get('word_count', {}).get('min', 1),
-            'max': 3000
-        }
-
-    return exercise
-
-def format_exercise(ex, index):
-    """Format individual exercise when exercises are in a list"""
-    if not isinstance(ex, dict):
-        return None
-
-    exercise_type = ex.get('type', 'multiple-choice')
-
-    if exercise_type in ['fill-blank', 'fill_blank']:
-        question_text = ex.get('text', ex.get('question', ''))
-        if 'answers' in ex and ex['answers']:
-            correct_answer = ex['answers'][0]
-        elif 'answer' in ex:
-            correct_answer = ex['answer']
-        else:
-            correct_answer = ''
-
-    elif exercise_type == 'paragraph':
-        question_text = ex.get('prompt', ex.get('question', ''))
-        correct_answer = None
-
-    else:
-        question_text = ex.get('question', ex.get('prompt', ''))
-        correct_answer = ex.get('correct', ex.get('correct_answer', 0))
-
-    return {
-        'id': str(ex.get('id', f'question_{index}')),
-        'type': exercise_type,
-        'question': question_text,
-        'options': ex.get('options', []),
-        'correct': correct_answer,
-        'explanation': ex.get('explanation', ''),
-        'word_count': ex.get('word_count', {'min': 1, 'max': 3000}) if exercise_type == 'paragraph' else None
-    }
+    return compile_exercise(exercise_data).guest_exercises()
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -4107,7 +3441,7 @@ def student_lesson_detail(request, lesson_id):
         exercises = []
         if lesson.exercise:
             try:
-                exercises = parse_exercises_from_lesson(lesson.exercise)
+                exercises = compile_lesson(lesson).guest_exercises()
                 print(f"Parsed {len(exercises)} exercises")
             except Exception as e:
                 print(f"Error parsing exercises for lesson {lesson_id}: {e}")
@@ -4342,7 +3676,7 @@ def public_courses_list(request):
         courses = Course.objects.filter(
             is_active=True,
             is_public=True
-        ).select_related('teacher__user')[:12]
+        ).select_related('teacher__user', 'content_stats')[:12]
 
         course_data = []
         for course in courses:
@@ -4354,7 +3688,7 @@ def public_courses_list(request):
                 'duration': course.duration,
                 'category': course.display_category,  # Use display_category instead of level
                 'price': getattr(course, 'price', 0),
-                'lessons_count': course.lessons.filter(is_active=True).count(),
+                'lessons_count': CourseContentStats.for_course(course).active_lessons,
                 'is_popular': getattr(course, 'is_popular', False),
                 'is_new': getattr(course, 'is_new', False),
                 'teacher_name': course.teacher_name,
@@ -4395,7 +3729,7 @@ def debug_guest_courses(request):
             'duration': course.duration,
             'price': float(course.price),
             'is_active': course.is_active,
-            'lessons_count': course.lessons.filter(is_active=True).count(),
+            'lessons_count': CourseContentStats.for_course(course).active_lessons,
             'teacher': str(course.teacher) if course.teacher else None,
             'has_level': hasattr(course, 'level'),
             'level_value': getattr(course, 'level', 'NOT_SET'),
@@ -4575,123 +3909,18 @@ def student_certificates_list(request):
 
     try:
         # Get all active courses from the database
-        all_courses = Course.objects.filter(is_active=True).order_by('title')
-
-        print(f"🔍 Loading certificates data from {all_courses.count()} real courses")
+        all_courses = list(Course.objects.filter(is_active=True).select_related(
+            'teacher__user'
+        ).order_by('title'))
 
-        certificates_data = []
-
-        for course in all_courses:
-            try:
-                # For all users, get basic course info
-                course_data = {
-                    'id': course.id,
-                    'course_title': course.title,
-                    'course_code': course.code,
-                    'category': course.category,
-                    'teacher_name': course.teacher_name,
-                    'total_lessons': course.lessons.filter(is_active=True).count(),
-                    'description': course.description,
-                }
-
-                # For authenticated users, add progress and completion status
-                if user.is_authenticated:
-                    # Calculate progress for this course
-                    total_lessons = Lesson.objects.filter(course=course, is_active=True).count()
-                    completed_lessons = StudentExercise.objects.filter(
-                        student=user,
-                        lesson__course=course,
-                        completed=True
-                    ).count()
-
-                    progress = round((completed_lessons / total_lessons) * 100, 1) if total_lessons > 0 else 0
-                    is_completed = progress >= 100
-
-                    # Check if user is enrolled
-                    is_enrolled = Enrollment.objects.filter(
-                        student=user,
-                        course=course,
-                        status__in=['approved', 'completed']
-                    ).exists()
-
-                    # Check if certificate exists in database
-                    certificate_exists = False
-                    existing_certificate = None
-
-                    try:
-                        existing_certificate = Certificate.objects.filter(
-                            user=user,
-                            course=course,
-                            is_active=True
-                        ).first()
-                        certificate_exists = existing_certificate is not None
-                    except Exception as cert_error:
-                        print(f"⚠️ Certificate query error for course {course.code}: {cert_error}")
-                        certificate_exists = False
-
-                    if certificate_exists and existing_certificate:
-                        # Use real certificate data
-                        certificate_data = {
-                            **course_data,
-                            'certificate_id': str(existing_certificate.certificate_id),
-                            'issue_date': existing_certificate.issued_date.strftime('%B %d, %Y'),
-                            'formatted_grade': f"{existing_certificate.grade}%",
-                            'download_url': existing_certificate.download_url,
-                            'is_valid': existing_certificate.is_valid,
-                            'accessible': existing_certificate.is_valid,
-                            'message': 'Certificate available for download' if existing_certificate.is_valid else 'Complete the course to access this certificate',
-                            'progress': progress,
-                            'is_enrolled': is_enrolled,
-                            'is_real_certificate': True
-                        }
-                    else:
-                        # Create certificate data based on course progress
-                        certificate_data = {
-                            **course_data,
-                            'certificate_id': f'course-{course.code}-{user.id}',
-                            'issue_date': 'In Progress' if not is_completed else timezone.now().strftime('%B %d, %Y'),
-                            'formatted_grade': f'{progress}%',
-                            'download_url': f'/api/student/courses/{course.code}/generate-certificate/' if is_completed else None,
-                            'is_valid': is_completed,
-                            'accessible': is_completed and is_enrolled,
-                            'message': 'Course completed! Click to generate certificate.' if is_completed else
-                                      f'Progress: {progress}% - Complete all lessons to earn certificate' if is_enrolled else
-                                      'Enroll in this course to earn a certificate',
-                            'progress': progress,
-                            'is_enrolled': is_enrolled,
-                            'is_real_certificate': False
-                        }
-
-                else:
-                    # For guests, show course with signup prompt
-                    certificate_data = {
-                        **course_data,
-                        'certificate_id': f'guest-{course.code}',
-                        'issue_date': 'Available upon completion',
-                        'formatted_grade': '0%',
-                        'download_url': None,
-                        'is_valid': False,
-                        'accessible': False,
-                        'message': 'Sign up and complete this course to earn a certificate',
-                        'progress': 0,
-                        'is_enrolled': False,
-                        'is_real_certificate': False
-                    }
-
-                certificates_data.append(certificate_data)
-                print(f"✅ Added certificate data for course: {course.title}")
-
-            except Exception as course_error:
-                print(f"❌ Error processing course {course.code}: {course_error}")
-                continue
-
-        print(f"🎓 Final certificates data: {len(certificates_data)} items for user: {user.email if user.is_authenticated else 'guest'}")
+        # Progress, enrollments and certificates of every course in a few grouped queries
+        certificates_data = overview_entries(user, all_courses)
 
         return Response({
             'certificates': certificates_data,
             'total_certificates': len(certificates_data),
             'user_type': 'authenticated' if user.is_authenticated else 'guest',
-            'total_courses': all_courses.count()
+            'total_courses': len(all_courses)
         })
 
     except Exception as e:
@@ -4704,76 +3933,50 @@ def student_certificates_list(request):
             'certificates': [],
             'total_certificates': 0
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+CERTIFICATE_RETRY_AFTER = 5  # seconds a client waits before asking for a PDF still being rendered
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])  # Only authenticated users
 def download_certificate(request, certificate_id):
     """
-    ✅ Download certificate - ONLY for authenticated users with completed courses
+    ✅ Download certificate PDF - ONLY for authenticated users with completed courses
+    The PDF is rendered in the background; until it exists this answers 202
+    and the client retries. Finished files are streamed with an ETag, so
+    repeat downloads are answered with 304.
     """
-    user = request.user
-
-    try:
-        # Check if it's a sample certificate ID
-        if certificate_id.startswith('sample-'):
-            course_code = certificate_id.replace('sample-', '')
-            course = get_object_or_404(Course, code=course_code, is_active=True)
-
-            # Check if course is completed
-            total_lessons = Lesson.objects.filter(course=course, is_active=True).count()
-            completed_lessons = StudentExercise.objects.filter(
-                student=user,
-                lesson__course=course,
-                completed=True
-            ).count()
-
-            if completed_lessons < total_lessons:
-                return Response(
-                    {'detail': 'Course not completed. Cannot generate certificate.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-
-            # Generate certificate on the fly
-            return Response({
-                'detail': 'Certificate generated successfully!',
-                'download_url': f'/api/student/courses/{course_code}/generate-certificate/',
-                'course_title': course.title,
-                'issued_date': timezone.now().strftime('%B %d, %Y'),
-                'message': 'This is a preview. In production, a PDF would be generated.'
-            })
+    certificate = get_object_or_404(
+        Certificate.objects.select_related('user', 'course__teacher__user'),
+        certificate_id=certificate_id,
+        user=request.user,
+        is_active=True
+    )
 
-        # Handle real certificate from database
-        certificate = get_object_or_404(
-            Certificate,
-            certificate_id=certificate_id,
-            user=user,
-            is_active=True
+    if not certificate.is_valid:
+        return Response(
+            {'detail': 'Certificate not available. Course not completed.'},
+            status=status.HTTP_403_FORBIDDEN
         )
 
-        if not certificate.is_valid:
-            return Response(
-                {'detail': 'Certificate not available. Course not completed.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-
-        return Response({
-            'detail': 'Certificate download started!',
-            'download_url': certificate.download_url or certificate.generate_certificate(),
+    path = current_pdf(certificate)
+    if path is None:
+        certificate.generate_certificate()
+        response = Response({
+            'detail': 'Certificate is being prepared. Try again shortly.',
             'certificate_id': str(certificate.certificate_id),
             'course_title': certificate.course.title,
             'issued_date': certificate.issued_date.strftime('%B %d, %Y')
-        })
+        }, status=status.HTTP_202_ACCEPTED)
+        response['Retry-After'] = str(CERTIFICATE_RETRY_AFTER)
+        return response
 
-    except Certificate.DoesNotExist:
-        return Response(
-            {'detail': 'Certificate not found.'},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    except Exception as e:
-        print(f"❌ Certificate download error: {e}")
-        return Response(
-            {'detail': 'Failed to download certificate.'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+    # The file name is the certificate and content hash, a strong validator
+    response = stream_file(request, path, 'application/pdf',
+                           etag=os.path.splitext(os.path.basename(path))[0],
+                           cache='private, no-cache')
+    response['Content-Disposition'] = f'attachment; filename="certificate-{certificate.course.code}.pdf"'
+    return response
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])  # Only authenticated users
@@ -4789,12 +3992,8 @@ def view_certificate(request, certificate_id):
             course = get_object_or_404(Course, code=course_code, is_active=True)
 
             # Check if course is completed
-            total_lessons = Lesson.objects.filter(course=course, is_active=True).count()
-            completed_lessons = StudentExercise.objects.filter(
-                student=user,
-                lesson__course=course,
-                completed=True
-            ).count()
+            total_lessons = CourseContentStats.for_course(course).active_lessons
+            completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
 
             if completed_lessons < total_lessons:
                 return Response(
@@ -4867,12 +4066,8 @@ def generate_certificate(request, course_code):
             )
 
         # Check if all lessons are completed
-        total_lessons = Lesson.objects.filter(course=course, is_active=True).count()
-        completed_lessons = StudentExercise.objects.filter(
-            student=user,
-            lesson__course=course,
-            completed=True
-        ).count()
+        total_lessons = CourseContentStats.for_course(course).active_lessons
+        completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
 
         if completed_lessons < total_lessons:
             return Response(
@@ -4904,12 +4099,10 @@ def generate_certificate(request, course_code):
 
         if not created:
             certificate.grade = average_grade
-            certificate.save()
 
-        # Generate download URL
-        if not certificate.download_url:
-            certificate.download_url = certificate.generate_certificate()
-            certificate.save()
+        # Queue the PDF render; a changed grade queues a new version
+        certificate.download_url = certificate.generate_certificate()
+        certificate.save()
 
         serializer = CertificateSerializer(certificate)
 
@@ -4952,12 +4145,8 @@ def check_certificate_eligibility(request, course_code):
             })
 
         # Calculate progress
-        total_lessons = Lesson.objects.filter(course=course, is_active=True).count()
-        completed_lessons = StudentExercise.objects.filter(
-            student=user,
-            lesson__course=course,
-            completed=True
-        ).count()
+        total_lessons = CourseContentStats.for_course(course).active_lessons
+        completed_lessons = CourseProgress.for_student(user.id, course.id).completed_lessons
 
         progress = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
 
@@ -4985,6 +4174,27 @@ def check_certificate_eligibility(request, course_code):
             'reason': 'Error checking eligibility'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _load_search_hits(hits, public_only=False):
+    """
+    Load the objects behind ranked search hits with one query per type.
+    Visibility is re-checked here so rows changed by bulk updates never leak.
+    """
+    course_ids = [hit.object_id for hit in hits if hit.doc_type == SearchDocument.COURSE]
+    lesson_ids = [hit.object_id for hit in hits if hit.doc_type != SearchDocument.COURSE]
+
+    course_filter = Q(id__in=course_ids, is_active=True)
+    lesson_filter = Q(id__in=lesson_ids, is_active=True)
+    if public_only:
+        course_filter &= Q(is_public=True)
+        lesson_filter &= Q(course__is_public=True)
+
+    courses = Course.objects.filter(course_filter).select_related('teacher__user').in_bulk() if course_ids else {}
+    lessons = Lesson.objects.filter(lesson_filter).select_related(
+        'course', 'course__teacher__user'
+    ).in_bulk() if lesson_ids else {}
+    return courses, lessons
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def search_content(request):
@@ -4992,6 +4202,7 @@ def search_content(request):
     Search across all content for authenticated users.
     ✅ FIXED: Lessons now include enrollment_status, course_code, course_title,
               and slug so the frontend can gate access correctly.
+    Results come from the inverted index in search.py, ranked within each type.
     """
     query = request.GET.get('q', '').strip()
     if not query:
@@ -5001,118 +4212,74 @@ def search_content(request):
     results = []
 
     try:
-        # ── Courses ──────────────────────────────────────────────────────────
-        courses = Course.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(code__icontains=query),
-            is_active=True
-        ).distinct()
-
-        for course in courses:
-            enrollment = Enrollment.objects.filter(
-                student=user,
-                course=course
-            ).first()
-
-            enrollment_status = enrollment.status if enrollment else 'not_enrolled'
-
-            results.append({
-                'type':              'course',
-                'id':                course.id,
-                'title':             course.title,
-                'description':       course.description,
-                'code':              course.code,
-                'category':          course.display_category,
-                'level':             'beginner',
-                'duration':          f"{course.duration} weeks" if course.duration else '',
-                'enrollment_status': enrollment_status,
-                'requires_auth':     True,
-                'allow_preview':     True,
-                'is_new':            course.safe_is_new,
-                'is_popular':        course.safe_is_popular,
-                'teacher_name':      course.teacher_name,
-            })
-
-        # ── Lessons ───────────────────────────────────────────────────────────
-        lessons = Lesson.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(content__icontains=query),
-            is_active=True
-        ).select_related('course').distinct()
-
-        for lesson in lessons:
-            # Check whether the student is enrolled in this lesson's course
-            enrollment = Enrollment.objects.filter(
-                student=user,
-                course=lesson.course,
-                status__in=['approved', 'completed', 'enrolled']
-            ).first()
+        hits = search_index(query)
+        courses, lessons = _load_search_hits(hits)
 
-            enrollment_status = enrollment.status if enrollment else 'not_enrolled'
-
-            # Generate slug the same way the frontend does
-            lesson_slug = generate_slug(lesson.title)
+        # One enrollment lookup for every course in the results
+        course_ids = set(courses) | {lesson.course_id for lesson in lessons.values()}
+        enrollment_statuses = dict(
+            Enrollment.objects.filter(student=user, course_id__in=course_ids).values_list('course_id', 'status')
+        )
 
-            results.append({
-                'type':              'lesson',
-                'id':                lesson.id,
-                'title':             lesson.title,
-                'description':       lesson.description,
-                'content':           lesson.content,
-                'slug':              lesson_slug,          # ✅ slug for URL building
-                'duration':          f"{lesson.duration} min" if lesson.duration else '',
-                'course_id':         lesson.course.id,
-                'course_title':      lesson.course.title,  # ✅ shown in meta tag
-                'course_code':       lesson.course.code,   # ✅ used for enrollment check
-                'code':              lesson.course.code,   # keep for backwards compat
-                'category':          lesson.course.display_category,
-                'level':             'beginner',
-                'enrollment_status': enrollment_status,    # ✅ drives Enroll vs View button
-                'requires_auth':     True,
-                'allow_preview':     True,
-                'order':             lesson.order,
-            })
+        def lesson_enrollment_status(course_id):
+            enrollment_status = enrollment_statuses.get(course_id)
+            return enrollment_status if enrollment_status in ENROLLED_STATUSES else 'not_enrolled'
 
-        # ── Exercises (via lessons) ───────────────────────────────────────────
-        exercise_lessons = Lesson.objects.filter(
-            Q(exercise__icontains=query),
-            is_active=True
-        ).select_related('course').distinct()
+        course_results, lesson_results, exercise_results = [], [], []
 
-        for lesson in exercise_lessons:
-            if not lesson.exercise:
-                continue
-
-            try:
-                exercise_data = lesson.exercise
-                has_matching_question = False
-
-                if isinstance(exercise_data, dict):
-                    questions = exercise_data.get('questions', [])
-                    for question in questions:
-                        q_text = ' '.join([
-                            str(question.get('question', '')),
-                            str(question.get('text', '')),
-                            str(question.get('prompt', '')),
-                        ])
-                        if query.lower() in q_text.lower():
-                            has_matching_question = True
-                            break
-
-                if not has_matching_question:
+        for hit in hits:
+            # ── Courses ──────────────────────────────────────────────────────
+            if hit.doc_type == SearchDocument.COURSE:
+                course = courses.get(hit.object_id)
+                if course is None:
                     continue
+                course_results.append({
+                    'type':              'course',
+                    'id':                course.id,
+                    'title':             course.title,
+                    'description':       course.description,
+                    'code':              course.code,
+                    'category':          course.display_category,
+                    'level':             'beginner',
+                    'duration':          f"{course.duration} weeks" if course.duration else '',
+                    'enrollment_status': enrollment_statuses.get(course.id, 'not_enrolled'),
+                    'requires_auth':     True,
+                    'allow_preview':     True,
+                    'is_new':            course.safe_is_new,
+                    'is_popular':        course.safe_is_popular,
+                    'teacher_name':      course.teacher_name,
+                })
+                continue
 
-                enrollment = Enrollment.objects.filter(
-                    student=user,
-                    course=lesson.course,
-                    status__in=['approved', 'completed', 'enrolled']
-                ).first()
+            lesson = lessons.get(hit.object_id)
+            if lesson is None:
+                continue
 
-                enrollment_status = enrollment.status if enrollment else 'not_enrolled'
+            # ── Lessons ──────────────────────────────────────────────────────
+            if hit.doc_type == SearchDocument.LESSON:
+                lesson_results.append({
+                    'type':              'lesson',
+                    'id':                lesson.id,
+                    'title':             lesson.title,
+                    'description':       lesson.description,
+                    'content':           lesson.content,
+                    'slug':              lesson.slug or generate_slug(lesson.title),  # ✅ slug for URL building
+                    'duration':          f"{lesson.duration} min" if lesson.duration else '',
+                    'course_id':         lesson.course.id,
+                    'course_title':      lesson.course.title,  # ✅ shown in meta tag
+                    'course_code':       lesson.course.code,   # ✅ used for enrollment check
+                    'code':              lesson.course.code,   # keep for backwards compat
+                    'category':          lesson.course.display_category,
+                    'level':             'beginner',
+                    'enrollment_status': lesson_enrollment_status(lesson.course_id),  # ✅ drives Enroll vs View button
+                    'requires_auth':     True,
+                    'allow_preview':     True,
+                    'order':             lesson.order,
+                })
 
-                results.append({
+            # ── Exercises (via lessons) ──────────────────────────────────────
+            else:
+                exercise_results.append({
                     'type':              'exercise',
                     'id':                f"exercise_{lesson.id}",
                     'title':             f"Exercise: {lesson.title}",
@@ -5122,15 +4289,13 @@ def search_content(request):
                     'code':              lesson.course.code,
                     'category':          lesson.course.display_category,
                     'level':             'beginner',
-                    'enrollment_status': enrollment_status,
+                    'enrollment_status': lesson_enrollment_status(lesson.course_id),
                     'requires_auth':     True,
                     'allow_preview':     True,
                     'lesson_id':         lesson.id,
                 })
-            except Exception as e:
-                print(f"Error processing exercise for lesson {lesson.id}: {e}")
-                continue
 
+        results = course_results + lesson_results + exercise_results
         return Response({'results': results})
 
     except Exception as e:
@@ -5154,16 +4319,18 @@ def search_public_content(request):
     results = []
 
     try:
-        # ── Public courses ────────────────────────────────────────────────────
-        courses = Course.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(code__icontains=query),
-            is_active=True,
-            is_public=True
-        ).distinct()
+        hits = search_index(
+            query,
+            doc_types=[SearchDocument.COURSE, SearchDocument.LESSON],
+            public_only=True
+        )
+        courses, lessons = _load_search_hits(hits, public_only=True)
 
-        for course in courses:
+        # ── Public courses ────────────────────────────────────────────────────
+        for hit in hits:
+            course = courses.get(hit.object_id) if hit.doc_type == SearchDocument.COURSE else None
+            if course is None:
+                continue
             results.append({
                 'type':              'course',
                 'id':                course.id,
@@ -5182,22 +4349,17 @@ def search_public_content(request):
             })
 
         # ── Public lessons ────────────────────────────────────────────────────
-        lessons = Lesson.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query),
-            is_active=True,
-            course__is_public=True
-        ).select_related('course').distinct()[:10]  # sensible guest limit
-
-        for lesson in lessons:
-            lesson_slug = generate_slug(lesson.title)
-
+        lesson_hits = [
+            lessons[hit.object_id] for hit in hits
+            if hit.doc_type == SearchDocument.LESSON and hit.object_id in lessons
+        ]
+        for lesson in lesson_hits[:10]:  # sensible guest limit
             results.append({
                 'type':              'lesson',
                 'id':                lesson.id,
                 'title':             lesson.title,
                 'description':       lesson.description,
-                'slug':              lesson_slug,       # ✅ slug for URL building
+                'slug':              lesson.slug or generate_slug(lesson.title),  # ✅ slug for URL building
                 'duration':          f"{lesson.duration} min" if lesson.duration else '',
                 'course_id':         lesson.course.id,
                 'course_title':      lesson.course.title,
@@ -5230,50 +4392,9 @@ def search_suggestions(request):
     if not query or len(query) < 2:
         return Response({'suggestions': []})
 
-    suggestions = []
-
     try:
-        # Course title suggestions
-        course_suggestions = Course.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query),
-            is_active=True
-        ).values('title', 'code')[:5]
-
-        for course in course_suggestions:
-            suggestions.append({
-                'type': 'course',
-                'title': course['title'],
-                'code': course['code'],
-                'display': course['title']
-            })
-
-        # Lesson title suggestions
-        lesson_suggestions = Lesson.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query),
-            is_active=True
-        ).select_related('course').values('title', 'course__title')[:5]
-
-        for lesson in lesson_suggestions:
-            suggestions.append({
-                'type': 'lesson',
-                'title': lesson['title'],
-                'course_title': lesson['course__title'],
-                'display': f"{lesson['title']} - {lesson['course__title']}"
-            })
-
-        # Category suggestions
-        categories = [cat[0] for cat in Course.CATEGORY_CHOICES]
-        category_suggestions = [cat for cat in categories if query in cat.lower()]
-
-        for category in category_suggestions[:3]:
-            suggestions.append({
-                'type': 'category',
-                'title': category,
-                'display': f"Category: {category}"
-            })
-
+        # Served from the in-process prefix index; no database access once it is warm
+        suggestions = suggest(query)
         return Response({'suggestions': suggestions})
 
     except Exception as e:
@@ -5281,16 +4402,31 @@ def search_suggestions(request):
         return Response({'suggestions': []})
 
 
+class CommentCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id) so deep pages cost the same as the first"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class ReplyCursorPagination(CommentCursorPagination):
+    ordering = ('created_at', 'id')
+
+
 class CommentListView(generics.ListAPIView):
-    """Get comments with pagination and filtering"""
+    """
+    Get one page of comments, newest first, optionally for one course.
+    Replies are not embedded; each comment carries reply_count and its
+    replies are paged through CommentReplyListView.
+    """
     serializer_class = CommentSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = CommentCursorPagination
 
     def get_queryset(self):
         queryset = Comment.objects.filter(is_active=True).select_related(
             'user', 'course'
-        ).prefetch_related(
-            'replies', 'reactions'
         ).order_by('-created_at')
 
         # Filter by course if provided
@@ -5305,6 +4441,48 @@ class CommentListView(generics.ListAPIView):
         context['request'] = self.request
         return context
 
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            # Reply counts and own reactions of the whole page in a fixed number of queries
+            comments = list(args[0])
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['comment_threads'] = CommentThreads.counts_only(comments, self.request)
+            context['lazy_replies'] = True
+            return super().get_serializer(comments, *args[1:], **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+
+class CommentReplyListView(generics.ListAPIView):
+    """
+    Get one page of a comment's replies, oldest first. Top-level replies by
+    default; ?parent=<reply id> lists the replies to that reply.
+    """
+    serializer_class = ReplySerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = ReplyCursorPagination
+
+    def get_queryset(self):
+        comment = get_object_or_404(Comment, pk=self.kwargs['comment_id'], is_active=True)
+        replies = Reply.objects.filter(comment=comment).select_related('user')
+
+        parent = self.request.query_params.get('parent')
+        if parent:
+            if not parent.isdigit():
+                raise serializers.ValidationError({'parent': 'Must be a reply id.'})
+            return replies.filter(parent_reply_id=parent)
+        return replies.filter(parent_reply__isnull=True)
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args:
+            replies = list(args[0])
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['comment_threads'] = CommentThreads.for_reply_page(
+                self.kwargs['comment_id'], replies, self.request
+            )
+            context['lazy_replies'] = True
+            return super().get_serializer(replies, *args[1:], **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
 class CommentCreateView(generics.CreateAPIView):
     """Create a new comment"""
     queryset = Comment.objects.all()
@@ -5402,51 +4580,7 @@ def toggle_comment_reaction(request, comment_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if user already has a reaction
-        existing_reaction = CommentReaction.objects.filter(
-            user=request.user,
-            comment=comment
-        ).first()
-
-        if existing_reaction:
-            if existing_reaction.reaction_type == reaction_type:
-                # Remove reaction if clicking the same button
-                existing_reaction.delete()
-
-                # Update counts
-                if reaction_type == 'like':
-                    comment.likes = max(0, comment.likes - 1)
-                else:
-                    comment.dislikes = max(0, comment.dislikes - 1)
-                comment.save()
-            else:
-                # Switch reaction type
-                old_type = existing_reaction.reaction_type
-                existing_reaction.reaction_type = reaction_type
-                existing_reaction.save()
-
-                # Update counts
-                if old_type == 'like':
-                    comment.likes = max(0, comment.likes - 1)
-                    comment.dislikes += 1
-                else:
-                    comment.dislikes = max(0, comment.dislikes - 1)
-                    comment.likes += 1
-                comment.save()
-        else:
-            # Create new reaction
-            CommentReaction.objects.create(
-                user=request.user,
-                comment=comment,
-                reaction_type=reaction_type
-            )
-
-            # Update counts
-            if reaction_type == 'like':
-                comment.likes += 1
-            else:
-                comment.dislikes += 1
-            comment.save()
+        toggle_reaction(comment, request.user, reaction_type)
 
         # Return updated comment
         serializer = CommentSerializer(comment, context={'request': request})
@@ -5484,12 +4618,15 @@ def comment_stats(request):
 @permission_classes([permissions.IsAuthenticated])
 def user_comments(request):
     """Get comments by the current user"""
-    comments = Comment.objects.filter(
+    comments = list(Comment.objects.filter(
         user=request.user,
         is_active=True
-    ).select_related('course').order_by('-created_at')
+    ).select_related('user', 'course').order_by('-created_at'))
 
-    serializer = CommentSerializer(comments, many=True, context={'request': request})
+    serializer = CommentSerializer(comments, many=True, context={
+        'request': request,
+        'comment_threads': CommentThreads.for_comments(comments, request),
+    })
     return Response(serializer.data)
 
 class CommentDeleteView(generics.DestroyAPIView):
@@ -5622,33 +4759,14 @@ def toggle_reply_reaction(request, reply_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if user already has a reaction
-        existing_reaction = ReplyReaction.objects.filter(
-            user=request.user,
-            reply=reply
-        ).first()
-
-        if existing_reaction:
-            if existing_reaction.reaction_type == reaction_type:
-                # Remove reaction if clicking the same button
-                existing_reaction.delete()
-                response_detail = f'Removed {reaction_type} from reply'
-            else:
-                # Switch reaction type
-                existing_reaction.reaction_type = reaction_type
-                existing_reaction.save()
-                response_detail = f'Changed reaction to {reaction_type}'
-        else:
-            # Create new reaction
-            ReplyReaction.objects.create(
-                user=request.user,
-                reply=reply,
-                reaction_type=reaction_type
-            )
-            response_detail = f'Added {reaction_type} to reply'
+        action = toggle_reaction(reply, request.user, reaction_type)
+        response_detail = {
+            'added': f'Added {reaction_type} to reply',
+            'removed': f'Removed {reaction_type} from reply',
+            'changed': f'Changed reaction to {reaction_type}',
+        }[action]
 
         # Return updated reply with fresh data
-        reply.refresh_from_db()
         serializer = ReplySerializer(reply, context={'request': request})
 
         return Response({
@@ -114,6 +114,8 @@ CORS_EXPOSE_HEADERS = [
     'Content-Range',
     'Content-Length',
     'Accept-Ranges',
+    'ETag',
+    'Last-Modified',
 ]
 
 # Video serving configuration
@@ -129,9 +131,28 @@ os.makedirs(os.path.join(MEDIA_ROOT, 'videos'), exist_ok=True)
 
 VIDEO_ROOT = os.path.join(MEDIA_ROOT, 'videos')
 os.makedirs(VIDEO_ROOT, exist_ok=True)
-# File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 500 * 1024 * 1024  # 500MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 500 * 1024 * 1024  # 500MB
+
+# How video bytes leave the server: '' streams from Django (sendfile through
+# wsgi.file_wrapper where available), 'x-accel-redirect' hands the file to nginx
+# via an internal location, 'x-sendfile' to Apache/lighttpd
+VIDEO_SERVE_MODE = ''
+VIDEO_ACCEL_REDIRECT_PREFIX = '/protected/videos/'
+
+# Rendered certificate PDFs (student_dashboard/certificate_pdf.py), one file per
+# certificate and template version, written by the render_certificates worker
+CERTIFICATE_ROOT = os.path.join(MEDIA_ROOT, 'certificates')
+os.makedirs(CERTIFICATE_ROOT, exist_ok=True)
+
+# File upload settings: larger uploads are spooled to disk instead of held in RAM
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5MB
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Resumable chunked video uploads (admin_dashboard/chunked_uploads.py)
+VIDEO_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'upload_chunks')
+os.makedirs(VIDEO_UPLOAD_TEMP_DIR, exist_ok=True)
+VIDEO_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB, suggested to clients
+VIDEO_UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024  # 16MB per request
+VIDEO_UPLOAD_EXPIRY_HOURS = 24  # Open uploads idle this long are aborted and their files deleted
 
 # Allowed file extensions for video uploads
 VIDEO_ALLOWED_EXTENSIONS = ['.mp4', '.webm', '.ogg', '.mov', '.avi']
@@ -204,6 +225,22 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Lock waits, e.g. concurrent answer submissions (see student_dashboard/grading.py)
+        "OPTIONS": {
+            "timeout": 20,
+        },
+    }
+}
+
+# Cache
+# Shared by every worker process on the host, so the version keys that
+# invalidate search suggestions and admin statistics reach all of them.
+# The default per-process LocMemCache would leave other workers stale.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache",
+        "TIMEOUT": 300,
     }
 }
 
@@ -1,65 +1,283 @@
-from django.http import StreamingHttpResponse, Http404, FileResponse
-from django.conf import settings
-import os
+# system_management/video_views.py
+"""
+Streaming of uploaded videos from VIDEO_ROOT (media/videos/), and of other
+media files through stream_file().
+
+Handles single and multi-range requests (206/416), conditional requests
+(ETag, Last-Modified, If-None-Match, If-Modified-Since, If-Range) and HEAD.
+Bodies are never read into memory: single ranges go out through FileResponse,
+so WSGI servers with wsgi.file_wrapper (gunicorn, uWSGI) use sendfile, and
+multi-range bodies are streamed in fixed-size blocks. With VIDEO_SERVE_MODE
+set to 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache, lighttpd) the
+transfer is handed to the front server entirely.
+"""
 import mimetypes
+import os
+import uuid
+from urllib.parse import quote
 
-def file_iterator(file_path, chunk_size=8192):
-    """Generator to read file in chunks"""
-    with open(file_path, 'rb') as f:
-        while True:
-            chunk = f.read(chunk_size)
-            if not chunk:
-                break
-            yield chunk
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
 
-def video_proxy(request, path):
-    """Serve video files with proper headers for streaming"""
-    video_path = os.path.join(settings.MEDIA_ROOT, 'videos', path)
 
-    if not os.path.exists(video_path):
-        raise Http404("Video not found")
+# Not in every platform's mime table
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+
+BLOCK_SIZE = 64 * 1024
+MAX_RANGES = 16  # more ranges than this is treated as abuse and answered with the whole file
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': 'http://localhost:5173',
+    'Access-Control-Allow-Methods': 'GET, HEAD, OPTIONS',
+    'Access-Control-Allow-Headers': 'Range, If-Range, If-None-Match, If-Modified-Since, Authorization',
+    'Access-Control-Expose-Headers': 'Content-Range, Content-Length, Accept-Ranges, ETag, Last-Modified',
+}
+
+
+def parse_range_header(range_header, file_size):
+    """
+    Parse a Range header into a sorted list of (start, end) byte offsets,
+    inclusive, with overlapping and adjacent ranges merged.
+
+    Returns None when the header should be ignored (malformed, not bytes,
+    too many ranges) and [] when no range can be satisfied.
+    """
+    units, _, range_set = range_header.partition('=')
+    if units.strip().lower() != 'bytes' or not range_set:
+        return None
 
-    # Get file stats
-    file_size = os.path.getsize(video_path)
-    content_type, _ = mimetypes.guess_type(video_path)
-    if not content_type:
-        content_type = 'video/mp4'
+    specs = [spec.strip() for spec in range_set.split(',') if spec.strip()]
+    if not specs or len(specs) > MAX_RANGES:
+        return None
 
-    # Handle Range requests for video seeking
-    range_header = request.META.get('HTTP_RANGE', '').strip()
+    ranges = []
+    for spec in specs:
+        first, dash, last = spec.partition('-')
+        if not dash:
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes
+                suffix = int(last)
+                if suffix <= 0:
+                    continue
+                start, end = max(file_size - suffix, 0), file_size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else file_size - 1
+                if last and end < start:
+                    return None
+                end = min(end, file_size - 1)
+        except ValueError:
+            return None
+        if start < file_size:
+            ranges.append((start, end))
 
-    if range_header:
-        # Parse range header
-        range_match = range_header.replace('bytes=', '').split('-')
-        start = int(range_match[0]) if range_match[0] else 0
-        end = int(range_match[1]) if len(range_match) > 1 and range_match[1] else file_size - 1
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
 
-        # Open file and seek to start position
-        with open(video_path, 'rb') as f:
+
+class RangeFile:
+    """
+    File-like view of one byte range. read() stops at the end of the range,
+    and fileno() exposes the descriptor (positioned at the range start) so
+    wsgi.file_wrapper implementations can sendfile Content-Length bytes.
+    """
+
+    def __init__(self, path, start, end):
+        self.file = open(path, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start + 1
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def multipart_body(path, ranges, boundary, content_type, file_size):
+    """Yield a multipart/byteranges body block by block"""
+    with open(path, 'rb') as f:
+        for start, end in ranges:
+            yield _part_header(boundary, content_type, start, end, file_size)
             f.seek(start)
-            chunk_size = end - start + 1
-            data = f.read(chunk_size)
-
-        response = StreamingHttpResponse(
-            iter([data]),
-            status=206,  # Partial Content
-            content_type=content_type
-        )
-        response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-        response['Content-Length'] = str(chunk_size)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(BLOCK_SIZE, remaining))
+                if not data:
+                    return
+                remaining -= len(data)
+                yield data
+    yield f'\r\n--{boundary}--\r\n'.encode()
+
+
+def _part_header(boundary, content_type, start, end, file_size):
+    return (f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n').encode()
+
+
+def _multipart_length(ranges, boundary, content_type, file_size):
+    length = len(f'\r\n--{boundary}--\r\n')
+    for start, end in ranges:
+        length += len(_part_header(boundary, content_type, start, end, file_size)) + end - start + 1
+    return length
+
+
+def resolve_video_path(path):
+    """Absolute path of a file under VIDEO_ROOT; raises Http404 for anything else"""
+    try:
+        file_path = safe_join(settings.VIDEO_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Video not found")
+    if not os.path.isfile(file_path):
+        raise Http404("Video not found")
+    return file_path
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        return '*' in candidates or etag in candidates
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def _range_allowed(request, etag, last_modified):
+    """If-Range: only honour Range when the client's copy is still current"""
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def cache_control(file_path):
+    """
+    HLS output lives in a fresh folder per packaging run and never changes,
+    so playlists and segments can be cached for good.
+    """
+    relative = os.path.relpath(file_path, settings.VIDEO_ROOT).replace(os.sep, '/')
+    if '/hls/' in f'/{relative}':
+        return 'public, max-age=31536000, immutable'
+    return 'public, max-age=3600'
+
+
+def _offload_response(file_path, content_type):
+    mode = getattr(settings, 'VIDEO_SERVE_MODE', '')
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        relative = os.path.relpath(file_path, settings.VIDEO_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.VIDEO_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(relative)
+    else:
+        response['X-Sendfile'] = file_path
+    return response
+
+
+def stream_video(request, file_path):
+    """Build the response for a GET or HEAD of a video file"""
+    content_type, _ = mimetypes.guess_type(file_path)
+    response = stream_file(request, file_path, content_type or 'video/mp4',
+                           cache=cache_control(file_path), offload=True)
+    for header, value in CORS_HEADERS.items():
+        response[header] = value
+    return response
+
+
+def stream_file(request, file_path, content_type, etag=None, cache='public, max-age=3600', offload=False):
+    """
+    Build the response for a GET or HEAD of any file, with range and
+    conditional request handling. The ETag defaults to one derived from the
+    size and modification time; pass one when the content has a better
+    identity. Only files under VIDEO_ROOT may be offloaded to the front server.
+    """
+    stat = os.stat(file_path)
+    file_size = stat.st_size
+    last_modified = stat.st_mtime
+    etag = quote_etag(etag or f'{file_size:x}-{stat.st_mtime_ns:x}')
+
+    if _not_modified(request, etag, last_modified):
+        response = HttpResponse(status=304)
+
+    elif offload and getattr(settings, 'VIDEO_SERVE_MODE', ''):
+        # The front server handles ranges itself
+        response = _offload_response(file_path, content_type)
+
     else:
-        # Full file response
-        response = FileResponse(
-            open(video_path, 'rb'),
-            content_type=content_type
-        )
-        response['Content-Length'] = str(file_size)
-
-    # Essential headers for video streaming
+        range_header = request.META.get('HTTP_RANGE', '').strip()
+        ranges = None
+        if range_header and _range_allowed(request, etag, last_modified):
+            ranges = parse_range_header(range_header, file_size)
+
+        if ranges == []:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{file_size}'
+
+        elif ranges is None or len(ranges) == 1:
+            start, end = ranges[0] if ranges else (0, file_size - 1)
+            length = end - start + 1 if file_size else 0
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=content_type)
+            else:
+                response = FileResponse(RangeFile(file_path, start, end), content_type=content_type)
+            response['Content-Length'] = str(length)
+            if ranges:
+                response.status_code = 206
+                response['Content-Range'] = f'bytes {start}-{end}/{file_size}'
+
+        else:
+            boundary = uuid.uuid4().hex
+            multipart_type = f'multipart/byteranges; boundary={boundary}'
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=multipart_type)
+            else:
+                response = StreamingHttpResponse(
+                    multipart_body(file_path, ranges, boundary, content_type, file_size),
+                    content_type=multipart_type
+                )
+            response.status_code = 206
+            response['Content-Length'] = str(_multipart_length(ranges, boundary, content_type, file_size))
+
+    # Essential headers for streaming
     response['Accept-Ranges'] = 'bytes'
-    response['Access-Control-Allow-Origin'] = 'http://localhost:5173'
-    response['Access-Control-Allow-Methods'] = 'GET, HEAD, OPTIONS'
-    response['Access-Control-Allow-Headers'] = 'Range'
-    response['Access-Control-Expose-Headers'] = 'Content-Range, Content-Length, Accept-Ranges'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache
+    return response
+
+
+@csrf_exempt
+@require_http_methods(["GET", "HEAD", "OPTIONS"])
+def video_proxy(request, path):
+    """Serve video files with proper headers for streaming"""
+    if request.method == "OPTIONS":
+        response = HttpResponse()
+        for header, value in CORS_HEADERS.items():
+            response[header] = value
+        return response
 
-    return response
\ No newline at end of file
+    return stream_video(request, resolve_video_path(path))